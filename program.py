@@ -10,13 +10,98 @@
 # Import the datetime module to get the current date and time
 import datetime
 
+# Import the shutil, glob and gzip modules to copy, find and compress the backup files
+import shutil
+import glob
+import gzip
+
+# Import the collections module to create the records read from the allocations file
+import collections
+
+# Import the gc module to pause the garbage collector while a snapshot is loaded
+import gc
+
+# Import the tracemalloc module to measure the memory taken by the rooms
+import tracemalloc
+
 # Import the os module to interact with the operating system
 import os
 
+# Import the sys module to read the command line arguments and the standard streams
+import sys
+
+# Import the argparse module to parse the command line arguments
+import argparse
+
+# Import the csv, json and itertools modules to read the batch operations, and io to collect their errors
+import io
+import csv
+import json
+import itertools
+
+# Import the struct, array and mmap modules to write and read the binary snapshot
+import struct
+import array
+import mmap
+
+# Import the bisect and heapq modules to search the rooms stored in order and merge them
+import bisect
+import heapq
+
+# Import the operator module to multiply the columns of the reports
+import operator
+
+# Import the math module to check the prices are finite numbers
+import math
+
+# Import the sqlite3 module to keep the hotel in a database
+import sqlite3
+
+# Import the threading, functools and random modules to let several desks use the hotel at the same time
+import threading
+import functools
+import random
+
+# Import the asyncio, concurrent.futures, urllib.parse and traceback modules to offer the hotel as an HTTP service
+import asyncio
+import concurrent.futures
+import urllib.parse
+import traceback
+
+# Import the atexit, signal, cProfile and pstats modules to write the metrics and the profile of the program
+import atexit
+import signal
+import cProfile
+import pstats
+
+# Import the inspect module to tell the generators apart when their latency is measured
+import inspect
+
+# Import the tempfile module to keep the files of the stress test and the benchmarks apart
+import tempfile
+
+# Advisory file locks are only available on Unix, elsewhere the data files are not locked
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# NumPy is optional, the reports use the array module when it is not installed
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Import perf_counter to measure how long the operations take
+from time import perf_counter
+
 
 # #### CREATION OF CLASSES ####
 # Creation of a class for Room information
 class Room:
+    # Attributes are stored in slots instead of a dictionary per room, which takes less memory
+    __slots__ = ("roomNumber", "registry", "_isAllocated", "type", "price")
+
     # Estrict the type of the variables in the constructor
     def __init__(
         self,
@@ -31,10 +116,24 @@ class Room:
         Also, additional information like the type and price as room features
         """
         self.roomNumber = roomNumber
-        self.isAllocated = isAllocated
+        # Registry the room belongs to, set by RoomRegistry.add to keep its indexes up to date
+        self.registry = None
+        self._isAllocated = isAllocated
         self.type = type
         self.price = price
 
+    # The status of the room is a property so the registry indexes follow every change
+    @property
+    def isAllocated(self) -> bool:
+        return self._isAllocated
+
+    @isAllocated.setter
+    def isAllocated(self, value: bool):
+        # Move the room to the other status index before the value changes
+        if self.registry is not None and value != self._isAllocated:
+            self.registry.statusChanged(self, value)
+        self._isAllocated = value
+
     # Methods to allocate and deallocate a room
     def allocateRoom(self):
         self.isAllocated = True
@@ -45,6 +144,8 @@ class Room:
 
 # Creation of a class for Customer information
 class Customer:
+    __slots__ = ("customerNo", "customerName")
+
     def __init__(self, customerNo: int, customerName: str):
         """
         Constructor for Customer class, where we get the customer ID and the customer name
@@ -55,513 +156,6091 @@ class Customer:
 
 # Creation of a class for Room Allocation information
 class RoomAllocation:
+    __slots__ = ("allocatedRoom", "allocatedCustomer", "checkIn", "checkOut")
 
-    def __init__(self, room: Room, customer: Customer):
+    def __init__(
+        self,
+        room: Room,
+        customer: Customer,
+        # Dates of the stay, the check-out date is the morning the customer leaves
+        checkIn: datetime.date = None,
+        checkOut: datetime.date = None,
+    ):
         """
-        Constructor for RoomAllocation class, where the room and the Customer are objects of the Room and Customer classes
+        Constructor for RoomAllocation class, where the room and the Customer are objects of the Room and Customer classes.
+        Also, the check-in and check-out dates of the stay
         """
         self.allocatedRoom = room
         self.allocatedCustomer = customer
+        self.checkIn = checkIn
+        self.checkOut = checkOut
 
+    @property
+    def nights(self) -> int:
+        """
+        Quantity of nights of the stay, 0 when the dates are not known
+        """
+        if self.checkIn is None or self.checkOut is None:
+            return 0
+        return (self.checkOut - self.checkIn).days
 
-# VARIABLES USED IN THE PROGRAM
-
-# Array of Room objects
-listOfRooms = []
-
-# List of Room Numbers already added
-listOfRoomNumbers = []
+    def billedNights(self, today: datetime.date) -> int:
+        """
+        Quantity of nights billed when the customer leaves on the given day: the nights until the check-out date,
+        or until today when the customer leaves early, and at least one night
+        """
+        return max(1, (min(today, self.checkOut) - self.checkIn).days)
 
-# List of Customer numbers
-listOfCustomerNumbers = []
 
-# Quantity of rooms, initialized as 0
-noOfRooms = 0
+# Width of the price bands used to index the rooms by price
+PRICE_BAND_WIDTH = 50.0
 
-# List of RoomAllocation objects
-listOfRoomAllocations = []
 
-# Path to the file where the data is stored
-filePath = os.path.join(os.getcwd(), "LHMS_764707603.txt")
+def priceBand(price: float) -> int:
+    """
+    Function to get the price band of a room price, used as key of the price index
+    """
+    return int(price // PRICE_BAND_WIDTH)
 
-# Today's date and time
-date = datetime.datetime.now()
-day = date.strftime("%m-%d-%Y")
-time = date.strftime("%H.%M.%S")
 
-# Path to the backup file using today's date and timea
-filePathBackUp = os.path.join(os.getcwd(), f"LHMS_764707603_Backup_{day}_{time}.txt")
+# Quantity of rooms in each chunk of a FreeRoomQueue, a chunk that grows to twice this size is split in two
+FREE_QUEUE_CHUNK = 512
 
 
-"""
-        ### FUNCTIONS ###
-Functions used in the program to perform different operations
-"""
+# Creation of a class for the free rooms of one type ordered by price
+class FreeRoomQueue:
+    __slots__ = ("chunks", "firsts", "size")
 
+    def __init__(self):
+        """
+        Constructor for FreeRoomQueue class, where the free rooms are kept from the most expensive to the cheapest,
+        and by room number between rooms of the same price, as (-price, room number) keys. The keys are split in
+        short sorted chunks, with the first key of each chunk in another list, so a room is found with two binary
+        searches and adding or removing a room only moves the memory of its chunk, in O(log n) instead of O(n)
+        """
+        self.chunks = []
+        self.firsts = []
+        self.size = 0
 
-def addRooms():
-    """
-    Function to add rooms to the hotel, recieve the number of rooms the user wants to add, and store the room number, type and price for each room.
-    Uses a loop to add the rooms to the hotel while checking if the room number already exists.
-    """
+    def __len__(self) -> int:
+        return self.size
 
-    # Value Error exception handling
-    try:
-        # Display a message to the user
-        print("\n ### ADD ROOMS ### \n")
-
-        # Ask the user for the number of rooms they want to add and store it in the noOfRooms variable
-        noOfRooms = int(input("Enter the number of rooms you want to add: "))
-
-        # Loop to add the rooms to the hotel
-        for i in range(noOfRooms):
-
-            # Variable to check if the room number already exists
-            success = False
-            # Loop to check if the room number already exists
-            while not success:
-                # Ask the user for the room number and store it in the roomNo variable
-                roomNo = int(input(f"Enter the room number {i+1}: "))
-                # Check if the room number already exists
-                if roomNo in listOfRoomNumbers:
-                    print(
-                        "Room number already exists. Please enter a different room number."
-                    )
-                # Check if the room number is negative
-                elif roomNo < 0:
-                    print("Please enter a valid room number.")
-                # If the room number does not exist, add the room number to the list of rooms
-                else:
-                    # Variable to check if the room type is valid
-                    roomType = ""
-                    # Loop to check if the room type is valid
-                    while roomType not in ["Single", "Double", "Suite"]:
-                        # Ask the user for the type of room and store it in the roomType variable
-                        roomType = input(
-                            f"Enter the type of room {i+1} (Single, Double, Suite): "
-                        )
-
-                    price = 0.0
-                    # Loop to check if the price is valid
-                    while price <= 0:
-                        # Ask the user for the price of the room and store it in the price variable
-                        price = float(
-                            input(f"Enter the price per night of the room {i+1}: ")
-                        )
-                    # Set the success variable to True to exit the loop
-                    success = True
-                    # Add the room number to the list of room numbers
-                    listOfRoomNumbers.append(roomNo)
+    @property
+    def dearest(self) -> float:
+        return -self.chunks[0][0][0]
 
-            try:
-                # Create a Room object with the room number and the status of the room as False
-                room = Room(roomNo, False, roomType, price)
-                # Add the Room object to the list of rooms
-                listOfRooms.append(room)
-            except TypeError:
-                print("Please enter a valid type.")
-                addRooms()
-
-    # An exception is raised if the user enters a value that is not a number
-    except ValueError:
-        print("Please enter a valid number.")
-        addRooms()
+    @property
+    def cheapest(self) -> float:
+        return -self.chunks[-1][-1][0]
 
+    def chunkOf(self, key: tuple) -> int:
+        # Position of the chunk where the key is or would be
+        return max(bisect.bisect_right(self.firsts, key) - 1, 0)
 
-def deleteRooms():
-    """
-    Function to delete rooms from the hotel
-    List the rooms available to delete and ask the user for the room number to delete
-    Checks if the room number is valid and deletes the room from the list of rooms
-    """
-    # Check if there are rooms available to delete
-    if len(listOfRooms) == 0:
-        print("\nNo rooms available to delete.\n")
-        return
+    def add(self, price: float, roomNumber: int):
+        key = (-price, roomNumber)
+        if not self.chunks:
+            self.chunks.append([key])
+            self.firsts.append(key)
+            self.size = 1
+            return
+        index = self.chunkOf(key)
+        chunk = self.chunks[index]
+        bisect.insort(chunk, key)
+        self.firsts[index] = chunk[0]
+        self.size += 1
+        if len(chunk) >= 2 * FREE_QUEUE_CHUNK:
+            # The second half of a long chunk becomes a new chunk
+            second = chunk[FREE_QUEUE_CHUNK:]
+            del chunk[FREE_QUEUE_CHUNK:]
+            self.chunks.insert(index + 1, second)
+            self.firsts.insert(index + 1, second[0])
 
-    # Value Error exception handling
-    try:
-        print("\n ### DELETE ROOMS ### \n")
-        print("List of Rooms already created: ")
-        # Loop to display the list of rooms
-        for room in listOfRooms:
-            print(f"Room Number: {room.roomNumber}")
-
-        # Variable to store the room number to delete
-        roomNo = 0
-        # List to store the rooms to delete
-        roomsToDelete = []
-        # Loop to delete the rooms from the hotel
-        while roomNo != -1:
-            # Ask the user for the room number to delete and store it in the roomNo variable
-            roomNo = int(
-                input("Enter the room number you want to delete (-1 to exit): ")
-            )
-            # Check if the room number is negative or if the room number is not in the list of room numbers
-            if roomNo < 0 and roomNo != -1 or roomNo not in listOfRoomNumbers:
-                print("Please enter a valid room number.")
-            # If the room number is in the list of room numbers, add it to the list of rooms to delete
+    def remove(self, price: float, roomNumber: int):
+        if not self.chunks:
+            return
+        key = (-price, roomNumber)
+        index = self.chunkOf(key)
+        chunk = self.chunks[index]
+        position = bisect.bisect_left(chunk, key)
+        if position < len(chunk) and chunk[position] == key:
+            del chunk[position]
+            self.size -= 1
+            if chunk:
+                self.firsts[index] = chunk[0]
             else:
-                roomsToDelete.append(roomNo)
-
-        # Loop to delete the rooms from the list of rooms
-        for room in listOfRooms:
-            # Check if the room number is in the list of rooms to delete
-            if room.roomNumber in roomsToDelete:
-                # Remove the room from the list of rooms
-                listOfRooms.remove(room)
-                # Remove the room number from the list of room numbers
-                listOfRoomNumbers.remove(room.roomNumber)
-
-        print(f"\n {len(roomsToDelete)} Rooms deleted successfully.")
-    except ValueError:
-        print("Please enter a valid number.")
-        deleteRooms()
+                del self.chunks[index]
+                del self.firsts[index]
 
+    def load(self, rooms):
+        """
+        Method to add many (price, room number) pairs at once, sorting them once
+        """
+        keys = sorted(
+            itertools.chain(
+                itertools.chain.from_iterable(self.chunks),
+                ((-price, roomNumber) for price, roomNumber in rooms),
+            )
+        )
+        self.chunks = [keys[start : start + FREE_QUEUE_CHUNK] for start in range(0, len(keys), FREE_QUEUE_CHUNK)]
+        self.firsts = [chunk[0] for chunk in self.chunks]
+        self.size = len(keys)
 
-def displayRoomDetails():
-    """
-    Function to display the details of the rooms, including the room number, type and price
-    """
-    print("\n ### ROOM DETAILS ### \n")
-    print("List of Rooms: \n")
+    def bestFit(self, maxPrice: float = None):
+        """
+        Method to get the free rooms from the most expensive one within the maximum price down to the cheapest,
+        as (price, room number) pairs. Rooms of the same price are given from the lowest room number
+        """
+        if not self.chunks:
+            return
+        index = position = 0
+        if maxPrice is not None:
+            # The first key of the maximum price, lower than the key of any room number
+            key = (-maxPrice, -math.inf)
+            index = self.chunkOf(key)
+            position = bisect.bisect_left(self.chunks[index], key)
+        for chunk in itertools.islice(self.chunks, index, None):
+            for negativePrice, roomNumber in itertools.islice(chunk, position, None):
+                yield -negativePrice, roomNumber
+            position = 0
 
-    # Loop to display the details of the rooms
-    for room in listOfRooms:
-        print(f"     Room Number: {room.roomNumber}")
-        print(f"Room Type: {room.type}")
-        print(f"Room Price: {room.price}")
-        print("*" * 40)
 
+# Creation of a class to store the rooms of the hotel
+class RoomRegistry:
 
-def allocateRoom():
-    """
-    Function to allocate a room to a customer, updating the status of the room, and creating a new Customer
-    """
+    def __init__(self):
+        """
+        Constructor for RoomRegistry class, where the rooms are stored by room number.
+        Secondary indexes by status, type and price band are kept so the lookups do not scan every room.
+        Dictionaries are used as ordered sets, so the rooms keep the order in which they were added.
+        The free rooms of each type are also kept ordered by price, to assign the best room for a price
+        """
+        self.rooms = {}
+        self.roomsByStatus = {False: {}, True: {}}
+        self.roomsByType = {}
+        self.roomsByPriceBand = {}
+        # Price bands that have rooms, sorted, so a price range only visits the bands it overlaps
+        self.priceBands = []
+        self.freeRoomsByType = {}
 
-    try:
-        print(" ### ALLOCATE ROOM ### \n")
-
-        # Create variable to store the quantity of allocated rooms
-        quantityOfAllocatedRooms = 0
-        # List to store the room numbers of the allocated rooms
-        allocatedRooms = []
-
-        print("List of not allocated Rooms: \n")
-        # Loop to display the list of rooms that are not allocated
-        for room in listOfRooms:
-            # Check if the room is not allocated
-            if not room.isAllocated:
-                print(f"* Room Number: {room.roomNumber}")
-                # Add the room number to the list of allocated rooms
-                allocatedRooms.append(room.roomNumber)
-                # Add 1 to the quantity of allocated rooms, to check if there are rooms available to allocate
-                quantityOfAllocatedRooms += 1
-
-        # Check if there are rooms available to allocate
-        if quantityOfAllocatedRooms == 0:
-            print("No rooms available to allocate.")
-            return
+    def __len__(self) -> int:
+        return len(self.rooms)
 
-        # Variable to store the room number selected by the user
-        roomSelected = -1
+    def __contains__(self, roomNumber) -> bool:
+        return roomNumber in self.rooms
 
-        # Loop to check if the room number selected by the user is valid
-        while roomSelected not in allocatedRooms:
-            roomSelected = int(input("Enter the room number you want to allocate: "))
+    def __iter__(self):
+        return iter(self.rooms.values())
 
-        # Variable to store the customer number
-        customerNo = int(input("Enter the customer number: "))
+    def get(self, roomNumber: int):
+        """
+        Method to get the room with the given room number, or None if it does not exist
+        """
+        return self.rooms.get(roomNumber)
 
-        # Loop to check if the customer number is valid
-        while customerNo in listOfCustomerNumbers:
-            print(
-                "\nCustomer number already exists. Please enter a different customer number."
-            )
-            customerNo = int(input("Enter the customer number: "))
+    def add(self, room: Room):
+        """
+        Method to add a room to the registry and to every index
+        """
+        if room.roomNumber in self.rooms:
+            raise ValueError(f"Room number {room.roomNumber} already exists.")
+        if not math.isfinite(room.price):
+            raise ValueError(f"Room number {room.roomNumber} has no valid price.")
+        # The band is found before any index is changed, so a failure leaves the registry as it was
+        band = priceBand(room.price)
 
-        listOfCustomerNumbers.append(customerNo)
+        self.rooms[room.roomNumber] = room
+        self.roomsByStatus[room.isAllocated][room.roomNumber] = room
+        self.roomsByType.setdefault(room.type, {})[room.roomNumber] = room
+        if band not in self.roomsByPriceBand:
+            self.roomsByPriceBand[band] = {}
+            bisect.insort(self.priceBands, band)
+        self.roomsByPriceBand[band][room.roomNumber] = room
+        if not room.isAllocated:
+            self.freeQueue(room.type).add(room.price, room.roomNumber)
+        room.registry = self
+        return room
 
-        # Variable to store the customer name
-        customerName = input("Enter the customer name: ")
+    def freeQueue(self, type: str) -> FreeRoomQueue:
+        """
+        Method to get the queue of the free rooms of a type, creating it the first time
+        """
+        queue = self.freeRoomsByType.get(type)
+        if queue is None:
+            queue = self.freeRoomsByType[type] = FreeRoomQueue()
+        return queue
 
-        # Create a Customer object with the customer number and the customer name
-        customer = Customer(customerNo, customerName)
+    def load(self, rooms):
+        """
+        Method to add many rooms at once, used to rebuild the registry from a snapshot.
+        The rooms are trusted to have different room numbers, so they are indexed without the checks of add
+        """
+        allRooms = self.rooms
+        roomsByStatus = self.roomsByStatus
+        roomsByType = self.roomsByType
+        roomsByPriceBand = self.roomsByPriceBand
+        freeRooms = []
+        for room in rooms:
+            roomNumber = room.roomNumber
+            allRooms[roomNumber] = room
+            roomsByStatus[room._isAllocated][roomNumber] = room
+            try:
+                roomsByType[room.type][roomNumber] = room
+            except KeyError:
+                roomsByType[room.type] = {roomNumber: room}
+            band = int(room.price // PRICE_BAND_WIDTH)
+            try:
+                roomsByPriceBand[band][roomNumber] = room
+            except KeyError:
+                roomsByPriceBand[band] = {roomNumber: room}
+            if not room._isAllocated:
+                freeRooms.append(room)
+            room.registry = self
+        self.priceBands = sorted(roomsByPriceBand)
 
-        # Loop to find the room object with the room number selected by the user
-        for room in listOfRooms:
-            if room.roomNumber == roomSelected:
-                # Allocate the room
-                room.allocateRoom()
-                # Create a RoomAllocation object with the room and the customer information
-                allocation = RoomAllocation(room, customer)
-                # Add the RoomAllocation object to the list of room allocations
-                listOfRoomAllocations.append(allocation)
-                break
+        # The queues of free rooms are sorted once for all the rooms of each type
+        freeRooms.sort(key=operator.attrgetter("type"))
+        for type, roomsOfType in itertools.groupby(freeRooms, key=operator.attrgetter("type")):
+            self.freeQueue(type).load((room.price, room.roomNumber) for room in roomsOfType)
 
-        print(f"\nRoom {roomSelected} allocated to {customerName} successfully.")
+    def delete(self, roomNumber: int):
+        """
+        Method to delete a room from the registry and from every index, returns the deleted room
+        """
+        room = self.rooms.pop(roomNumber, None)
+        if room is None:
+            raise ValueError(f"Room number {roomNumber} does not exist.")
 
-    except ValueError:
-        print("Please enter a valid number.")
-        allocateRoom()
+        del self.roomsByStatus[room.isAllocated][roomNumber]
+        if not room.isAllocated:
+            self.freeQueue(room.type).remove(room.price, roomNumber)
+        self._discard(self.roomsByType, room.type, roomNumber)
+        band = priceBand(room.price)
+        self._discard(self.roomsByPriceBand, band, roomNumber)
+        if band not in self.roomsByPriceBand:
+            del self.priceBands[bisect.bisect_left(self.priceBands, band)]
+        room.registry = None
+        return room
 
+    def allocate(self, roomNumber: int):
+        """
+        Method to allocate the room with the given room number, returns the room
+        """
+        room = self.rooms.get(roomNumber)
+        if room is None or room.isAllocated:
+            raise ValueError(f"Room number {roomNumber} is not available.")
+        room.allocateRoom()
+        return room
 
-def displayRoomAllocationsDetails():
-    """
-    Function to display the details of the room allocations, including the room number, customer number and customer name
-    """
-    print("\n ### ROOM ALLOCATIONS ### \n")
-    print("List of Rooms: \n")
+    def deallocate(self, roomNumber: int):
+        """
+        Method to deallocate the room with the given room number, returns the room
+        """
+        room = self.rooms.get(roomNumber)
+        if room is None or not room.isAllocated:
+            raise ValueError(f"Room number {roomNumber} is not allocated.")
+        room.deallocateRoom()
+        return room
 
-    # Loop to display the details of the rooms
-    for room in listOfRooms:
-        print(f"     Room Number: {room.roomNumber}")
-        # Check if the room is allocated
-        if room.isAllocated:
-            print(f"The room is allocated.\n")
-            # Loop to display the details of the room allocations
-            for allocation in listOfRoomAllocations:
-                # Check if the room number is the same as the room number of the room allocation
-                if allocation.allocatedRoom.roomNumber == room.roomNumber:
-                    # Display the customer number and the customer name
-                    print(f"Customer Number: {allocation.allocatedCustomer.customerNo}")
-                    print(f"Customer Name: {allocation.allocatedCustomer.customerName}")
+    def statusChanged(self, room: Room, isAllocated: bool):
+        """
+        Method called by the Room when its status changes, to move it to the other status index
+        and add it to or remove it from the free rooms of its type
+        """
+        del self.roomsByStatus[room.isAllocated][room.roomNumber]
+        self.roomsByStatus[isAllocated][room.roomNumber] = room
+        if isAllocated:
+            self.freeQueue(room.type).remove(room.price, room.roomNumber)
         else:
-            print("The room is not allocated\n")
-        print("*" * 40)
+            self.freeQueue(room.type).add(room.price, room.roomNumber)
 
+    def freeRooms(self):
+        """
+        Method to get the rooms that are not allocated, without scanning the allocated ones
+        """
+        return self.roomsByStatus[False].values()
 
-def billing():
-    """
-    Function to calculate the billing for the customer and deallocate the room
-    """
-    try:
-        print(" ### BILLING & DEALLOCATION ### \n")
-
-        # Check if there are rooms available to deallocate
-        print("List of Rooms already allocated: \n")
-        # Variable to store the quantity of allocated rooms
-        quantityOfAllocatedRooms = 0
-        # List to store the room numbers of the allocated rooms
-        allocatedRooms = []
-        # Loop to display the list of rooms that are allocated
-        for room in listOfRooms:
-            # Check if the room is allocated
-            if room.isAllocated:
-                print(f"* Room Number: {room.roomNumber}")
-                # Add 1 to the quantity of allocated rooms, to check if there are rooms available to deallocate
-                quantityOfAllocatedRooms += 1
-                allocatedRooms.append(room.roomNumber)
-
-        # Check if there are rooms available to deallocate
-        if quantityOfAllocatedRooms == 0:
-            print("No rooms available to deallocate.\n")
-            return
+    def allocatedRooms(self):
+        """
+        Method to get the rooms that are allocated, without scanning the free ones
+        """
+        return self.roomsByStatus[True].values()
 
-        # Variable to store the customer number
-        roomNo = int(input("Enter the room number: "))
-        # Loop to check if the room number selected by the user is valid
-        while roomNo not in allocatedRooms:
-            print("Please enter a valid room number.")
-            roomNo = int(input("Enter the room number: "))
-
-        # Loop to find the room object with the room number selected by the user
-        for room in listOfRooms:
-            if room.roomNumber == roomNo:
-                # Loop to find the RoomAllocation object with the room number selected by the user
-                for allocation in listOfRoomAllocations:
-                    if allocation.allocatedRoom.roomNumber == roomNo:
-
-                        nights = int(input("Enter the number of nights: "))
-
-                        # Calculate the billing for the customer
-                        print(f"\nThe billing per night is: {room.price}")
-                        print(f"The total billing is: {room.price * nights}")
-                        # Deallocate the room
-                        room.deallocateRoom()
-                        # Remove the RoomAllocation object from the list of room allocations
-                        listOfRoomAllocations.remove(allocation)
-
-                        print(f"\nRoom {roomNo} deallocated successfully.")
-                        break
-                break
+    def roomsOfType(self, type: str):
+        """
+        Method to get the rooms of the given type
+        """
+        return self.roomsByType.get(type, {}).values()
 
-    except ValueError:
-        print("Please enter a valid number.")
-        billing()
+    def roomsInPriceRange(self, minPrice: float, maxPrice: float):
+        """
+        Method to get the rooms with a price between minPrice and maxPrice, only visiting the price bands that
+        have rooms in the range
+        """
+        first = bisect.bisect_left(self.priceBands, priceBand(minPrice))
+        last = bisect.bisect_right(self.priceBands, priceBand(maxPrice))
+        for band in self.priceBands[first:last]:
+            for room in self.roomsByPriceBand[band].values():
+                if minPrice <= room.price <= maxPrice:
+                    yield room
 
+    def clear(self):
+        """
+        Method to remove every room from the registry
+        """
+        for room in self.rooms.values():
+            room.registry = None
+        self.rooms.clear()
+        self.roomsByStatus = {False: {}, True: {}}
+        self.roomsByType.clear()
+        self.roomsByPriceBand.clear()
+        self.priceBands.clear()
+        self.freeRoomsByType.clear()
 
-def saveRoomAllocationsToFile():
-    try:
-        print(" ### SAVE ROOM ALLOCATIONS TO FILE ### \n")
+    @staticmethod
+    def _discard(index: dict, key, roomNumber: int):
+        # Remove the room from a secondary index, dropping the key when it becomes empty
+        rooms = index[key]
+        del rooms[roomNumber]
+        if not rooms:
+            del index[key]
 
-        # Open the file in write mode and create it if it does not exist
-        file = open(filePath, "w+")
 
-        # Get the current date and time
-        now = datetime.datetime.now()
+# Creation of a class to store the room allocations of the hotel
+class AllocationIndex:
 
-        # Write the header of the file
-        file.write(f"\t #### LANGHAM HOTEL MANAGEMENT SYSTEM ####\n")
+    def __init__(self):
+        """
+        Constructor for AllocationIndex class, where the RoomAllocation objects are stored
+        by room number and by customer number, so both lookups are done in constant time.
+        The rooms whose allocation changed since the last save are kept, so a save only writes those
+        """
+        self.allocationsByRoom = {}
+        self.allocationsByCustomer = {}
+        self.changedRooms = set()
+        # After the allocations are replaced all at once the whole file has to be written
+        self.everythingChanged = True
 
-        # Loop to write the details of the room allocations to the file
-        for roomAllocation in listOfRoomAllocations:
-            # Write the room number, customer number, customer name and the date to the file
-            file.write(f"\nRoom Number: {roomAllocation.allocatedRoom.roomNumber}\n")
-            file.write(
-                f"Customer Number: {roomAllocation.allocatedCustomer.customerNo}\n"
-            )
-            file.write(
-                f"Customer Name: {roomAllocation.allocatedCustomer.customerName}\n"
-            )
-            file.write(f"Date: {now.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            file.write("*" * 40)
+    def __len__(self) -> int:
+        return len(self.allocationsByRoom)
 
-        # Close the file
-        file.close()
+    def __contains__(self, roomNumber) -> bool:
+        return roomNumber in self.allocationsByRoom
 
-        print("Room allocations saved as 'LHMS_1094' successfully.")
+    def __iter__(self):
+        return iter(self.allocationsByRoom.values())
 
-    # IOError exception handling
-    except IOError:
-        print("An error occurred while saving the file.")
-        return
-    # EOFError exception handling
-    except EOFError:
-        print("End of file.")
-        return
+    def add(self, allocation: RoomAllocation):
+        """
+        Method to add a RoomAllocation to both indexes, a room and a customer can only have one allocation
+        """
+        roomNumber = allocation.allocatedRoom.roomNumber
+        customerNo = allocation.allocatedCustomer.customerNo
+        if roomNumber in self.allocationsByRoom:
+            raise ValueError(f"Room number {roomNumber} is already allocated.")
+        if customerNo in self.allocationsByCustomer:
+            raise ValueError(f"Customer number {customerNo} already has a room.")
 
+        self.allocationsByRoom[roomNumber] = allocation
+        self.allocationsByCustomer[customerNo] = allocation
+        self.changedRooms.add(roomNumber)
+        return allocation
 
-def showRoomAllocationsFromFile():
-    try:
-        print(" ### SHOW ROOM ALLOCATIONS ### \n")
+    def forRoom(self, roomNumber: int):
+        """
+        Method to get the allocation of the given room, or None if the room is not allocated
+        """
+        return self.allocationsByRoom.get(roomNumber)
 
-        # Open the file in read mode
-        file = open(filePath, "r")
+    def forCustomer(self, customerNo: int):
+        """
+        Method to get the allocation of the given customer, or None if the customer has no room
+        """
+        return self.allocationsByCustomer.get(customerNo)
 
-        # Read the content of the file
-        content = file.read()
+    def remove(self, roomNumber: int):
+        """
+        Method to remove the allocation of the given room from both indexes, returns the removed allocation
+        """
+        allocation = self.allocationsByRoom.pop(roomNumber, None)
+        if allocation is None:
+            raise ValueError(f"Room number {roomNumber} is not allocated.")
+        del self.allocationsByCustomer[allocation.allocatedCustomer.customerNo]
+        self.changedRooms.add(roomNumber)
+        return allocation
 
-        # Print the content of the file
-        print(content)
-    except FileNotFoundError:
-        print("File not found. Try saving the room allocations first.")
-        return
+    def takeChanges(self):
+        """
+        Method to get the room numbers whose allocation changed since the last call, or None when every allocation
+        has to be written again, and start tracking the changes again
+        """
+        changes = None if self.everythingChanged else self.changedRooms
+        self.changedRooms = set()
+        self.everythingChanged = False
+        return changes
 
+    def markEverythingChanged(self):
+        """
+        Method to make the next save write every allocation, used when the saved file cannot be trusted
+        """
+        self.changedRooms = set()
+        self.everythingChanged = True
 
-def backupRoomAllocations():
-    try:
-        print(" ### BACKUP ### \n")
+    def occupancy(self, registry: RoomRegistry):
+        """
+        Method to iterate over the rooms of the registry sorted by room number, together with their allocation or None
+        """
+        rooms = registry.rooms
+        for roomNumber in sorted(rooms):
+            yield rooms[roomNumber], self.allocationsByRoom.get(roomNumber)
 
-        # Open the file in read mode
-        file = open(filePath, "r")
-        # Read the content of the file
-        content = file.read()
-        # Close the file
-        file.close()
+    def clear(self):
+        """
+        Method to remove every allocation
+        """
+        self.allocationsByRoom.clear()
+        self.allocationsByCustomer.clear()
+        self.markEverythingChanged()
 
-        # Open the file in write mode to eliminate the content
-        file = open(filePath, "w")
-        # Write the header of the file
-        file.write(f"\t #### LANGHAM HOTEL MANAGEMENT SYSTEM ####\n")
-        file.close()
 
-        # Open backup file in write mode
-        fileBackup = open(filePathBackUp, "w+")  # Create the file if it does not exist
-        # Write the content of the file to the backup file
-        fileBackup.write(content)
-        # Close the backup file
-        fileBackup.close()
+# Creation of a class to store the stays of every room by date
+class ReservationBook:
 
-        print(f"Content of 'LHMS_1094' eliminated succesfully.")
-        print(f"Backup created successfully as 'LHMS_1094_Backup_{day}_{time}'.")
+    def __init__(self):
+        """
+        Constructor for ReservationBook class, where the stays (current and future RoomAllocation objects) are stored.
+        Each room keeps its stays in a list sorted by check-in date, so an overlapping stay is found with a binary search,
+        and each night keeps the set of rooms booked, so the free rooms for some dates are found with set operations
+        """
+        self.startsByRoom = {}
+        self.staysByRoom = {}
+        self.staysByCustomer = {}
+        # Nights are stored by their ordinal number, which is faster to hash than a date
+        self.roomsByNight = {}
 
-    except FileNotFoundError:
-        print("File not found. Try saving the room allocations first.")
-        return
+    def __len__(self) -> int:
+        return len(self.staysByCustomer)
 
+    def __iter__(self):
+        return iter(self.staysByCustomer.values())
 
-# #### MAIN PROGRAM ####
-def main():
+    def forCustomer(self, customerNo: int):
+        """
+        Method to get the stay of the given customer, or None if the customer has no stay
+        """
+        return self.staysByCustomer.get(customerNo)
+
+    def staysOfRoom(self, roomNumber: int) -> list:
+        """
+        Method to get the stays of the given room sorted by check-in date
+        """
+        return list(self.staysByRoom.get(roomNumber, ()))
+
+    def isAvailable(
+        self, roomNumber: int, checkIn: datetime.date, checkOut: datetime.date
+    ) -> bool:
+        """
+        Method to check that no stay of the room overlaps the nights from checkIn to the night before checkOut
+        """
+        starts = self.startsByRoom.get(roomNumber)
+        if not starts:
+            return True
+        stays = self.staysByRoom[roomNumber]
+        # Position of the first stay that starts after the check-in date
+        position = bisect.bisect_right(starts, checkIn)
+        # The stay before must end before the check-in, and the next one start after the check-out
+        if position > 0 and stays[position - 1].checkOut > checkIn:
+            return False
+        if position < len(stays) and stays[position].checkIn < checkOut:
+            return False
+        return True
+
+    def add(self, allocation: RoomAllocation):
+        """
+        Method to add a stay, raises ValueError if it overlaps another stay of the room
+        """
+        roomNumber = allocation.allocatedRoom.roomNumber
+        checkIn = allocation.checkIn
+        if not self.isAvailable(roomNumber, checkIn, allocation.checkOut):
+            raise ValueError(f"Room {roomNumber} is already booked for part of the stay.")
+        if allocation.allocatedCustomer.customerNo in self.staysByCustomer:
+            raise ValueError("Customer number already has a stay.")
+
+        starts = self.startsByRoom.setdefault(roomNumber, [])
+        position = bisect.bisect_right(starts, checkIn)
+        starts.insert(position, checkIn)
+        self.staysByRoom.setdefault(roomNumber, []).insert(position, allocation)
+        self.staysByCustomer[allocation.allocatedCustomer.customerNo] = allocation
+
+        for night in range(checkIn.toordinal(), allocation.checkOut.toordinal()):
+            rooms = self.roomsByNight.get(night)
+            if rooms is None:
+                rooms = self.roomsByNight[night] = set()
+            rooms.add(roomNumber)
+        return allocation
+
+    def remove(self, allocation: RoomAllocation):
+        """
+        Method to remove a stay and free its nights
+        """
+        roomNumber = allocation.allocatedRoom.roomNumber
+        stays = self.staysByRoom[roomNumber]
+        position = stays.index(allocation)
+        del stays[position]
+        del self.startsByRoom[roomNumber][position]
+        if not stays:
+            del self.staysByRoom[roomNumber]
+            del self.startsByRoom[roomNumber]
+        del self.staysByCustomer[allocation.allocatedCustomer.customerNo]
+
+        for night in range(allocation.checkIn.toordinal(), allocation.checkOut.toordinal()):
+            rooms = self.roomsByNight[night]
+            rooms.discard(roomNumber)
+            if not rooms:
+                del self.roomsByNight[night]
+        return allocation
+
+    def removeRoom(self, roomNumber: int) -> list:
+        """
+        Method to remove every stay of a room, returns the removed stays
+        """
+        stays = self.staysOfRoom(roomNumber)
+        for allocation in stays:
+            self.remove(allocation)
+        return stays
+
+    def bookedRooms(self, checkIn: datetime.date, checkOut: datetime.date) -> set:
+        """
+        Method to get the room numbers booked for at least one night from checkIn to the night before checkOut
+        """
+        nights = self.roomsByNight
+        return set().union(
+            *[
+                nights[night]
+                for night in range(checkIn.toordinal(), checkOut.toordinal())
+                if night in nights
+            ]
+        )
+
+    def freeRooms(self, roomNumbers, checkIn: datetime.date, checkOut: datetime.date) -> set:
+        """
+        Method to get which of the given room numbers are free for every night of the stay
+        """
+        return set(roomNumbers) - self.bookedRooms(checkIn, checkOut)
+
+    def clear(self):
+        """
+        Method to remove every stay
+        """
+        self.startsByRoom.clear()
+        self.staysByRoom.clear()
+        self.staysByCustomer.clear()
+        self.roomsByNight.clear()
+
+
+# Quantity of customers shown by a search unless another limit is given
+SEARCH_LIMIT = 20
+
+
+def nameKeys(name: str) -> set:
     """
-    Main function of the program
+    Function to get the keys of a name in the index of customers, every trigram of each word. Case is ignored
     """
+    keys = set()
+    for word in name.casefold().split():
+        keys.update(word[index : index + 3] for index in range(len(word) - 2))
+    return keys
 
-    # Name Error exception handling
-    try:
 
-        # Initialize the choice variable to -1, to enter the loop
-        choice = -1
+# Creation of a class for the directory of customers
+class CustomerDirectory:
 
-        # Loop to display the menu until the user chooses to exit
-        while choice != 0:
+    def __init__(self):
+        """
+        Constructor for CustomerDirectory class, where the name of every customer is stored by customer number,
+        so a customer number is checked and found in constant time. The names are also indexed by their trigrams,
+        so a customer is found by part of the name without reading every name.
+        Customer numbers are never used again, so the index only grows
+        """
+        self.names = {}
+        # Customer numbers of the names that have each key, packed in arrays
+        self.customersByKey = {}
 
-            # Menu
-            # Two blank lines are printed to separate the menu from the previous output
-            print("\n")
-            print("\n")
-            print("*" * 70)
-            print("                 LANGHAM HOTEL MANAGEMENT SYSTEM             ")
-            print("                              MENU                        ")
-            print("*" * 70)
+    def __contains__(self, customerNo: int) -> bool:
+        return customerNo in self.names
 
-            print("0. Exit")
-            print("1. Add Rooms")
-            print("2. Delete Rooms")
-            print("3. Display Rooms Details")
-            print("4. Allocate Rooms")
-            print("5. Display Room Allocation Details")
-            print("6. Billing & De-Allocation")
-            print("7. Save the Room Allocations in the database")
-            print("8. Load the Room Allocations from the database")
-            print("9. Backup of Room Allocations")
-            print("*" * 70)
+    def __len__(self) -> int:
+        return len(self.names)
 
-            # Update choice variable with the user's choice
-            choice = int(input("Enter your choice number here (0-9): "))
-
-            # Check the user's choice and call the corresponding function
-            if choice == 1:
-                # Call the function to add rooms
-                addRooms()
-            elif choice == 2:
-                # Call the function to display rooms
-                deleteRooms()
-            elif choice == 3:
-                # Call the function to allocate rooms
-                displayRoomDetails()
-            elif choice == 4:
-                # Call the function to deallocate rooms
-                allocateRoom()
-            elif choice == 5:
-                # Call the function to display room allocation details
-                displayRoomAllocationsDetails()
-            elif choice == 6:
-                # Call the function to calculate the billing
-                billing()
-            elif choice == 7:
-                # Call the function to save the room allocations to a file
-                saveRoomAllocationsToFile()
-            elif choice == 8:
-                # Call the function to show the room allocations from a file
-                showRoomAllocationsFromFile()
-            elif choice == 9:
-                # Call the function to backup the room allocations
-                backupRoomAllocations()
-            elif choice == 0:
-                # Exit the program
-                print("Exiting the program...")
-            else:
-                # If the choice is not valid, display a message
-                print("\nInvalid choice, please enter a number between 0 and 9\n")
-                # If the choice is not valid, display the menu again
-                main()
+    def __iter__(self):
+        return iter(self.names)
 
-    # An exception is raised if the user enters a value that is not a number
-    except ValueError:
-        # Display a message to the user
-        print("Please enter a valid number.")
-        return
+    def get(self, customerNo: int):
+        """
+        Method to get the name of the given customer, or None if the customer number is not used
+        """
+        return self.names.get(customerNo)
+
+    def add(self, customerNo: int, customerName: str):
+        """
+        Method to add a new customer and index its name
+        """
+        self.names[customerNo] = customerName
+        customersByKey = self.customersByKey
+        for key in nameKeys(customerName):
+            customers = customersByKey.get(key)
+            if customers is None:
+                customers = customersByKey[key] = array.array("q")
+            customers.append(customerNo)
+
+    def load(self, customers):
+        """
+        Method to add many customers at once, given as (customer number, customer name) pairs
+        """
+        for customerNo, customerName in customers:
+            self.add(customerNo, customerName)
+
+    def search(self, text: str, limit: int = SEARCH_LIMIT) -> list:
+        """
+        Method to find the customers whose name has every word of the text anywhere in it, ignoring case.
+        When a word has three letters or more only the customers of its rarest trigram are read, shorter words
+        have no trigram so every name is read. Returns up to limit (customer number, customer name) pairs
+        sorted by name
+        """
+        words = text.casefold().split()
+        if not words:
+            return []
+        keys = set()
+        for word in words:
+            keys.update(word[index : index + 3] for index in range(len(word) - 2))
+
+        names = self.names
+        if keys:
+            postings = [self.customersByKey.get(key) for key in keys]
+            if not all(postings):
+                return []
+            candidates = min(postings, key=len)
+        else:
+            candidates = names
+        countScanned("CustomerDirectory.search", "customers", len(candidates))
+
+        if len(keys) != 1 or len(words) > 1:
+            # A single trigram matches exactly, otherwise every word is checked in the name
+            def matches(customerNo):
+                name = names[customerNo].casefold()
+                return all(word in name for word in words)
+
+            candidates = filter(matches, candidates)
+        return [
+            (customerNo, names[customerNo])
+            for customerNo in heapq.nsmallest(
+                limit, candidates, key=lambda customerNo: (names[customerNo].casefold(), customerNo)
+            )
+        ]
+
+    def clear(self):
+        """
+        Method to remove every customer
+        """
+        self.names.clear()
+        self.customersByKey.clear()
+
+
+def parseDate(text: str) -> datetime.date:
+    """
+    Function to convert a date written as YYYY-MM-DD, raises ValueError with the message to show
+    """
+    try:
+        return datetime.date.fromisoformat(str(text).strip())
+    except ValueError:
+        raise ValueError("Please enter a valid date (YYYY-MM-DD).")
+
+
+def parsePrice(text) -> float:
+    """
+    Function to convert a price to a number, raises ValueError when it is not a finite number
+    """
+    price = float(text)
+    if not math.isfinite(price):
+        raise ValueError("Please enter a valid price.")
+    return price
+
+
+# Types of room the hotel offers
+ROOM_TYPES = ("Single", "Double", "Suite")
+
+
+def synchronized(method):
+    """
+    Decorator to run a method of the Hotel while holding the lock of the hotel, so the checks and the changes of
+    an operation are done without another desk changing the rooms in between
+    """
+
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock:
+            storage = self.storage
+            if storage is None or not storage.shared or self.changing:
+                return method(self, *args, **kwargs)
+            # The first operation of the thread also takes the lock of the other programs, and applies the changes
+            # they wrote since, so it checks and changes the same hotel they see
+            self.changing = True
+            try:
+                lock = storage.beginChange(self)
+                try:
+                    return method(self, *args, **kwargs)
+                finally:
+                    storage.endChange(self, lock)
+            finally:
+                self.changing = False
+
+    return locked
+
+
+# Creation of a class with the operations of the hotel
+class Hotel:
+
+    def __init__(self):
+        """
+        Constructor for Hotel class, where the rooms, the room allocations and the customer numbers are stored.
+        The methods apply the same validation rules as the menu, raising ValueError with the message to show
+        """
+        self.rooms = RoomRegistry()
+        # Current allocations, the rooms where the customer has checked in
+        self.allocations = AllocationIndex()
+        # Every stay by date, the current allocations and the future reservations
+        self.reservations = ReservationBook()
+        # Every customer with a stay, current or past, by customer number and searchable by name
+        self.customers = CustomerDirectory()
+        # Storage where every change is written, a Journal or an SQLiteStorage, None when the changes are not persisted
+        self.storage = None
+        # Lock held by every operation, reentrant because replaying a change calls the operations again
+        self.lock = threading.RLock()
+        # Lock held while the changes are written to disk
+        self.syncing = threading.Lock()
+        # True while an operation holds the lock of the programs sharing the storage
+        self.changing = False
+        # Allocations file saved from this hotel, it knows where each allocation is written
+        self.allocationFile = None
+        # History where every billed stay is kept, None when the stays are not kept
+        self.history = None
+
+    @synchronized
+    def addRoom(self, roomNumber: int, type: str, price: float):
+        """
+        Method to add a new room with the given room number, type and price per night
+        """
+        if roomNumber < 0:
+            raise ValueError("Please enter a valid room number.")
+        if roomNumber in self.rooms:
+            raise ValueError(
+                "Room number already exists. Please enter a different room number."
+            )
+        if type not in ROOM_TYPES:
+            raise ValueError("Please enter a valid room type (Single, Double, Suite).")
+        if not math.isfinite(price) or price <= 0:
+            raise ValueError("Please enter a valid price.")
+        room = self.rooms.add(Room(roomNumber, False, type, price))
+        self.record("added", room=roomNumber, type=type, price=price)
+        return room
+
+    @synchronized
+    def deleteRoom(self, roomNumber: int):
+        """
+        Method to delete a room, an allocated room takes its allocation with it
+        """
+        if roomNumber not in self.rooms:
+            raise ValueError("Please enter a valid room number.")
+        if roomNumber in self.allocations:
+            self.allocations.remove(roomNumber)
+        self.reservations.removeRoom(roomNumber)
+        room = self.rooms.delete(roomNumber)
+        self.record("deleted", room=roomNumber)
+        return room
+
+    @synchronized
+    def allocateRoom(
+        self,
+        roomNumber: int,
+        customerNo: int,
+        customerName: str,
+        checkOut: datetime.date = None,
+        today: datetime.date = None,
+    ):
+        """
+        Method to allocate a free room to a new customer from today until the check-out date, one night by default.
+        The stay cannot overlap a reservation of the room. Returns the RoomAllocation object
+        """
+        today = today or datetime.date.today()
+        checkOut = checkOut or today + datetime.timedelta(days=1)
+        room = self.rooms.get(roomNumber)
+        if room is None or room.isAllocated:
+            raise ValueError("Please enter a valid room number.")
+        if checkOut <= today:
+            raise ValueError("Please enter a check-out date after the check-in date.")
+        if customerNo in self.customers:
+            raise ValueError(
+                "Customer number already exists. Please enter a different customer number."
+            )
+        if not self.reservations.isAvailable(roomNumber, today, checkOut):
+            raise ValueError(f"Room {roomNumber} is reserved for part of the stay.")
+
+        allocation = RoomAllocation(
+            room, Customer(customerNo, customerName), today, checkOut
+        )
+        self.customers.add(customerNo, customerName)
+        self.reservations.add(allocation)
+        room.allocateRoom()
+        self.allocations.add(allocation)
+        self.record(
+            "allocated",
+            room=roomNumber,
+            customer=customerNo,
+            name=customerName,
+            checkIn=today.isoformat(),
+            checkOut=checkOut.isoformat(),
+        )
+        return allocation
+
+    @synchronized
+    def reserveRoom(
+        self,
+        roomNumber: int,
+        customerNo: int,
+        customerName: str,
+        checkIn: datetime.date,
+        checkOut: datetime.date,
+        today: datetime.date = None,
+    ):
+        """
+        Method to reserve a room for a new customer for future dates, the room is allocated when the customer checks in.
+        Returns the RoomAllocation object of the reservation
+        """
+        today = today or datetime.date.today()
+        room = self.rooms.get(roomNumber)
+        if room is None:
+            raise ValueError("Please enter a valid room number.")
+        if checkIn < today:
+            raise ValueError("Please enter a check-in date from today on.")
+        if checkOut <= checkIn:
+            raise ValueError("Please enter a check-out date after the check-in date.")
+        if customerNo in self.customers:
+            raise ValueError(
+                "Customer number already exists. Please enter a different customer number."
+            )
+        if not self.reservations.isAvailable(roomNumber, checkIn, checkOut):
+            raise ValueError(f"Room {roomNumber} is not free for those dates.")
+
+        allocation = RoomAllocation(
+            room, Customer(customerNo, customerName), checkIn, checkOut
+        )
+        self.customers.add(customerNo, customerName)
+        self.reservations.add(allocation)
+        self.record(
+            "reserved",
+            room=roomNumber,
+            customer=customerNo,
+            name=customerName,
+            checkIn=checkIn.isoformat(),
+            checkOut=checkOut.isoformat(),
+            on=today.isoformat(),
+        )
+        return allocation
+
+    @synchronized
+    def checkInReservation(self, customerNo: int, today: datetime.date = None):
+        """
+        Method to allocate the reserved room to the customer once the check-in date has arrived
+        """
+        today = today or datetime.date.today()
+        allocation = self.reservations.forCustomer(customerNo)
+        if allocation is None or self.isCheckedIn(allocation):
+            raise ValueError("The customer has no reservation to check in.")
+        if allocation.checkIn > today:
+            raise ValueError(f"The reservation starts on {allocation.checkIn}.")
+        room = allocation.allocatedRoom
+        if room.isAllocated:
+            raise ValueError(f"Room {room.roomNumber} is still allocated.")
+
+        room.allocateRoom()
+        self.allocations.add(allocation)
+        self.record("checkedIn", customer=customerNo, on=today.isoformat())
+        return allocation
+
+    @synchronized
+    def cancelReservation(self, customerNo: int):
+        """
+        Method to cancel a reservation the customer has not checked in yet
+        """
+        allocation = self.reservations.forCustomer(customerNo)
+        if allocation is None or self.isCheckedIn(allocation):
+            raise ValueError("The customer has no reservation to cancel.")
+        self.reservations.remove(allocation)
+        self.record("cancelled", customer=customerNo)
+        return allocation
+
+    def isCheckedIn(self, allocation: RoomAllocation) -> bool:
+        """
+        Method to check if the stay is a current allocation and not a future reservation
+        """
+        return self.allocations.forRoom(allocation.allocatedRoom.roomNumber) is allocation
+
+    @synchronized
+    def availableRooms(
+        self, checkIn: datetime.date, checkOut: datetime.date, type: str = None
+    ) -> list:
+        """
+        Method to get the room numbers, of the given type or of any type, free for every night of the stay
+        """
+        if checkOut <= checkIn:
+            raise ValueError("Please enter a check-out date after the check-in date.")
+        candidates = (
+            self.rooms.roomsByType.get(type, {}) if type is not None else self.rooms.rooms
+        )
+        return sorted(candidates.keys() - self.reservations.bookedRooms(checkIn, checkOut))
+
+    @synchronized
+    def bestFitRooms(
+        self,
+        count: int = 1,
+        type: str = None,
+        maxPrice: float = None,
+        checkOut: datetime.date = None,
+        today: datetime.date = None,
+    ) -> list:
+        """
+        Method to pick the free rooms that best fit a stay from today until the check-out date: the most expensive rooms
+        within the maximum price, so the cheaper rooms stay free for the customers that can only pay less.
+        The rooms of every type are merged by price when no type is given. Returns the room numbers
+        """
+        today = today or datetime.date.today()
+        checkOut = checkOut or today + datetime.timedelta(days=1)
+        if count <= 0:
+            raise ValueError("Please enter a valid number of rooms.")
+        if type is not None and type not in ROOM_TYPES:
+            raise ValueError("Please enter a valid room type (Single, Double, Suite).")
+        if maxPrice is not None and maxPrice <= 0:
+            raise ValueError("Please enter a valid price.")
+        if checkOut <= today:
+            raise ValueError("Please enter a check-out date after the check-in date.")
+
+        types = [type] if type is not None else list(self.rooms.freeRoomsByType)
+        queues = [
+            self.rooms.freeRoomsByType[type].bestFit(maxPrice)
+            for type in types
+            if type in self.rooms.freeRoomsByType
+        ]
+        candidates = heapq.merge(*queues, key=operator.itemgetter(0), reverse=True)
+        # A free room can still be reserved for some night of the stay, those are skipped
+        rooms = list(
+            itertools.islice(
+                (
+                    roomNumber
+                    for price, roomNumber in candidates
+                    if self.reservations.isAvailable(roomNumber, today, checkOut)
+                ),
+                count,
+            )
+        )
+        if len(rooms) < count:
+            raise ValueError(
+                f"Only {len(rooms)} room(s) available for that type and price, {count} needed."
+            )
+        return rooms
+
+    @synchronized
+    def autoAllocate(
+        self,
+        customers,
+        type: str = None,
+        maxPrice: float = None,
+        checkOut: datetime.date = None,
+        today: datetime.date = None,
+    ) -> list:
+        """
+        Method to allocate the best fitting rooms to a group of new customers, given as (customer number, customer name)
+        pairs, one room for each. Either every customer gets a room or none does. Returns the RoomAllocation objects
+        """
+        today = today or datetime.date.today()
+        customers = list(customers)
+        customerNumbers = [customerNo for customerNo, _ in customers]
+        if len(set(customerNumbers)) != len(customerNumbers) or any(
+            customerNo in self.customers for customerNo in customerNumbers
+        ):
+            raise ValueError(
+                "Customer number already exists. Please enter a different customer number."
+            )
+        rooms = self.bestFitRooms(len(customers), type, maxPrice, checkOut, today)
+        return [
+            self.allocateRoom(roomNumber, customerNo, customerName, checkOut, today)
+            for roomNumber, (customerNo, customerName) in zip(rooms, customers)
+        ]
+
+    @synchronized
+    def billRoom(self, roomNumber: int, nights: int = None) -> float:
+        """
+        Method to calculate the billing of an allocated room and deallocate it, returns the total billing.
+        The nights until today or until the check-out date, if it is earlier, are used unless other nights are given
+        """
+        allocation = self.allocations.forRoom(roomNumber)
+        if allocation is None:
+            raise ValueError("Please enter a valid room number.")
+        if nights is None:
+            nights = allocation.billedNights(datetime.date.today())
+        if nights <= 0:
+            raise ValueError("Please enter a valid number of nights.")
+
+        self.allocations.remove(roomNumber)
+        if self.reservations.forCustomer(allocation.allocatedCustomer.customerNo) is allocation:
+            self.reservations.remove(allocation)
+        allocation.allocatedRoom.deallocateRoom()
+        total = allocation.allocatedRoom.price * nights
+        self.record("billed", room=roomNumber, nights=nights, total=total)
+        if self.history is not None:
+            self.history.append(allocation, nights, total, datetime.datetime.now())
+        return total
+
+    def sync(self):
+        """
+        Method to write the changes waiting in the storage to disk. Only the quick part, taking the waiting changes,
+        is done while holding the lock of the hotel. The slow write to disk is done after releasing it, so the
+        other desks can keep working, and one sync at a time is done so the changes are written in order
+        """
+        with self.syncing:
+            with self.lock:
+                write = self.storage.prepareSync() if self.storage is not None else noSync
+                writeHistory = self.history.prepareFlush() if self.history is not None else noSync
+                # The snapshot is taken with the lock, and written with the changes before it. A shared journal is
+                # only compacted by record(), while holding the lock of the changes, otherwise the snapshot could
+                # miss the changes another program appended and the compaction would remove them with the journal
+                compact = noSync
+                if (
+                    self.storage is not None
+                    and not self.storage.shared
+                    and self.storage.needsCompaction()
+                ):
+                    compact = self.storage.prepareCompact(self.snapshotState())
+            write()
+            writeHistory()
+            compact()
+
+    def record(self, event: str, **fields):
+        """
+        Method to write a change to the storage, compacting it into a snapshot when it grows too long.
+        When the storage does not sync itself the compaction is left to the next sync
+        """
+        if self.storage is None:
+            return
+        self.storage.append(event, fields)
+        if self.storage.autoSync and self.storage.needsCompaction():
+            self.storage.compact(self.snapshotState())
+
+    @synchronized
+    def snapshotState(self) -> dict:
+        """
+        Method to get the rooms, room allocations and customers as plain values to write a snapshot
+        """
+        return {
+            "rooms": [
+                [room.roomNumber, room.type, room.price, room.isAllocated]
+                for room in self.rooms
+            ],
+            "allocations": [
+                [
+                    allocation.allocatedRoom.roomNumber,
+                    allocation.allocatedCustomer.customerNo,
+                    allocation.allocatedCustomer.customerName,
+                    allocation.checkIn.toordinal(),
+                    allocation.checkOut.toordinal(),
+                    self.isCheckedIn(allocation),
+                ]
+                for allocation in self.reservations
+            ],
+            "customers": list(self.customers),
+            "customerNames": list(self.customers.names.values()),
+        }
+
+    @synchronized
+    def restoreState(self, state: dict):
+        """
+        Method to replace the rooms, room allocations and customers with the ones of a snapshot
+        """
+        self.rooms.clear()
+        self.allocations.clear()
+        self.reservations.clear()
+        self.customers.clear()
+
+        # The garbage collector is paused while the objects are created, otherwise it walks
+        # every new object again and again while nothing can be freed
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            self._restoreObjects(state)
+        finally:
+            if collecting:
+                gc.enable()
+
+    def _restoreObjects(self, state: dict):
+        # Create the Room, Customer and RoomAllocation objects of a snapshot
+        self.rooms.load(
+            Room(roomNumber, isAllocated, type, price)
+            for roomNumber, type, price, isAllocated in state["rooms"]
+        )
+        names = dict(zip(state["customers"], state["customerNames"]))
+        for roomNumber, customerNo, customerName, checkIn, checkOut, checkedIn in state["allocations"]:
+            names[customerNo] = customerName
+            allocation = self.reservations.add(
+                RoomAllocation(
+                    self.rooms.get(roomNumber),
+                    Customer(customerNo, customerName),
+                    datetime.date.fromordinal(checkIn),
+                    datetime.date.fromordinal(checkOut),
+                )
+            )
+            if checkedIn:
+                self.allocations.add(allocation)
+        self.customers.load(names.items())
+
+    @synchronized
+    def findCustomers(self, text: str, limit: int = SEARCH_LIMIT) -> list:
+        """
+        Method to find customers by customer number or by part of their name. Returns up to limit
+        (customer number, customer name, stay) tuples, the stay is the current allocation or reservation, or None
+        """
+        found = self.customers.search(text, limit)
+        text = text.strip()
+        if text.isdigit() and int(text) in self.customers:
+            customerNo = int(text)
+            found = [(customerNo, self.customers.get(customerNo))] + [
+                match for match in found if match[0] != customerNo
+            ][: limit - 1]
+        return [
+            (customerNo, customerName, self.reservations.forCustomer(customerNo))
+            for customerNo, customerName in found
+        ]
+
+    @synchronized
+    def refresh(self):
+        """
+        Method to apply the changes written by the other programs sharing the storage, the operations do it
+        themselves, so it is only needed before showing the hotel
+        """
+
+    @synchronized
+    def applyEvent(self, event: dict):
+        """
+        Method to apply a change read from the journal, used to replay it on startup
+        """
+        kind = event["event"]
+        if kind == "added":
+            self.addRoom(event["room"], event["type"], event["price"])
+        elif kind == "deleted":
+            self.deleteRoom(event["room"])
+        elif kind == "allocated":
+            # The dates of the journal are used, so replaying on another day gives the same stay
+            self.allocateRoom(
+                event["room"],
+                event["customer"],
+                event["name"],
+                parseDate(event["checkOut"]) if "checkOut" in event else None,
+                parseDate(event["checkIn"]) if "checkIn" in event else None,
+            )
+        elif kind == "reserved":
+            self.reserveRoom(
+                event["room"],
+                event["customer"],
+                event["name"],
+                parseDate(event["checkIn"]),
+                parseDate(event["checkOut"]),
+                parseDate(event["on"]),
+            )
+        elif kind == "checkedIn":
+            self.checkInReservation(event["customer"], parseDate(event["on"]))
+        elif kind == "cancelled":
+            self.cancelReservation(event["customer"])
+        elif kind == "billed":
+            self.billRoom(event["room"], event["nights"])
+        else:
+            raise ValueError(f"Unknown journal event '{kind}'.")
+
+
+def noSync():
+    # Sync function of a storage without waiting changes
+    pass
+
+
+# Quantity of changes written before the journal is synced to disk
+JOURNAL_FSYNC_EVERY = 256
+
+# Maximum seconds a change waits in the journal before it is synced to disk
+JOURNAL_FSYNC_INTERVAL = 0.5
+
+# Quantity of changes in the journal before it is compacted into a snapshot
+JOURNAL_COMPACT_EVERY = 50000
+
+# Encoder of the journal lines, created once because json.dumps builds a new one for every call with separators
+journalEncoder = json.JSONEncoder(separators=(",", ":"))
+
+
+# Creation of a class for the append-only journal of changes
+class Journal:
+
+    def __init__(
+        self,
+        path: str,
+        snapshotPath: str,
+        fsyncEvery: int = JOURNAL_FSYNC_EVERY,
+        fsyncInterval: float = JOURNAL_FSYNC_INTERVAL,
+        compactEvery: int = JOURNAL_COMPACT_EVERY,
+    ):
+        """
+        Constructor for Journal class, where every change is appended to the journal file as a JSON line
+        with an increasing sequence number. The journal is synced to disk in groups of changes and
+        compacted into a snapshot of the whole hotel once it grows too long
+        """
+        self.path = path
+        self.snapshotPath = snapshotPath
+        self.fsyncEvery = fsyncEvery
+        self.fsyncInterval = fsyncInterval
+        self.compactEvery = compactEvery
+        # Sequence number of the last change written
+        self.sequence = 0
+        # Quantity of changes written since the last snapshot and since the last sync
+        self.eventsSinceSnapshot = 0
+        self.pendingSync = 0
+        self.lastSync = perf_counter()
+        self.file = None
+        # Advisory lock on the journal, held while it is open so another program cannot write to it
+        self.lock = None
+        # False when another thread syncs and compacts the journal, as the service does, so appending only buffers
+        self.autoSync = True
+        # True when several programs use the journal at once, each change is then made holding the lock of the
+        # changes, after reading the end of the journal written by the others
+        self.shared = False
+        # Journal file read by this program, by device and inode, and the bytes of it already applied
+        self.identity = None
+        self.offset = 0
+
+    def open(self):
+        """
+        Method to open the journal file to append the changes
+        """
+        if self.file is None:
+            self.file = open(self.path, "ab")
+
+    def append(self, event: str, fields: dict):
+        """
+        Method to append a change to the journal, the file is synced when enough changes are waiting
+        """
+        self.open()
+        self.sequence += 1
+        fields["seq"] = self.sequence
+        fields["event"] = event
+        line = journalEncoder.encode(fields).encode() + b"\n"
+        self.file.write(line)
+        countBytes("journal", "written", len(line))
+        self.eventsSinceSnapshot += 1
+        self.pendingSync += 1
+        if self.autoSync and (
+            self.pendingSync >= self.fsyncEvery
+            or perf_counter() - self.lastSync >= self.fsyncInterval
+        ):
+            self.sync()
+
+    def sync(self):
+        """
+        Method to write the waiting changes to disk
+        """
+        self.prepareSync()()
+
+    def prepareSync(self):
+        """
+        Method to pass the waiting changes to the operating system, returns the function that syncs them to disk.
+        The function uses a copy of the file descriptor, so it can run while the journal goes on or is compacted
+        """
+        pending = self.file is not None and self.pendingSync
+        self.pendingSync = 0
+        self.lastSync = perf_counter()
+        if not pending:
+            return noSync
+        self.file.flush()
+        descriptor = os.dup(self.file.fileno())
+
+        def write():
+            try:
+                os.fsync(descriptor)
+            finally:
+                os.close(descriptor)
+
+        return write
+
+    def needsCompaction(self) -> bool:
+        return self.eventsSinceSnapshot >= self.compactEvery
+
+    def compact(self, state: dict):
+        """
+        Method to write a snapshot of the whole hotel and empty the journal.
+        The snapshot is written to a temporary file and renamed, so a crash leaves either the old or the new one,
+        and it records the sequence number it covers, so the changes still in the journal are not applied twice
+        """
+        self.sync()
+        self.prepareCompact(state)()
+
+    def prepareCompact(self, state: dict):
+        """
+        Method to start a compaction: the journal is moved aside and the following changes go to a new one. Returns
+        the function that writes the snapshot and then removes the old journal, which can run while the hotel goes on
+        """
+        state["sequence"] = self.sequence
+        oldPath = self.path + ".old"
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if os.path.exists(oldPath):
+            # A compaction that did not finish left its journal, its changes wait for this snapshot too
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as source, open(oldPath, "ab") as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(self.path)
+        elif os.path.exists(self.path):
+            os.replace(self.path, oldPath)
+        self.file = open(self.path, "ab")
+        self.eventsSinceSnapshot = 0
+
+        def write():
+            writeSnapshot(self.snapshotPath, state)
+            # Once the snapshot is safe the changes before it are not needed
+            if os.path.exists(oldPath):
+                os.remove(oldPath)
+
+        return write
+
+    def replay(self, target: Hotel) -> int:
+        """
+        Method to rebuild the hotel from the snapshot and the changes appended after it, returns the quantity
+        of changes replayed. A last line left incomplete by a crash is cut from the journal
+        """
+        state = readSnapshot(self.snapshotPath)
+        if state is not None:
+            target.restoreState(state)
+            self.sequence = state["sequence"]
+
+        # A compaction stopped before its snapshot was written leaves the journal it moved aside
+        replayed = self.replayFile(self.path + ".old", target)[0]
+        self.identity = None
+        self.offset = 0
+        self.eventsSinceSnapshot = 0
+        self.replayTail(target)
+        self.eventsSinceSnapshot += replayed
+        return self.eventsSinceSnapshot
+
+    def replayTail(self, target: Hotel):
+        """
+        Method to apply the changes appended to the journal file after the bytes already applied, a last line left
+        incomplete by a crash is cut from the journal
+        """
+        try:
+            status = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        replayed, validBytes = self.replayFile(self.path, target, self.offset)
+        if status.st_size > validBytes:
+            os.truncate(self.path, validBytes)
+        self.identity = (status.st_dev, status.st_ino)
+        self.offset = validBytes
+        self.eventsSinceSnapshot += replayed
+
+    def replayFile(self, path: str, target: Hotel, start: int = 0):
+        """
+        Method to apply the changes of a journal file newer than the snapshot from the given byte, returns the
+        quantity of changes applied and the byte where the complete lines end
+        """
+        replayed = 0
+        validBytes = start
+        try:
+            with open(path, "rb") as file:
+                file.seek(start)
+                for line in file:
+                    # A line without end or that is not valid JSON was being written when the program stopped
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break
+                    validBytes += len(line)
+                    # Changes already included in the snapshot are skipped
+                    if event["seq"] <= self.sequence:
+                        continue
+                    target.applyEvent(event)
+                    self.sequence = event["seq"]
+                    replayed += 1
+        except FileNotFoundError:
+            pass
+        return replayed, validBytes
+
+    def beginChange(self, target: Hotel):
+        """
+        Method to start a change of a hotel shared with other programs: the lock of the changes is taken and the
+        changes the others wrote since are applied. Returns the lock, to give to endChange
+        """
+        lock = lockFile(self.path + ".changes")
+        try:
+            self.catchUp(target)
+        except BaseException:
+            lock.close()
+            raise
+        return lock
+
+    def endChange(self, target: Hotel, lock):
+        """
+        Method to end a change of a shared hotel: its lines and stays are passed to the operating system, so the
+        other programs read them, before the lock of the changes is released
+        """
+        try:
+            if self.file is not None:
+                self.file.flush()
+                status = os.fstat(self.file.fileno())
+                self.identity = (status.st_dev, status.st_ino)
+                self.offset = status.st_size
+            if target.history is not None:
+                target.history.flush()
+        finally:
+            lock.close()
+
+    def catchUp(self, target: Hotel):
+        """
+        Method to apply the changes written to the journal by the other programs. When another program compacted
+        the journal the hotel is rebuilt from the new snapshot
+        """
+        # The changes were recorded by the program that made them, so they are applied without recording them again
+        storage, history = target.storage, target.history
+        target.storage = target.history = None
+        try:
+            try:
+                status = os.stat(self.path)
+                identity = (status.st_dev, status.st_ino)
+            except FileNotFoundError:
+                status = identity = None
+            if identity != self.identity or (status is not None and status.st_size < self.offset):
+                if self.file is not None:
+                    self.file.close()
+                    self.file = None
+                target.restoreState({"rooms": [], "allocations": [], "customers": [], "customerNames": []})
+                self.sequence = 0
+                self.replay(target)
+            elif status is not None and status.st_size > self.offset:
+                self.replayTail(target)
+        finally:
+            target.storage, target.history = storage, history
+        if history is not None:
+            history.catchUp()
+
+    def close(self):
+        """
+        Method to sync the waiting changes and close the journal file
+        """
+        self.sync()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.lock is not None:
+            self.lock.close()
+            self.lock = None
+
+
+# Quantity of changes kept in memory before they are written to the database in one transaction
+SQLITE_FLUSH_EVERY = 10000
+
+# Tables and indexes of the database: the rooms by room number and status, the stays (current allocations
+# and future reservations) by customer number and room number, and every customer with their name
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    room_number INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    price REAL NOT NULL,
+    is_allocated INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS rooms_by_status ON rooms (is_allocated);
+CREATE TABLE IF NOT EXISTS stays (
+    customer_no INTEGER PRIMARY KEY,
+    room_number INTEGER NOT NULL,
+    customer_name TEXT NOT NULL,
+    check_in TEXT NOT NULL,
+    check_out TEXT NOT NULL,
+    checked_in INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS stays_by_room ON stays (room_number, checked_in);
+CREATE TABLE IF NOT EXISTS customers (
+    customer_no INTEGER PRIMARY KEY,
+    customer_name TEXT NOT NULL DEFAULT ''
+);
+"""
+
+# Statements run for each change, with the function that takes their parameters from the change.
+# The text of the statements never changes, so sqlite3 prepares each one once and keeps it in its cache
+SQLITE_STATEMENTS = {
+    "added": (
+        (
+            "INSERT INTO rooms (room_number, type, price) VALUES (?, ?, ?)",
+            operator.itemgetter("room", "type", "price"),
+        ),
+    ),
+    "deleted": (
+        ("DELETE FROM stays WHERE room_number = ?", lambda event: (event["room"],)),
+        ("DELETE FROM rooms WHERE room_number = ?", lambda event: (event["room"],)),
+    ),
+    "allocated": (
+        (
+            "INSERT INTO customers (customer_no, customer_name) VALUES (?, ?)",
+            operator.itemgetter("customer", "name"),
+        ),
+        (
+            "INSERT INTO stays (customer_no, room_number, customer_name, check_in, check_out, checked_in) "
+            "VALUES (?, ?, ?, ?, ?, 1)",
+            operator.itemgetter("customer", "room", "name", "checkIn", "checkOut"),
+        ),
+        (
+            "UPDATE rooms SET is_allocated = 1 WHERE room_number = ?",
+            lambda event: (event["room"],),
+        ),
+    ),
+    "reserved": (
+        (
+            "INSERT INTO customers (customer_no, customer_name) VALUES (?, ?)",
+            operator.itemgetter("customer", "name"),
+        ),
+        (
+            "INSERT INTO stays (customer_no, room_number, customer_name, check_in, check_out) "
+            "VALUES (?, ?, ?, ?, ?)",
+            operator.itemgetter("customer", "room", "name", "checkIn", "checkOut"),
+        ),
+    ),
+    "checkedIn": (
+        (
+            "UPDATE stays SET checked_in = 1 WHERE customer_no = ?",
+            lambda event: (event["customer"],),
+        ),
+        (
+            "UPDATE rooms SET is_allocated = 1 "
+            "WHERE room_number = (SELECT room_number FROM stays WHERE customer_no = ?)",
+            lambda event: (event["customer"],),
+        ),
+    ),
+    "cancelled": (
+        ("DELETE FROM stays WHERE customer_no = ?", lambda event: (event["customer"],)),
+    ),
+    "billed": (
+        (
+            "DELETE FROM stays WHERE room_number = ? AND checked_in = 1",
+            lambda event: (event["room"],),
+        ),
+        (
+            "UPDATE rooms SET is_allocated = 0 WHERE room_number = ?",
+            lambda event: (event["room"],),
+        ),
+    ),
+}
+
+
+# Creation of a class for the storage of the hotel in an SQLite database
+class SQLiteStorage:
+
+    def __init__(self, path: str, flushEvery: int = SQLITE_FLUSH_EVERY):
+        """
+        Constructor for SQLiteStorage class, where the rooms, stays and customer numbers are kept in tables
+        that can be queried. It has the same methods as the Journal, so the Hotel writes every change through
+        either of them. The changes wait in memory and are written in one transaction, grouping the changes
+        of the same kind in a single executemany
+        """
+        self.path = path
+        self.flushEvery = flushEvery
+        # Changes not written to the database yet, as (event, fields) pairs
+        self.pending = []
+        self.connection = None
+        # Advisory lock on the database, held while it is open so another program cannot write to it
+        self.lock = None
+        # False when another thread writes the changes, as the service does, so appending only buffers
+        self.autoSync = True
+        # The database is only used by one program at a time
+        self.shared = False
+
+    def open(self):
+        """
+        Method to open the database in WAL mode and create the tables and indexes it does not have yet
+        """
+        if self.connection is None:
+            # Transactions are started explicitly, so a whole group of changes is one commit
+            # The changes can be written from another thread than the one that opened it
+            self.connection = sqlite3.connect(
+                self.path, isolation_level=None, check_same_thread=False
+            )
+            # With the write-ahead log a commit appends to the log instead of rewriting the pages,
+            # and NORMAL only syncs the log at checkpoints, which is still safe in WAL mode
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(SQLITE_SCHEMA)
+
+    def append(self, event: str, fields: dict):
+        """
+        Method to add a change to the ones waiting, they are written when enough changes are waiting
+        """
+        self.pending.append((event, fields))
+        if self.autoSync and len(self.pending) >= self.flushEvery:
+            self.sync()
+
+    def sync(self):
+        """
+        Method to write the waiting changes to the database in one transaction
+        """
+        self.prepareSync()()
+
+    def prepareSync(self):
+        """
+        Method to take the waiting changes, returns the function that writes them to the database
+        """
+        if not self.pending:
+            return noSync
+        changes = self.pending
+        self.pending = []
+        return functools.partial(self.writeChanges, changes)
+
+    def writeChanges(self, changes: list):
+        """
+        Method to write the given changes to the database in one transaction, if it fails they wait again
+        """
+        self.open()
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN")
+        try:
+            # Consecutive changes of the same kind touch different rows, so each statement is run for
+            # all of them at once, which keeps the order of the changes
+            for event, group in itertools.groupby(changes, key=operator.itemgetter(0)):
+                fields = [change[1] for change in group]
+                for statement, parameters in SQLITE_STATEMENTS[event]:
+                    cursor.executemany(statement, map(parameters, fields))
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            self.pending[:0] = changes
+            raise
+        cursor.execute("COMMIT")
+
+    def needsCompaction(self) -> bool:
+        # The database is updated in place, it never needs a snapshot
+        return False
+
+    def compact(self, state: dict):
+        """
+        Method to write the waiting changes and move the write-ahead log into the database file
+        """
+        self.sync()
+        self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def prepareCompact(self, state: dict):
+        return functools.partial(self.compact, state)
+
+    def replay(self, target: Hotel) -> int:
+        """
+        Method to rebuild the hotel from the tables of the database, returns the quantity of rooms loaded
+        """
+        self.open()
+        execute = self.connection.execute
+        state = {
+            "rooms": [
+                [roomNumber, type, price, bool(isAllocated)]
+                for roomNumber, type, price, isAllocated in execute(
+                    "SELECT room_number, type, price, is_allocated FROM rooms ORDER BY room_number"
+                )
+            ],
+            # The dates are turned into ordinals by the database, the julian day of 0001-01-01 is 1721425.5
+            "allocations": [
+                [roomNumber, customerNo, customerName, checkIn, checkOut, bool(checkedIn)]
+                for roomNumber, customerNo, customerName, checkIn, checkOut, checkedIn in execute(
+                    "SELECT room_number, customer_no, customer_name, "
+                    "CAST(julianday(check_in) - 1721424.5 AS INTEGER), "
+                    "CAST(julianday(check_out) - 1721424.5 AS INTEGER), checked_in "
+                    "FROM stays ORDER BY room_number, check_in"
+                )
+            ],
+        }
+        state["customers"], state["customerNames"] = [], []
+        for customerNo, customerName in execute("SELECT customer_no, customer_name FROM customers"):
+            state["customers"].append(customerNo)
+            state["customerNames"].append(customerName)
+        target.restoreState(state)
+        return len(state["rooms"])
+
+    def stayOfCustomer(self, customerNo: int):
+        """
+        Method to find the stay of a customer in the database, returns a row with the room number, customer name,
+        check-in and check-out dates and if the customer checked in, or None
+        """
+        self.sync()
+        self.open()
+        return self.connection.execute(
+            "SELECT room_number, customer_name, check_in, check_out, checked_in "
+            "FROM stays WHERE customer_no = ?",
+            (customerNo,),
+        ).fetchone()
+
+    def close(self):
+        """
+        Method to write the waiting changes and close the database
+        """
+        self.sync()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        if self.lock is not None:
+            self.lock.close()
+            self.lock = None
+
+
+# Header of the binary snapshot: magic, version, byte order, quantity of room types, sequence number,
+# quantity of rooms, room allocations and customers
+SNAPSHOT_HEADER = struct.Struct("<4sHBBQIII")
+SNAPSHOT_MAGIC = b"LHMS"
+SNAPSHOT_VERSION = 1
+
+
+def packNames(names):
+    """
+    Function to pack names one after another, with the offset where each one starts and where the last one ends
+    """
+    encoded = [name.encode() for name in names]
+    offsets = array.array("I", [0])
+    for name in encoded:
+        offsets.append(offsets[-1] + len(name))
+    return offsets, b"".join(encoded)
+
+
+def writeSnapshot(path: str, state: dict):
+    """
+    Function to write a snapshot of the hotel, replacing the previous one atomically.
+    The snapshot is binary: after the header and the table of room types, every field is stored as a packed
+    array (room numbers, prices, type codes, statuses, ...), each one aligned to 8 bytes so it can be read
+    straight from a memory map
+    """
+    rooms = state["rooms"]
+    allocations = state["allocations"]
+    customers = state["customers"]
+
+    # Room types are stored once in a table, each room keeps the position of its type
+    types = list(ROOM_TYPES)
+    typeCodes = {type: code for code, type in enumerate(types)}
+    for room in rooms:
+        if room[1] not in typeCodes:
+            typeCodes[room[1]] = len(types)
+            types.append(room[1])
+
+    # Names of the customers are stored one after another, with the offset where each one starts
+    nameOffsets, names = packNames(allocation[2] for allocation in allocations)
+    customerNameOffsets, customerNames = packNames(state["customerNames"])
+
+    sections = [
+        array.array("q", [room[0] for room in rooms]),
+        array.array("d", [room[2] for room in rooms]),
+        array.array("B", [typeCodes[room[1]] for room in rooms]),
+        array.array("B", [room[3] for room in rooms]),
+        array.array("q", [allocation[0] for allocation in allocations]),
+        array.array("q", [allocation[1] for allocation in allocations]),
+        # Dates of the stays as day numbers, and whether the customer has checked in
+        array.array("i", [allocation[3] for allocation in allocations]),
+        array.array("i", [allocation[4] for allocation in allocations]),
+        array.array("B", [allocation[5] for allocation in allocations]),
+        nameOffsets,
+        names,
+        array.array("q", customers),
+        customerNameOffsets,
+        customerNames,
+    ]
+
+    typeTable = b"".join(bytes([len(type.encode())]) + type.encode() for type in types)
+
+    temporaryPath = path + ".tmp"
+    with open(temporaryPath, "wb") as file:
+        file.write(
+            SNAPSHOT_HEADER.pack(
+                SNAPSHOT_MAGIC,
+                SNAPSHOT_VERSION,
+                0 if sys.byteorder == "little" else 1,
+                len(types),
+                state["sequence"],
+                len(rooms),
+                len(allocations),
+                len(customers),
+            )
+        )
+        file.write(typeTable)
+        for section in sections:
+            # Padding so every section starts on a multiple of 8 bytes
+            file.write(b"\0" * (-file.tell() % 8))
+            file.write(section)
+        file.flush()
+        os.fsync(file.fileno())
+        countBytes("snapshot", "written", file.tell())
+    os.replace(temporaryPath, path)
+
+
+def readSnapshot(path: str):
+    """
+    Function to read a snapshot of the hotel through a memory map, returns None if there is no snapshot.
+    The rooms and allocations are returned as iterators over the packed arrays, so no intermediate lists are built
+    """
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with file:
+        # An empty file cannot be memory mapped
+        if os.fstat(file.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            countBytes("snapshot", "read", len(data))
+            return unpackSnapshot(data)
+
+
+def unpackSnapshot(data) -> dict:
+    """
+    Function to unpack a binary snapshot from a buffer, copying each packed array out of it in one step
+    """
+    (
+        magic,
+        version,
+        byteOrder,
+        typeCount,
+        sequence,
+        roomCount,
+        allocationCount,
+        customerCount,
+    ) = SNAPSHOT_HEADER.unpack_from(data, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError("The snapshot file is not valid.")
+
+    offset = SNAPSHOT_HEADER.size
+    types = []
+    for _ in range(typeCount):
+        length = data[offset]
+        types.append(bytes(data[offset + 1 : offset + 1 + length]).decode())
+        offset += 1 + length
+
+    view = memoryview(data)
+
+    def readArray(typecode: str, count: int):
+        # Each section starts on a multiple of 8 bytes
+        nonlocal offset
+        offset += -offset % 8
+        values = array.array(typecode)
+        values.frombytes(view[offset : offset + count * values.itemsize])
+        offset += count * values.itemsize
+        # Arrays written on a machine with the other byte order are swapped
+        if byteOrder != (0 if sys.byteorder == "little" else 1):
+            values.byteswap()
+        return values
+
+    roomNumbers = readArray("q", roomCount)
+    prices = readArray("d", roomCount)
+    typeCodes = readArray("B", roomCount)
+    statuses = readArray("B", roomCount)
+    allocationRooms = readArray("q", allocationCount)
+    allocationCustomers = readArray("q", allocationCount)
+    checkIns = readArray("i", allocationCount)
+    checkOuts = readArray("i", allocationCount)
+    checkedIns = readArray("B", allocationCount)
+
+    def readNames(count: int) -> list:
+        # The names are also a section, so they start on a multiple of 8 bytes
+        nonlocal offset
+        nameOffsets = readArray("I", count + 1)
+        offset += -offset % 8
+        namesBlob = bytes(view[offset : offset + nameOffsets[-1]])
+        offset += nameOffsets[-1]
+        return [namesBlob[nameOffsets[i] : nameOffsets[i + 1]].decode() for i in range(count)]
+
+    names = readNames(allocationCount)
+    customers = readArray("q", customerCount)
+    customerNames = readNames(customerCount)
+    view.release()
+
+    return {
+        "sequence": sequence,
+        "rooms": zip(
+            roomNumbers, map(types.__getitem__, typeCodes), prices, map(bool, statuses)
+        ),
+        "allocations": zip(
+            allocationRooms, allocationCustomers, names, checkIns, checkOuts, map(bool, checkedIns)
+        ),
+        "customers": customers,
+        "customerNames": customerNames,
+    }
+
+
+# VARIABLES USED IN THE PROGRAM
+
+# Hotel where the rooms and the room allocations are stored
+hotel = Hotel()
+
+# Registry where the Room objects are stored
+roomRegistry = hotel.rooms
+
+# Set of Customer numbers
+listOfCustomerNumbers = hotel.customers
+
+# Quantity of rooms, initialized as 0
+noOfRooms = 0
+
+# Index where the RoomAllocation objects are stored by room and by customer
+roomAllocations = hotel.allocations
+
+# Path to the file where the data is stored
+filePath = os.path.join(os.getcwd(), "LHMS_764707603.txt")
+
+# Paths to the journal of changes and to the snapshot it is compacted into
+journalPath = os.path.join(os.getcwd(), "LHMS_764707603.journal")
+snapshotPath = os.path.join(os.getcwd(), "LHMS_764707603.snapshot")
+
+# Path to the SQLite database, used instead of the journal when it is chosen on the command line
+databasePath = os.path.join(os.getcwd(), "LHMS_764707603.db")
+
+# Path to the directory where the history of the billed stays is kept
+historyPath = os.path.join(os.getcwd(), "LHMS_764707603_history")
+
+# Start of the name of the backup files, followed by the date and time of the backup
+backupPrefix = os.path.join(os.getcwd(), "LHMS_764707603_Backup_")
+
+
+def storagePath(path: str, directory: str = None) -> str:
+    """
+    Function to get the path of one of the files of the hotel kept in another directory, with the same name.
+    Without a directory the path is used as it is
+    """
+    return path if directory is None else os.path.join(directory, os.path.basename(path))
+
+# Compress the backups with gzip, and quantity of backups kept, the older ones are deleted
+backupCompression = False
+backupRetention = 30
+
+
+"""
+        ### MENU INPUT ###
+Functions used to ask the user for the answers of the menu options, one field at a time
+"""
+
+
+# Creation of a class for a field asked to the user
+class Field:
+    __slots__ = ("name", "prompt", "parse", "check", "invalid")
+
+    def __init__(self, name: str, prompt, parse=int, check=None, invalid: str = "Please enter a valid number."):
+        """
+        Constructor for Field class, with the text asked to the user, or a function that makes it from the answers
+        already given, the function that turns the answer into a value and raises ValueError when it cannot,
+        and the function that checks the value against the answers already given, returning the message to show
+        when it is not valid or None. The invalid message is shown when the answer cannot be turned into a value,
+        the message of the ValueError is shown when there is none
+        """
+        self.name = name
+        self.prompt = prompt
+        self.parse = parse
+        self.check = check
+        self.invalid = invalid
+
+    def ask(self, values: dict = None):
+        """
+        Method to ask the field until the answer is valid. A wrong answer only asks this field again, in a loop,
+        so the stack does not grow however many wrong answers are given
+        """
+        values = values if values is not None else {}
+        prompt = self.prompt(values) if callable(self.prompt) else self.prompt
+        while True:
+            try:
+                value = self.parse(input(prompt))
+            except ValueError as error:
+                print(self.invalid or error)
+                continue
+            message = self.check(value, values) if self.check is not None else None
+            if message is None:
+                return value
+            print(message)
+
+
+# Creation of a class for the fields asked by a menu option
+class Form:
+
+    def __init__(self, fields: list):
+        """
+        Constructor for Form class, where the answers of the fields are kept as they are given, so a form
+        left in the middle goes on from the first field without an answer
+        """
+        self.fields = fields
+        self.values = {}
+
+    def fill(self) -> dict:
+        """
+        Method to ask the fields without an answer, returns the answers by field name
+        """
+        for field in self.fields:
+            if field.name not in self.values:
+                self.values[field.name] = field.ask(self.values)
+        return self.values
+
+    def submit(self, action, retry=()):
+        """
+        Method to fill the form and pass the answers to action. When action refuses them with a ValueError its
+        message is shown and only the retry fields are asked again. Returns the result of action
+        """
+        while True:
+            values = self.fill()
+            try:
+                return action(values)
+            except ValueError as error:
+                print(f"\n{error}")
+                print("Change the answers below, or press Ctrl-C to go back to the menu.")
+                for name in retry:
+                    self.values.pop(name, None)
+
+
+# Forms of the menu options left unfinished when the user went back to the menu, by name
+unfinishedForms = {}
+
+
+def openForm(name: str, fields: list, resume: bool = True) -> Form:
+    """
+    Function to get the form of a menu option. A form left unfinished is continued when the user wants it,
+    the forms inside it, named after it, are continued or started again with it
+    """
+    form = unfinishedForms.get(name)
+    if form is not None and form.values:
+        if not resume:
+            return form
+        answer = Field(
+            "resume",
+            "Continue with the answers given before? (y/n): ",
+            parse=lambda text: text.strip().lower(),
+            check=lambda value, values: None if value in ("y", "n") else "Please enter y or n.",
+        ).ask()
+        if answer == "y":
+            return form
+    for other in [other for other in unfinishedForms if other.startswith(name + ".")]:
+        del unfinishedForms[other]
+    form = unfinishedForms[name] = Form(fields)
+    return form
+
+
+def closeForm(name: str):
+    """
+    Function to forget the form of a menu option once it is finished
+    """
+    unfinishedForms.pop(name, None)
+
+
+def optional(parse):
+    # The answer can be left empty, which gives None
+    return lambda text: parse(text) if text.strip() else None
+
+
+def checkNotNegative(value, values):
+    return None if value >= 0 else "Please enter a valid number."
+
+
+def checkNewRoom(value, values):
+    if value in roomRegistry:
+        return "Room number already exists. Please enter a different room number."
+    if value < 0:
+        return "Please enter a valid room number."
+    return None
+
+
+def checkRoomType(value, values):
+    return None if value in ROOM_TYPES else "Please enter a valid room type (Single, Double, Suite)."
+
+
+def checkPrice(value, values):
+    return None if value is None or (math.isfinite(value) and value > 0) else "Please enter a valid price."
+
+
+def checkFreeRoom(value, values):
+    room = roomRegistry.get(value)
+    return None if room is not None and not room.isAllocated else "Please enter a valid room number."
+
+
+def checkAllocatedRoom(value, values):
+    room = roomRegistry.get(value)
+    return None if room is not None and room.isAllocated else "Please enter a valid room number."
+
+
+def checkNewCustomer(value, values):
+    if value in listOfCustomerNumbers:
+        return "\nCustomer number already exists. Please enter a different customer number."
+    return None
+
+
+def checkFutureDate(value, values):
+    return None if value > datetime.date.today() else "Please enter a check-out date after the check-in date."
+
+
+def dateField(name: str, prompt: str, check=None) -> Field:
+    return Field(name, prompt, parseDate, check, invalid=None)
+
+
+"""
+        ### FUNCTIONS ###
+Functions used in the program to perform different operations
+"""
+
+
+def addRooms():
+    """
+    Function to add rooms to the hotel, recieve the number of rooms the user wants to add, and store the room number, type and price for each room.
+    Each room is a form, a wrong answer only asks that field again and the rooms already added are kept when
+    the user goes back to the menu in the middle
+    """
+    # Display a message to the user
+    print("\n ### ADD ROOMS ### \n")
+
+    # Ask the user for the number of rooms they want to add
+    form = openForm(
+        "addRooms",
+        [Field("noOfRooms", "Enter the number of rooms you want to add: ", check=checkNotNegative)],
+    )
+    noOfRooms = form.fill()["noOfRooms"]
+
+    # Loop to add the rooms to the hotel, the quantity of rooms added is kept in the form
+    while form.values.setdefault("added", 0) < noOfRooms:
+        i = form.values["added"]
+        roomForm = openForm(
+            "addRooms.room",
+            [
+                Field("roomNo", f"Enter the room number {i+1}: ", check=checkNewRoom),
+                Field(
+                    "roomType",
+                    f"Enter the type of room {i+1} (Single, Double, Suite): ",
+                    parse=str,
+                    check=checkRoomType,
+                ),
+                Field(
+                    "price", f"Enter the price per night of the room {i+1}: ", parse=float, check=checkPrice
+                ),
+            ],
+            resume=False,
+        )
+        # The hotel adds the Room object to the registry, which also records the room number
+        roomForm.submit(
+            lambda values: hotel.addRoom(values["roomNo"], values["roomType"], values["price"]),
+            retry=("roomNo",),
+        )
+        closeForm("addRooms.room")
+        form.values["added"] += 1
+
+    closeForm("addRooms")
+
+
+def deleteRooms():
+    """
+    Function to delete rooms from the hotel
+    List the rooms available to delete and ask the user for the room number to delete
+    Checks if the room number is valid and deletes the room from the list of rooms
+    """
+    # Check if there are rooms available to delete
+    if len(roomRegistry) == 0:
+        print("\nNo rooms available to delete.\n")
+        return
+
+    print("\n ### DELETE ROOMS ### \n")
+    print("List of Rooms already created: ")
+    # Display the list of rooms, written in large chunks
+    shown = writeBlocks(f"Room Number: {room.roomNumber}\n" for room in roomRegistry)
+    countScanned("deleteRooms", "rooms", shown)
+
+    # The rooms selected to delete are kept in the form
+    form = openForm("deleteRooms", [])
+    roomsToDelete = form.values.setdefault("roomsToDelete", [])
+    roomField = Field(
+        "roomNo",
+        "Enter the room number you want to delete (-1 to exit): ",
+        check=lambda value, values: None
+        if value == -1 or (value in roomRegistry and value not in roomsToDelete)
+        else "Please enter a valid room number.",
+    )
+    # Loop to select the rooms, -1 finishes the selection
+    while True:
+        roomNo = roomField.ask()
+        if roomNo == -1:
+            break
+        roomsToDelete.append(roomNo)
+
+    # Loop to delete the selected rooms, each one is removed from the registry by its room number.
+    # A room deleted by another desk since it was selected is reported and the others are still deleted
+    deleted = 0
+    for roomNo in roomsToDelete:
+        try:
+            hotel.deleteRoom(roomNo)
+            deleted += 1
+        except ValueError as error:
+            print(f"\n{error}")
+    closeForm("deleteRooms")
+
+    print(f"\n {deleted} Rooms deleted successfully.")
+
+
+def displayRoomDetails():
+    """
+    Function to display the details of the rooms, including the room number, type and price
+    """
+    print("\n ### ROOM DETAILS ### \n")
+
+    # Long listings can be shown by pages or as a summary
+    mode = askListingMode(len(roomRegistry))
+    if mode == "s":
+        sys.stdout.write(summarizeRooms(roomRegistry))
+        return
+    print("List of Rooms: \n")
+
+    # The details of the rooms are formatted and written in large chunks, instead of a print for each line
+    blocks = map(formatRoom, roomRegistry)
+    shown = pageBlocks(blocks) if mode == "p" else writeBlocks(blocks)
+    countScanned("displayRoomDetails", "rooms", shown)
+
+
+def allocateRoom():
+    """
+    Function to allocate a room to a customer, updating the status of the room, and creating a new Customer
+    """
+    print(" ### ALLOCATE ROOM ### \n")
+
+    # Check if there are rooms available to allocate
+    if not roomRegistry.freeRooms():
+        print("No rooms available to allocate.")
+        return
+
+    # Display how many rooms of each type are free and their prices, instead of every free room
+    print("Not allocated Rooms: \n")
+    for type, queue in roomRegistry.freeRoomsByType.items():
+        if queue:
+            print(
+                f"* {type}: {len(queue)} free, from {queue.cheapest} to {queue.dearest} per night"
+            )
+
+    form = openForm(
+        "allocateRoom",
+        [
+            Field("roomSelected", "Enter the room number you want to allocate: ", check=checkFreeRoom),
+            Field("customerNo", "Enter the customer number: ", check=checkNewCustomer),
+            Field("customerName", "Enter the customer name: ", parse=str),
+            # The stay starts today
+            dateField("checkOut", "Enter the check-out date (YYYY-MM-DD): ", checkFutureDate),
+        ],
+    )
+    if "roomSelected" not in form.values:
+        # Without a room number the best rooms are assigned automatically
+        roomSelected = Field(
+            "roomSelected",
+            "\nEnter the room number you want to allocate, or press Enter to assign one automatically: ",
+            parse=optional(int),
+            check=lambda value, values: None if value is None else checkFreeRoom(value, values),
+        ).ask()
+        if roomSelected is None:
+            closeForm("allocateRoom")
+            autoAllocateRooms()
+            return
+        form.values["roomSelected"] = roomSelected
+
+    # Allocate the room selected by the user, the hotel creates the Customer and RoomAllocation objects
+    # and records the customer number. A stay that overlaps a reservation of the room asks the room and
+    # the check-out date again
+    form.submit(
+        lambda values: hotel.allocateRoom(
+            values["roomSelected"], values["customerNo"], values["customerName"], values["checkOut"]
+        ),
+        retry=("roomSelected", "checkOut"),
+    )
+    closeForm("allocateRoom")
+
+    print(f"\nRoom {form.values['roomSelected']} allocated to {form.values['customerName']} successfully.")
+
+
+def autoAllocateRooms():
+    """
+    Function to allocate the best fitting rooms to one customer or to a group, asking for the type and the
+    maximum price instead of a room number
+    """
+    # The requested type, maximum price and quantity of rooms, any of them can be left empty
+    form = openForm(
+        "autoAllocateRooms",
+        [
+            Field(
+                "type",
+                "Enter the room type (Single, Double, Suite), or press Enter for any: ",
+                parse=lambda text: text.strip() or None,
+                check=lambda value, values: None if value is None else checkRoomType(value, values),
+            ),
+            Field(
+                "maxPrice",
+                "Enter the maximum price per night, or press Enter for any: ",
+                parse=optional(float),
+                check=checkPrice,
+            ),
+            Field(
+                "quantity",
+                "Enter the number of rooms, or press Enter for one: ",
+                parse=lambda text: int(text) if text.strip() else 1,
+                check=lambda value, values: None if value > 0 else "Please enter a valid number of rooms.",
+            ),
+        ],
+    )
+    quantity = form.fill()["quantity"]
+
+    # Ask for a new customer for each room, that is not another customer of the group either
+    def checkGroupCustomer(index):
+        def check(value, values):
+            if any(values.get(f"customerNo{other}") == value for other in range(index)):
+                return "\nCustomer number already exists. Please enter a different customer number."
+            return checkNewCustomer(value, values)
+
+        return check
+
+    # When there are not enough rooms the type, the maximum price and the number of rooms are asked again
+    while True:
+        form.fields = form.fields[:3]
+        for index in range(quantity):
+            form.fields.append(
+                Field(
+                    f"customerNo{index}",
+                    f"Enter the customer number of room {index + 1}: ",
+                    check=checkGroupCustomer(index),
+                )
+            )
+            form.fields.append(
+                Field(f"customerName{index}", f"Enter the customer name of room {index + 1}: ", parse=str)
+            )
+        # The stay starts today
+        form.fields.append(dateField("checkOut", "Enter the check-out date (YYYY-MM-DD): ", checkFutureDate))
+        # The customers of the rooms no longer asked for are forgotten
+        names = {field.name for field in form.fields}
+        form.values = {name: value for name, value in form.values.items() if name in names}
+
+        values = form.fill()
+        try:
+            allocations = hotel.autoAllocate(
+                [(values[f"customerNo{index}"], values[f"customerName{index}"]) for index in range(quantity)],
+                values["type"],
+                values["maxPrice"],
+                values["checkOut"],
+            )
+            break
+        except ValueError as error:
+            print(f"\n{error}")
+            print("Change the answers below, or press Ctrl-C to go back to the menu.")
+            for name in ("type", "maxPrice", "quantity"):
+                form.values.pop(name, None)
+            quantity = form.fill()["quantity"]
+    closeForm("autoAllocateRooms")
+
+    for allocation in allocations:
+        print(
+            f"\nRoom {allocation.allocatedRoom.roomNumber} ({allocation.allocatedRoom.type}, "
+            f"{allocation.allocatedRoom.price} per night) allocated to "
+            f"{allocation.allocatedCustomer.customerName} successfully."
+        )
+
+
+def displayRoomAllocationsDetails():
+    """
+    Function to display the details of the room allocations, including the room number, customer number and customer name
+    """
+    print("\n ### ROOM ALLOCATIONS ### \n")
+
+    # Long listings can be shown by pages or as a summary
+    mode = askListingMode(len(roomRegistry))
+    if mode == "s":
+        sys.stdout.write(summarizeAllocations(hotel))
+        return
+    print("List of Rooms: \n")
+
+    # Each room is shown together with its allocation, written in large chunks
+    blocks = itertools.starmap(formatOccupancy, roomAllocations.occupancy(roomRegistry))
+    shown = pageBlocks(blocks) if mode == "p" else writeBlocks(blocks)
+    countScanned("displayRoomAllocationsDetails", "rooms", shown)
+
+
+def billing():
+    """
+    Function to calculate the billing for the customer and deallocate the room
+    """
+    print(" ### BILLING & DEALLOCATION ### \n")
+
+    # Check if there are rooms available to deallocate
+    print("List of Rooms already allocated: \n")
+    # Display the list of rooms that are allocated, taken from the status index and written in large chunks,
+    # the quantity of allocated rooms tells if there are rooms available to deallocate
+    quantityOfAllocatedRooms = writeBlocks(
+        f"* Room Number: {room.roomNumber}\n" for room in roomRegistry.allocatedRooms()
+    )
+    countScanned("billing", "rooms", quantityOfAllocatedRooms)
+
+    # Check if there are rooms available to deallocate
+    if quantityOfAllocatedRooms == 0:
+        print("No rooms available to deallocate.\n")
+        return
+
+    # Ask the room number until it is an allocated room
+    roomNo = Field("roomNo", "Enter the room number: ", check=checkAllocatedRoom).ask()
+
+    # Find the room object with the room number selected by the user
+    room = roomRegistry.get(roomNo)
+    # Check the room has a RoomAllocation object in the allocation index
+    allocation = roomAllocations.forRoom(roomNo)
+    if allocation is not None:
+
+        # The nights are counted from the check-in date until today, or until the check-out date if it is earlier
+        nights = allocation.billedNights(datetime.date.today())
+        print(
+            f"\nThe stay from {allocation.checkIn} to {allocation.checkOut} is billed for {nights} nights."
+        )
+
+        # Calculate the billing for the customer, deallocate the room and remove its RoomAllocation object
+        total = hotel.billRoom(roomNo, nights)
+        print(f"The billing per night is: {room.price}")
+        print(f"The total billing is: {total}")
+
+        print(f"\nRoom {roomNo} deallocated successfully.")
+
+
+def reserveRoom():
+    """
+    Function to show the rooms free for some dates and reserve one of them for a customer
+    """
+    print(" ### ROOM AVAILABILITY & RESERVATIONS ### \n")
+
+    form = openForm(
+        "reserveRoom",
+        [
+            # The type of room, any type when nothing is entered
+            Field(
+                "roomType",
+                "Enter the type of room (Single, Double, Suite), Enter for any: ",
+                parse=lambda text: text.strip() or None,
+                check=lambda value, values: None if value is None else checkRoomType(value, values),
+            ),
+            # The dates of the stay
+            dateField(
+                "checkIn",
+                "Enter the check-in date (YYYY-MM-DD): ",
+                lambda value, values: None
+                if value >= datetime.date.today()
+                else "Please enter a check-in date from today on.",
+            ),
+            dateField(
+                "checkOut",
+                "Enter the check-out date (YYYY-MM-DD): ",
+                lambda value, values: None
+                if value > values["checkIn"]
+                else "Please enter a check-out date after the check-in date.",
+            ),
+        ],
+    )
+    values = form.fill()
+    checkIn, checkOut = values["checkIn"], values["checkOut"]
+
+    # Find the rooms free for every night of the stay
+    freeRooms = hotel.availableRooms(checkIn, checkOut, values["roomType"])
+    if not freeRooms:
+        closeForm("reserveRoom")
+        print("No rooms available for those dates.")
+        return
+
+    print(f"\nRooms available from {checkIn} to {checkOut}: \n")
+    writeBlocks(
+        f"* Room Number: {roomNo}  ({room.type}, {room.price} per night)\n"
+        for roomNo, room in zip(freeRooms, map(roomRegistry.get, freeRooms))
+    )
+
+    # Ask the user for the room to reserve, among the rooms free now
+    freeRooms = set(freeRooms)
+    form.fields = form.fields[:3] + [
+        Field(
+            "roomNo",
+            "Enter the room number you want to reserve (-1 to exit): ",
+            check=lambda value, values: None
+            if value == -1 or value in freeRooms
+            else "Please enter a valid room number.",
+        ),
+    ]
+    if form.fill()["roomNo"] == -1:
+        closeForm("reserveRoom")
+        return
+    form.fields += [
+        Field("customerNo", "Enter the customer number: ", check=checkNewCustomer),
+        Field("customerName", "Enter the customer name: ", parse=str),
+    ]
+
+    form.submit(
+        lambda values: hotel.reserveRoom(
+            values["roomNo"], values["customerNo"], values["customerName"], checkIn, checkOut
+        ),
+        retry=("customerNo",),
+    )
+    closeForm("reserveRoom")
+
+    print(f"\nRoom {values['roomNo']} reserved to {values['customerName']} from {checkIn} to {checkOut}.")
+
+
+def checkInReservation():
+    """
+    Function to allocate the reserved room to a customer that arrives
+    """
+    print(" ### CHECK-IN RESERVATION ### \n")
+
+    customerNo = Field("customerNo", "Enter the customer number: ").ask()
+
+    try:
+        allocation = hotel.checkInReservation(customerNo)
+    except ValueError as error:
+        print(f"\n{error}")
+        return
+
+    print(
+        f"\nRoom {allocation.allocatedRoom.roomNumber} allocated to "
+        f"{allocation.allocatedCustomer.customerName} until {allocation.checkOut}."
+    )
+
+
+def findCustomer():
+    """
+    Function to find customers by customer number or by part of their name, and show their stay
+    """
+    print(" ### FIND CUSTOMER ### \n")
+
+    text = input("Enter the customer number or part of the name: ")
+    start = perf_counter()
+    matches = hotel.findCustomers(text)
+    elapsed = perf_counter() - start
+    if not matches:
+        print("\nNo customers found.")
+        return
+
+    print(f"\n{len(matches)} customer(s) found in {elapsed * 1000:.1f} ms: \n")
+    writeBlocks(formatCustomer(*match) for match in matches)
+
+
+def formatCustomer(customerNo: int, customerName: str, stay: RoomAllocation) -> str:
+    """
+    Function to format a customer found by a search together with the stay
+    """
+    if stay is None:
+        where = "No current stay"
+    elif hotel.isCheckedIn(stay):
+        where = f"Room {stay.allocatedRoom.roomNumber} until {stay.checkOut}"
+    else:
+        where = f"Room {stay.allocatedRoom.roomNumber} reserved from {stay.checkIn} to {stay.checkOut}"
+    return f"Customer Number: {customerNo}\nCustomer Name: {customerName}\n{where}\n" + "*" * 40 + "\n"
+
+
+# Header written at the start of the room allocations file
+FILE_HEADER = "\t #### LANGHAM HOTEL MANAGEMENT SYSTEM ####\n"
+
+
+def lockFile(path: str, shared: bool = False, wait: bool = True):
+    """
+    Function to take an advisory lock on a data file, returns the open lock file and the lock is released when it
+    is closed. The lock is taken on a '.lock' file next to the data file, because the data files are replaced through
+    renames and a lock on the old file would not stop the writers of the new one. Raises BlockingIOError when another
+    program holds the lock and it should not wait
+    """
+    lock = open(path + ".lock", "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(
+                lock.fileno(),
+                (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if wait else fcntl.LOCK_NB),
+            )
+        except BaseException:
+            lock.close()
+            raise
+    return lock
+
+
+def writeRoomAllocationsText(path: str, allocations, now: datetime.datetime):
+    """
+    Function to write the room allocations to a file in the human-readable layout, one block per allocation.
+    The file is written to a temporary file and renamed, so a reader never sees it half written
+    """
+    temporaryPath = path + ".tmp"
+    # Open the file in write mode and create it if it does not exist
+    with open(temporaryPath, "w+") as file:
+        # Write the header of the file
+        file.write(FILE_HEADER)
+
+        date = now.strftime("%Y-%m-%d %H:%M:%S")
+        written = 0
+        # Loop to write the details of the room allocations to the file
+        for roomAllocation in allocations:
+            written += 1
+            # Write the room number, customer number, customer name and the date to the file
+            file.write(
+                f"\nRoom Number: {roomAllocation.allocatedRoom.roomNumber}\n"
+                f"Customer Number: {roomAllocation.allocatedCustomer.customerNo}\n"
+                f"Customer Name: {roomAllocation.allocatedCustomer.customerName}\n"
+                f"Date: {date}\n" + "*" * 40
+            )
+        countScanned("writeRoomAllocationsText", "allocations", written)
+        countBytes("allocations", "written", file.tell())
+    os.replace(temporaryPath, path)
+
+
+# Creation of a record for each allocation read back from the allocations file
+AllocationRecord = collections.namedtuple(
+    "AllocationRecord", ["roomNumber", "customerNo", "customerName", "date"]
+)
+
+# Quantity of allocations shown in each page of the viewer
+PAGE_SIZE = 20
+
+
+def iterRoomAllocationsText(
+    path: str,
+    roomNumber: int = None,
+    customerNo: int = None,
+    dateFrom: str = None,
+    dateTo: str = None,
+):
+    """
+    Function to read the room allocations back from a file in the human-readable layout, one at a time.
+    The file is read line by line and each block closed by a line of '*' is yielded as an AllocationRecord,
+    so the memory used does not depend on the size of the file. The records can be filtered by room number,
+    customer number and by a range of dates written as YYYY-MM-DD, both ends included
+    """
+    # Dates are written as "YYYY-MM-DD HH:MM:SS", so comparing the text keeps the order of the dates
+    if dateTo is not None:
+        dateTo = dateTo + "\uffff"
+
+    # Compressed backups are read through gzip, also one line at a time
+    opener = gzip.open if path.endswith(".gz") else open
+    scanned = 0
+    with opener(path, "rt") as file:
+        fields = {}
+        # The last block of a file may not be closed, so an end marker is added after the lines
+        for line in itertools.chain(file, ["*"]):
+            # Each allocation is a block of "Field: value" lines closed by a line of '*'
+            if not line.startswith("*"):
+                key, separator, value = line.rstrip("\n").partition(": ")
+                if separator:
+                    fields[key] = value
+                continue
+
+            block = fields
+            fields = {}
+            try:
+                record = AllocationRecord(
+                    int(block["Room Number"]),
+                    int(block["Customer Number"]),
+                    block["Customer Name"],
+                    block.get("Date", ""),
+                )
+            except (KeyError, ValueError):
+                # Blocks that are not complete allocations are skipped
+                continue
+            scanned += 1
+
+            if roomNumber is not None and record.roomNumber != roomNumber:
+                continue
+            if customerNo is not None and record.customerNo != customerNo:
+                continue
+            if dateFrom is not None and record.date < dateFrom:
+                continue
+            if dateTo is not None and record.date > dateTo:
+                continue
+            yield record
+
+    # Only counted when the whole file was read
+    countScanned("iterRoomAllocationsText", "allocations", scanned)
+    countBytes("allocations", "read", os.path.getsize(path))
+
+
+def readRoomAllocationsText(path: str):
+    """
+    Function to read every room allocation of a file in the human-readable layout into a list
+    """
+    return list(iterRoomAllocationsText(path))
+
+
+def parseRecordFilter(text: str) -> dict:
+    """
+    Function to parse a filter written as "room=101 customer=7 from=2024-07-01 to=2024-07-31",
+    every part is optional. Returns the keyword arguments of iterRoomAllocationsText
+    """
+    names = {
+        "room": "roomNumber",
+        "customer": "customerNo",
+        "from": "dateFrom",
+        "to": "dateTo",
+    }
+    filters = {}
+    for part in text.split():
+        key, separator, value = part.partition("=")
+        if not separator or key.lower() not in names:
+            raise ValueError(f"Unknown filter '{part}'.")
+        name = names[key.lower()]
+        if name in ("roomNumber", "customerNo"):
+            filters[name] = int(value)
+        else:
+            # The date must be valid, but it is kept as text to compare it with the dates of the file
+            datetime.datetime.strptime(value, "%Y-%m-%d")
+            filters[name] = value
+    return filters
+
+
+def formatRecord(record: AllocationRecord) -> str:
+    """
+    Function to format an allocation record in the same layout as the allocations file
+    """
+    return (
+        f"Room Number: {record.roomNumber}\n"
+        f"Customer Number: {record.customerNo}\n"
+        f"Customer Name: {record.customerName}\n"
+        f"Date: {record.date}\n" + "*" * 40 + "\n"
+    )
+
+
+def pageRecords(records, pageSize: int = PAGE_SIZE, interactive: bool = True) -> int:
+    """
+    Function to show the records a page at a time, returns the quantity of records shown
+    """
+    return pageBlocks(map(formatRecord, records), pageSize, interactive)
+
+
+# Quantity of blocks joined into each write of a listing
+LISTING_CHUNK = 4096
+
+# Listings with more rooms than this ask if they are shown whole, by pages or as a summary
+LISTING_ASK_ABOVE = 1000
+
+
+def pageBlocks(blocks, pageSize: int = PAGE_SIZE, interactive: bool = True) -> int:
+    """
+    Function to show blocks of text a page at a time, each page is written at once.
+    When interactive, the user is asked before each new page and can stop with 'q'.
+    Returns the quantity of blocks shown
+    """
+    shown = 0
+    page = []
+    for block in blocks:
+        page.append(block)
+        if len(page) == pageSize:
+            sys.stdout.write("".join(page))
+            shown += len(page)
+            page = []
+            if interactive:
+                answer = input("-- More (Enter to continue, q to quit) -- ")
+                if answer.strip().lower() == "q":
+                    return shown
+    if page:
+        sys.stdout.write("".join(page))
+        shown += len(page)
+    return shown
+
+
+def writeBlocks(blocks, out=None) -> int:
+    """
+    Function to write blocks of text joined in chunks, so a long listing is a few large writes instead of
+    one write for each line. Returns the quantity of blocks written
+    """
+    out = out or sys.stdout
+    blocks = iter(blocks)
+    written = 0
+    while True:
+        chunk = list(itertools.islice(blocks, LISTING_CHUNK))
+        if not chunk:
+            return written
+        out.write("".join(chunk))
+        written += len(chunk)
+
+
+def formatRoom(room: Room) -> str:
+    """
+    Function to format the details of a room as they are shown in the room details
+    """
+    return (
+        f"     Room Number: {room.roomNumber}\n"
+        f"Room Type: {room.type}\n"
+        f"Room Price: {room.price}\n" + "*" * 40 + "\n"
+    )
+
+
+def formatOccupancy(room: Room, allocation: RoomAllocation) -> str:
+    """
+    Function to format a room together with its allocation as they are shown in the room allocations details
+    """
+    if not room.isAllocated:
+        return f"     Room Number: {room.roomNumber}\nThe room is not allocated\n\n" + "*" * 40 + "\n"
+    if allocation is None:
+        return f"     Room Number: {room.roomNumber}\nThe room is allocated.\n\n" + "*" * 40 + "\n"
+    return (
+        f"     Room Number: {room.roomNumber}\n"
+        f"The room is allocated.\n\n"
+        f"Customer Number: {allocation.allocatedCustomer.customerNo}\n"
+        f"Customer Name: {allocation.allocatedCustomer.customerName}\n"
+        f"Check-In: {allocation.checkIn}  Check-Out: {allocation.checkOut}\n" + "*" * 40 + "\n"
+    )
+
+
+def summarizeRooms(registry: RoomRegistry) -> str:
+    """
+    Function to summarize the rooms by type: how many there are, how many are free and their prices
+    """
+    lines = [f"{'Type':<10}{'rooms':>10}{'free':>10}{'allocated':>12}{'min price':>12}{'max price':>12}\n"]
+    for type, rooms in registry.roomsByType.items():
+        if not rooms:
+            continue
+        prices = list(map(operator.attrgetter("price"), rooms.values()))
+        free = len(registry.freeRoomsByType.get(type, ()))
+        lines.append(
+            f"{type:<10}{len(rooms):>10}{free:>10}{len(rooms) - free:>12}{min(prices):>12.2f}{max(prices):>12.2f}\n"
+        )
+    allocated = len(registry.roomsByStatus[True])
+    lines.append(
+        f"{'Total':<10}{len(registry):>10}{len(registry) - allocated:>10}{allocated:>12}\n"
+    )
+    return "".join(lines)
+
+
+def summarizeAllocations(target: Hotel) -> str:
+    """
+    Function to summarize the room allocations: the occupancy, the reservations and the nights of the stays
+    """
+    allocated = len(target.allocations)
+    rooms = len(target.rooms)
+    reservations = len(target.reservations) - allocated
+    nights = sum(allocation.nights for allocation in target.allocations)
+    return (
+        f"Rooms: {rooms}\n"
+        f"Allocated rooms: {allocated} ({allocated / rooms * 100 if rooms else 0:.1f}% occupancy)\n"
+        f"Future reservations: {reservations}\n"
+        f"Nights of the current stays: {nights}\n"
+    )
+
+
+def askListingMode(count: int) -> str:
+    """
+    Function to ask how to show a long listing: 'a' for all at once, 'p' for page by page or 's' for a summary.
+    Short listings are shown whole without asking
+    """
+    if count <= LISTING_ASK_ABOVE:
+        return "a"
+    answer = input(
+        f"There are {count} rooms. Show (a)ll, (p)age by page or (s)ummary only? "
+    ).strip().lower()[:1]
+    return answer if answer in ("a", "p") else "s"
+
+
+def exportRooms(rooms, out, format: str = "csv"):
+    """
+    Function to export rooms to an open file as CSV or as a JSON array
+    """
+    if format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["room", "type", "price", "allocated"])
+        writer.writerows(
+            (room.roomNumber, room.type, room.price, int(room.isAllocated)) for room in rooms
+        )
+    else:
+        exportJson(map(roomJson, rooms), out)
+
+
+def exportAllocations(allocations, out, format: str = "csv"):
+    """
+    Function to export room allocations to an open file as CSV or as a JSON array
+    """
+    if format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["room", "customer", "name", "checkIn", "checkOut"])
+        writer.writerows(
+            (
+                allocation.allocatedRoom.roomNumber,
+                allocation.allocatedCustomer.customerNo,
+                allocation.allocatedCustomer.customerName,
+                allocation.checkIn.isoformat(),
+                allocation.checkOut.isoformat(),
+            )
+            for allocation in allocations
+        )
+    else:
+        exportJson(map(allocationJson, allocations), out)
+
+
+def exportJson(items, out):
+    """
+    Function to write items as a JSON array, one item per line and written in chunks,
+    so the whole array is never built in memory
+    """
+    encode = journalEncoder.encode
+    out.write("[")
+    writeBlocks(
+        (("\n" if index == 0 else ",\n") + encode(item) for index, item in enumerate(items)), out
+    )
+    out.write("\n]\n")
+
+
+def runListing(listing: str, format: str, summary: bool, pageSize: int, output: str = None) -> int:
+    """
+    Function to list the rooms or the room allocations of the hotel from the command line, as text, CSV or JSON,
+    or only their summary. Text written to a terminal is shown by pages
+    """
+    with hotel.lock:
+        if summary:
+            text = summarizeRooms(hotel.rooms) if listing == "rooms" else summarizeAllocations(hotel)
+            sys.stdout.write(text)
+            return 0
+
+        out = open(output, "w", newline="") if output else sys.stdout
+        try:
+            if format == "text":
+                if listing == "rooms":
+                    blocks = map(formatRoom, hotel.rooms)
+                else:
+                    blocks = itertools.starmap(formatOccupancy, hotel.allocations.occupancy(hotel.rooms))
+                if out is sys.stdout and sys.stdin.isatty() and sys.stdout.isatty():
+                    pageBlocks(blocks, pageSize)
+                else:
+                    writeBlocks(blocks, out)
+            elif listing == "rooms":
+                exportRooms(hotel.rooms, out, format)
+            else:
+                exportAllocations(hotel.allocations, out, format)
+        finally:
+            if output:
+                out.close()
+    if output:
+        count = len(hotel.rooms) if listing == "rooms" else len(hotel.allocations)
+        print(f"{count} {'rooms' if listing == 'rooms' else 'room allocations'} written to '{output}'.")
+    return 0
+
+
+# Bytes of each allocation in a file saved in place, grown when an allocation does not fit
+ALLOCATION_RECORD_WIDTH = 160
+
+# Seconds between the automatic saves of the allocations file, 0 when they are off
+AUTO_SAVE_INTERVAL = 0
+
+
+# Creation of a class for the allocations file saved in place
+class AllocationFile:
+
+    def __init__(self, path: str, width: int = ALLOCATION_RECORD_WIDTH):
+        """
+        Constructor for AllocationFile class, where every allocation is written in a slot of the same width, padded
+        with a line of spaces, in the same human-readable layout as before. A save only writes the slots of the
+        allocations that changed, and a slot left by a removed allocation is blanked, which the readers skip as an
+        incomplete block, and reused. The whole file is written again on the first save, when the file was changed by
+        another program, when an allocation does not fit in a slot, or when most slots are blank
+        """
+        self.path = path
+        self.width = width
+        self.headerSize = len(FILE_HEADER.encode())
+        # Slot of each room number, free slots to reuse and quantity of slots in the file
+        self.slots = {}
+        self.freeSlots = []
+        self.slotCount = 0
+        # Size, inode and modification time of the file after the last save, to notice changes made by others
+        self.identity = None
+
+    def record(self, allocation: RoomAllocation, date: str) -> bytes:
+        """
+        Method to format an allocation as the bytes of its slot, returns None if it does not fit
+        """
+        body = (
+            f"\nRoom Number: {allocation.allocatedRoom.roomNumber}\n"
+            f"Customer Number: {allocation.allocatedCustomer.customerNo}\n"
+            f"Customer Name: {allocation.allocatedCustomer.customerName}\n"
+            f"Date: {date}\n"
+        ).encode()
+        padding = self.width - len(body) - 40
+        if padding < 1:
+            return None
+        return body + b" " * (padding - 1) + b"\n" + b"*" * 40
+
+    def blank(self) -> bytes:
+        return b"\n" + b" " * (self.width - 42) + b"\n" + b"*" * 40
+
+    def fileIdentity(self):
+        try:
+            status = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return status.st_ino, status.st_size, status.st_mtime_ns
+
+    def save(self, allocations: AllocationIndex, now: datetime.datetime) -> int:
+        """
+        Method to write the allocations that changed since the last save and sync the file, so the file matches
+        the allocations in memory when it returns. Returns the quantity of slots written
+        """
+        return self.prepareSave(allocations, now)()
+
+    def prepareSave(self, allocations: AllocationIndex, now: datetime.datetime):
+        """
+        Method to take the allocations that changed since the last save and format their slots, returns the function
+        that writes and syncs them, which can run while the allocations go on changing. When the save fails the next
+        one writes the whole file again, so no change is lost
+        """
+        try:
+            writeSlots = self.prepareChanges(allocations, now)
+        except BaseException:
+            allocations.markEverythingChanged()
+            self.identity = None
+            raise
+
+        def write() -> int:
+            try:
+                return writeSlots()
+            except BaseException:
+                allocations.markEverythingChanged()
+                self.identity = None
+                raise
+
+        return write
+
+    def prepareChanges(self, allocations: AllocationIndex, now: datetime.datetime):
+        # Format the slots of the changed allocations, or the whole file when the slots cannot be trusted
+        changes = allocations.takeChanges()
+        if (
+            changes is None
+            or self.identity is None
+            or self.identity != self.fileIdentity()
+            or len(self.freeSlots) > max(64, self.slotCount // 2)
+        ):
+            return self.prepareRewrite(allocations, now)
+        if not changes:
+            return lambda: 0
+
+        date = now.strftime("%Y-%m-%d %H:%M:%S")
+        writes = []
+        for roomNumber in changes:
+            allocation = allocations.forRoom(roomNumber)
+            slot = self.slots.get(roomNumber)
+            if allocation is None:
+                # The allocation was removed, its slot is blanked and can be reused
+                if slot is not None:
+                    del self.slots[roomNumber]
+                    heapq.heappush(self.freeSlots, slot)
+                    writes.append((slot, self.blank()))
+                continue
+            data = self.record(allocation, date)
+            if data is None:
+                return self.prepareRewrite(allocations, now)
+            if slot is None:
+                if self.freeSlots:
+                    slot = heapq.heappop(self.freeSlots)
+                else:
+                    slot = self.slotCount
+                    self.slotCount += 1
+                self.slots[roomNumber] = slot
+            writes.append((slot, data))
+
+        # The slots are written in the order of the file
+        writes.sort(key=operator.itemgetter(0))
+
+        def write() -> int:
+            with open(self.path, "r+b") as file:
+                for slot, data in writes:
+                    file.seek(self.headerSize + slot * self.width)
+                    file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+                countBytes("allocations", "written", len(writes) * self.width)
+            self.identity = self.fileIdentity()
+            return len(writes)
+
+        return write
+
+    def prepareRewrite(self, allocations: AllocationIndex, now: datetime.datetime):
+        """
+        Method to format every allocation for a new file that replaces the old one, returns the function that writes
+        the file and returns the quantity of slots written
+        """
+        date = now.strftime("%Y-%m-%d %H:%M:%S")
+        records = [(allocation, self.record(allocation, date)) for allocation in allocations]
+        if any(data is None for _, data in records):
+            # The slots grow to the next power of two that fits the longest allocation
+            while any(data is None for _, data in records):
+                self.width *= 2
+                records = [(allocation, self.record(allocation, date)) for allocation, _ in records]
+
+        self.slots = {
+            allocation.allocatedRoom.roomNumber: slot for slot, (allocation, _) in enumerate(records)
+        }
+        self.freeSlots = []
+        self.slotCount = len(records)
+        allocations.takeChanges()
+        slots = [data for _, data in records]
+
+        def write() -> int:
+            temporaryPath = self.path + ".tmp"
+            with open(temporaryPath, "wb") as file:
+                file.write(FILE_HEADER.encode())
+                # The slots are written in chunks, a few large writes instead of one for each allocation
+                for start in range(0, len(slots), LISTING_CHUNK):
+                    file.write(b"".join(slots[start:start + LISTING_CHUNK]))
+                file.flush()
+                os.fsync(file.fileno())
+                countBytes("allocations", "written", file.tell())
+            os.replace(temporaryPath, self.path)
+            countScanned("AllocationFile.rewrite", "allocations", len(slots))
+            self.identity = self.fileIdentity()
+            return len(slots)
+
+        return write
+
+
+def saveAllocations(target: Hotel, path: str = None, now: datetime.datetime = None) -> int:
+    """
+    Function to save the allocations of the hotel to the allocations file, only writing the ones that changed since
+    the last save. No other program can write the file meanwhile. The desks only wait while the changed allocations
+    are formatted, the file is written and synced after releasing the lock of the hotel.
+    Returns the quantity of allocations written
+    """
+    path = path or filePath
+    with lockFile(path):
+        with target.lock:
+            if target.allocationFile is None or target.allocationFile.path != path:
+                target.allocationFile = AllocationFile(path)
+            write = target.allocationFile.prepareSave(target.allocations, now or datetime.datetime.now())
+        return write()
+
+
+# Creation of a class for the thread that saves the allocations file from time to time
+class AutoSaver(threading.Thread):
+
+    def __init__(self, target: Hotel, interval: float):
+        """
+        Constructor for AutoSaver class, a background thread that saves the allocations that changed every interval
+        of seconds, and once more when it is stopped
+        """
+        super().__init__(name="hotel-auto-save", daemon=True)
+        self.target = target
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.save()
+
+    def save(self):
+        try:
+            saveAllocations(self.target)
+        except OSError as error:
+            sys.stderr.write(f"Automatic save failed: {error}\n")
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.save()
+
+
+def saveRoomAllocationsToFile():
+    try:
+        print(" ### SAVE ROOM ALLOCATIONS TO FILE ### \n")
+
+        # Write the room allocations that changed since the last save with the current date and time
+        written = saveAllocations(hotel)
+
+        print(f"Room allocations saved as 'LHMS_1094' successfully ({written} records written).")
+
+    # IOError exception handling
+    except IOError:
+        print("An error occurred while saving the file.")
+        return
+    # EOFError exception handling
+    except EOFError:
+        print("End of file.")
+        return
+
+
+def showRoomAllocationsFromFile():
+    try:
+        print(" ### SHOW ROOM ALLOCATIONS ### \n")
+
+        # Check the file exists before asking for the filter
+        if not os.path.exists(filePath):
+            raise FileNotFoundError(filePath)
+
+        # Ask the user for an optional filter
+        filters = parseRecordFilter(
+            input(
+                "Filter (e.g. room=101 customer=7 from=2024-07-01 to=2024-07-31), Enter to show all: "
+            )
+        )
+
+        # Read the file one allocation at a time and show them a page at a time
+        shown = pageRecords(iterRoomAllocationsText(filePath, **filters))
+        print(f"\n{shown} room allocations shown.")
+    except FileNotFoundError:
+        print("File not found. Try saving the room allocations first.")
+        return
+    except ValueError as error:
+        print(error)
+        return
+
+
+def backupFilePath(now: datetime.datetime, compress: bool = False, prefix: str = None) -> str:
+    """
+    Function to get the path of a new backup file using the date and time, a number is added
+    when a backup with the same name already exists. The names start with the given prefix, backupPrefix by default
+    """
+    prefix = prefix or backupPrefix
+    day = now.strftime("%m-%d-%Y")
+    time = now.strftime("%H.%M.%S")
+    extension = ".txt.gz" if compress else ".txt"
+    path = f"{prefix}{day}_{time}{extension}"
+    number = 1
+    while os.path.exists(path):
+        path = f"{prefix}{day}_{time}_{number}{extension}"
+        number += 1
+    return path
+
+
+def copyFileInKernel(source, destination):
+    """
+    Function to copy an open file to another one without passing the data through Python.
+    Uses copy_file_range, which can share the blocks on file systems that support it, then sendfile,
+    and only if neither is available reads the file in chunks
+    """
+    size = os.fstat(source.fileno()).st_size
+    offset = 0
+    for copy in ("copy_file_range", "sendfile"):
+        function = getattr(os, copy, None)
+        if function is None:
+            continue
+        try:
+            while offset < size:
+                if copy == "copy_file_range":
+                    copied = function(
+                        source.fileno(), destination.fileno(), size - offset, offset, offset
+                    )
+                else:
+                    copied = function(
+                        destination.fileno(), source.fileno(), offset, size - offset
+                    )
+                if copied == 0:
+                    break
+                offset += copied
+            return
+        except OSError:
+            # Not supported between these files, the next method continues from the same offset
+            continue
+    source.seek(offset)
+    destination.seek(offset)
+    shutil.copyfileobj(source, destination)
+
+
+def syncDirectory(path: str):
+    """
+    Function to write to disk the entries of a directory, so a rename done in it survives a crash
+    """
+    try:
+        descriptor = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+def createBackup(
+    source: str, now: datetime.datetime, compress: bool = False, keep: int = None, prefix: str = None
+) -> str:
+    """
+    Function to move the content of the allocations file to a new backup file and leave the file with only the header.
+    Without compression the backup is a hard link to the file, so no data is copied at all, or a copy made by the kernel
+    when links are not supported. The file is then replaced by a new one through a rename, so at every moment either
+    the file still has its content or the backup is complete. Returns the path of the backup
+    """
+    backupPath = backupFilePath(now, compress, prefix)
+    directory = os.path.dirname(backupPath) or "."
+
+    if compress:
+        # The compressed backup is written to a temporary file and renamed once it is complete
+        temporaryPath = backupPath + ".tmp"
+        with open(source, "rb") as file, open(temporaryPath, "wb") as fileBackup:
+            with gzip.GzipFile(fileobj=fileBackup, mode="wb") as compressed:
+                shutil.copyfileobj(file, compressed, 1024 * 1024)
+            fileBackup.flush()
+            os.fsync(fileBackup.fileno())
+        os.replace(temporaryPath, backupPath)
+    else:
+        try:
+            # The backup becomes a second name of the same file
+            os.link(source, backupPath)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            temporaryPath = backupPath + ".tmp"
+            with open(source, "rb") as file, open(temporaryPath, "wb") as fileBackup:
+                copyFileInKernel(file, fileBackup)
+                fileBackup.flush()
+                os.fsync(fileBackup.fileno())
+            os.replace(temporaryPath, backupPath)
+
+    # The file is replaced by a new one with only the header, the backup keeps the old content
+    temporaryPath = source + ".tmp"
+    with open(temporaryPath, "w") as file:
+        file.write(FILE_HEADER)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporaryPath, source)
+    syncDirectory(directory)
+    countBytes("backup", "written", os.path.getsize(backupPath))
+
+    if keep is not None:
+        pruneBackups(keep, prefix)
+    return backupPath
+
+
+def backupTime(path: str, prefix: str):
+    """
+    Function to get the date and time written in the name of a backup file by backupFilePath, with the number
+    added to repeated names, or None if the name was not written by backupFilePath
+    """
+    name = os.path.basename(path)[len(os.path.basename(prefix)) :].partition(".txt")[0]
+    day, _, rest = name.partition("_")
+    time, _, number = rest.partition("_")
+    try:
+        return datetime.datetime.strptime(f"{day}_{time}", "%m-%d-%Y_%H.%M.%S"), int(number or 0)
+    except ValueError:
+        return None
+
+
+def pruneBackups(keep: int, prefix: str = None) -> list:
+    """
+    Function to delete the oldest backup files whose names start with the given prefix, backupPrefix by default,
+    so only the given quantity is kept, returns the deleted paths. The backups are ordered by the date and time in
+    their names, as copying or restoring them changes their modification times
+    """
+    prefix = prefix or backupPrefix
+    backups = []
+    for path in glob.glob(glob.escape(prefix) + "*"):
+        created = backupTime(path, prefix)
+        if created is not None and not path.endswith(".tmp"):
+            backups.append((created, path))
+    backups.sort(reverse=True)
+    deleted = [path for _, path in backups[keep:]]
+    for path in deleted:
+        os.remove(path)
+    return deleted
+
+
+def backupRoomAllocations():
+    try:
+        print(" ### BACKUP ### \n")
+
+        # Move the content of the file to the backup file and delete the oldest backups,
+        # while no other program writes the file or backs it up
+        with lockFile(filePath):
+            backupPath = createBackup(
+                filePath, datetime.datetime.now(), backupCompression, backupRetention
+            )
+
+        print(f"Content of 'LHMS_1094' eliminated succesfully.")
+        print(f"Backup created successfully as '{os.path.basename(backupPath)}'.")
+
+    except FileNotFoundError:
+        print("File not found. Try saving the room allocations first.")
+        return
+
+
+"""
+        ### REPORTS ###
+Functions used to calculate the billing and the revenue of many allocations at once
+"""
+
+
+# Creation of a class for the result of a revenue report
+class RevenueReport:
+    __slots__ = (
+        "roomNumbers",
+        "bills",
+        "types",
+        "staysByType",
+        "nightsByType",
+        "revenueByType",
+        "totalRooms",
+    )
+
+    def __init__(
+        self, roomNumbers, bills, types, staysByType, nightsByType, revenueByType, totalRooms
+    ):
+        """
+        Constructor for RevenueReport class, with the bill of each allocation, and the stays, nights and revenue
+        of each room type, in the same order as types
+        """
+        self.roomNumbers = roomNumbers
+        self.bills = bills
+        self.types = types
+        self.staysByType = staysByType
+        self.nightsByType = nightsByType
+        self.revenueByType = revenueByType
+        self.totalRooms = totalRooms
+
+    @property
+    def expectedRevenue(self) -> float:
+        return float(sum(self.revenueByType))
+
+    @property
+    def occupancyRate(self) -> float:
+        if not self.totalRooms:
+            return 0.0
+        return len(self.roomNumbers) / self.totalRooms
+
+
+def computeRevenue(roomNumbers, prices, typeCodes, nights, types, totalRooms) -> RevenueReport:
+    """
+    Function to calculate the bill of every allocation and the totals by room type in one pass over the columns.
+    The columns are arrays of the array module: room numbers, prices per night, type codes and nights.
+    With NumPy the arrays are used in place and every step runs in C, without it the bills are multiplied
+    through map and the totals are added in a single loop
+    """
+    typeCount = len(types)
+
+    if numpy is not None:
+        # The arrays are seen as NumPy arrays without copying them
+        priceValues = numpy.frombuffer(prices, dtype=numpy.float64)
+        nightValues = numpy.frombuffer(nights, dtype=f"u{nights.itemsize}")
+        codeValues = numpy.frombuffer(typeCodes, dtype=numpy.uint8)
+
+        bills = priceValues * nightValues
+        stays = numpy.bincount(codeValues, minlength=typeCount)
+        nightTotals = numpy.bincount(codeValues, weights=nightValues, minlength=typeCount)
+        revenue = numpy.bincount(codeValues, weights=bills, minlength=typeCount)
+        return RevenueReport(
+            roomNumbers,
+            array.array("d", bills.tobytes()),
+            list(types),
+            stays.tolist(),
+            [int(value) for value in nightTotals],
+            revenue.tolist(),
+            totalRooms,
+        )
+
+    bills = array.array("d", map(operator.mul, prices, nights))
+    stays = [0] * typeCount
+    nightTotals = [0] * typeCount
+    revenue = [0.0] * typeCount
+    for code, night, bill in zip(typeCodes, nights, bills):
+        stays[code] += 1
+        nightTotals[code] += night
+        revenue[code] += bill
+    return RevenueReport(
+        roomNumbers, bills, list(types), stays, nightTotals, revenue, totalRooms
+    )
+
+
+def revenueOfAllocations(target: Hotel, nights=None) -> RevenueReport:
+    """
+    Function to calculate the revenue of the current allocations of the hotel.
+    The nights are taken from the dates of each stay, unless a number used for every allocation
+    or a dictionary with the nights of each room number is given
+    """
+    types = list(ROOM_TYPES)
+    codesByType = {type: code for code, type in enumerate(types)}
+
+    roomNumbers = array.array("q")
+    prices = array.array("d")
+    typeCodes = array.array("B")
+    staysNights = array.array("I")
+
+    for allocation in target.allocations:
+        room = allocation.allocatedRoom
+        code = codesByType.get(room.type)
+        if code is None:
+            code = codesByType[room.type] = len(types)
+            types.append(room.type)
+        roomNumbers.append(room.roomNumber)
+        prices.append(room.price)
+        typeCodes.append(code)
+        if nights is None:
+            staysNights.append(allocation.nights)
+        elif isinstance(nights, int):
+            staysNights.append(nights)
+        else:
+            staysNights.append(nights.get(room.roomNumber, 0))
+
+    return computeRevenue(
+        roomNumbers, prices, typeCodes, staysNights, types, len(target.rooms)
+    )
+
+
+def readStays(path: str) -> dict:
+    """
+    Function to read the nights of each room from a CSV file written as "room,nights"
+    """
+    stays = {}
+    with open(path, "r", newline="") as file:
+        for row in csv.reader(file):
+            if not row or row[0].startswith("#"):
+                continue
+            stays[int(row[0])] = int(row[1])
+    return stays
+
+
+def printRevenueReport(report: RevenueReport, details: bool = False):
+    """
+    Function to display a revenue report, with the bill of every room when details is True
+    """
+    print("\n ### REVENUE REPORT ### \n")
+
+    if details:
+        for roomNumber, bill in zip(report.roomNumbers, report.bills):
+            print(f"Room Number: {roomNumber}    Billing: {bill}")
+        print("*" * 40)
+
+    occupiedRooms = len(report.roomNumbers)
+    print(
+        f"Occupancy: {occupiedRooms} of {report.totalRooms} rooms "
+        f"({report.occupancyRate * 100:.1f}%)\n"
+    )
+    print(f"{'Room Type':<12}{'Stays':>10}{'Nights':>10}{'Revenue':>16}")
+    for type, stays, nights, revenue in zip(
+        report.types, report.staysByType, report.nightsByType, report.revenueByType
+    ):
+        print(f"{type:<12}{stays:>10}{nights:>10}{revenue:>16.2f}")
+    print("*" * 48)
+    print(f"Expected revenue: {report.expectedRevenue:.2f}")
+
+
+def revenueReport():
+    """
+    Function to display the revenue of the current allocations, the nights are taken from the dates of each stay
+    """
+    # Check if there are allocations to report
+    if len(roomAllocations) == 0:
+        print("No rooms allocated.")
+        return
+
+    printRevenueReport(revenueOfAllocations(hotel))
+
+
+"""
+        ### HISTORY ###
+Functions used to keep every stay that was billed, and to report the occupancy and revenue of past periods
+"""
+
+# Columns of the history of stays, each one stored in its own file as a packed array of the given type code
+HISTORY_COLUMNS = (
+    ("room", "q"),
+    ("customer", "q"),
+    ("type", "B"),
+    # Dates of the stay as day numbers, and the time it was billed as seconds since the epoch
+    ("checkIn", "i"),
+    ("checkOut", "i"),
+    ("billedAt", "d"),
+    ("nights", "I"),
+    ("amount", "d"),
+)
+
+# Quantity of billed stays kept in memory before they are written to the history
+HISTORY_FLUSH_EVERY = 10000
+
+# Header of the file of daily totals: magic, version, quantity of stays counted, first day and quantity of days
+DAILY_HEADER = struct.Struct("<4sHxxQiI")
+DAILY_MAGIC = b"LHMD"
+DAILY_VERSION = 1
+
+# Record of a stay read back from the history
+HistoryStay = collections.namedtuple(
+    "HistoryStay", ["roomNumber", "customerNo", "type", "checkIn", "checkOut", "billedAt", "nights", "amount"]
+)
+
+
+# Creation of a class for the history of the billed stays
+class HistoryStore:
+
+    def __init__(self, path: str, flushEvery: int = HISTORY_FLUSH_EVERY):
+        """
+        Constructor for HistoryStore class, where every billed stay is appended to a directory with one file per
+        column, so a query only reads the columns it needs. The checkouts, room nights and revenue of each day are
+        kept as totals in another file, updated as the stays are added, so the occupancy and revenue of a period
+        are read from its days without reading the stays. The revenue of a stay is spread over the nights until
+        the day it ended
+        """
+        self.path = path
+        self.flushEvery = flushEvery
+        # Names of the room types, the stays keep the position of their type
+        self.types = []
+        # Quantity of stays written to the files, and the stays waiting to be written, one array per column
+        self.count = 0
+        self.pending = {name: array.array(typecode) for name, typecode in HISTORY_COLUMNS}
+        # Totals of each day from the first day, as day numbers
+        self.firstDay = None
+        self.checkouts = array.array("I")
+        self.roomNights = array.array("I")
+        self.revenue = array.array("d")
+        # False when another thread flushes the stays, as the service does, so appending only buffers
+        self.autoSync = True
+
+    def columnPath(self, name: str) -> str:
+        return os.path.join(self.path, name + ".col")
+
+    def open(self):
+        """
+        Method to read the room types and the daily totals, the totals are calculated again from the stays when
+        they do not count every stay written
+        """
+        os.makedirs(self.path, exist_ok=True)
+        try:
+            with open(os.path.join(self.path, "types.txt")) as file:
+                self.types = file.read().splitlines()
+        except FileNotFoundError:
+            self.types = []
+
+        sizes = {}
+        for name, typecode in HISTORY_COLUMNS:
+            try:
+                sizes[name] = os.path.getsize(self.columnPath(name))
+            except FileNotFoundError:
+                sizes[name] = 0
+        self.count = min(
+            sizes[name] // array.array(typecode).itemsize for name, typecode in HISTORY_COLUMNS
+        )
+        # A stay only written to some of the columns when the program stopped is cut from all of them
+        for name, typecode in HISTORY_COLUMNS:
+            if sizes[name] != self.count * array.array(typecode).itemsize:
+                os.truncate(self.columnPath(name), self.count * array.array(typecode).itemsize)
+
+        if not self.readDaily():
+            self.rebuildDaily()
+            self.prepareDaily()()
+
+    def catchUp(self):
+        """
+        Method to read the room types and the daily totals again when another program added stays to the files
+        """
+        try:
+            size = os.path.getsize(self.columnPath("room"))
+        except FileNotFoundError:
+            size = 0
+        if size != self.count * self.pending["room"].itemsize:
+            self.open()
+
+    def readDaily(self) -> bool:
+        """
+        Method to read the daily totals, returns False when they are missing or do not count every stay written
+        """
+        try:
+            with open(os.path.join(self.path, "daily.bin"), "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return self.count == 0
+        if len(data) < DAILY_HEADER.size:
+            return False
+        magic, version, counted, firstDay, dayCount = DAILY_HEADER.unpack_from(data, 0)
+        if magic != DAILY_MAGIC or version != DAILY_VERSION or counted != self.count:
+            return False
+
+        offset = DAILY_HEADER.size
+        for values in (self.checkouts, self.roomNights, self.revenue):
+            # Each array starts on a multiple of 8 bytes
+            offset += -offset % 8
+            del values[:]
+            values.frombytes(data[offset : offset + dayCount * values.itemsize])
+            offset += dayCount * values.itemsize
+        self.firstDay = firstDay if dayCount else None
+        countBytes("history", "read", len(data))
+        return True
+
+    def rebuildDaily(self):
+        """
+        Method to calculate the daily totals again from the columns of the stays
+        """
+        self.firstDay = None
+        for values in (self.checkouts, self.roomNights, self.revenue):
+            del values[:]
+        amounts = self.readColumn("amount")
+        for checkIn, checkOut, amount in zip(self.readColumn("checkIn"), self.readColumn("checkOut"), amounts):
+            self.addToDays(checkIn, checkOut, amount)
+        countScanned("HistoryStore.rebuildDaily", "stays", len(amounts))
+
+    def readColumn(self, name: str) -> array.array:
+        """
+        Method to read a column of the stays written to the files
+        """
+        typecode = dict(HISTORY_COLUMNS)[name]
+        values = array.array(typecode)
+        try:
+            with open(self.columnPath(name), "rb") as file:
+                values.fromfile(file, self.count)
+        except FileNotFoundError:
+            pass
+        countBytes("history", "read", len(values) * values.itemsize)
+        return values
+
+    def addToDays(self, checkIn: int, checkOut: int, amount: float):
+        """
+        Method to add a stay to the totals of its nights, from the check-in day to the night before the day it ended,
+        and to the checkouts of the day it ended
+        """
+        if self.firstDay is None:
+            self.firstDay = checkIn
+        if checkIn < self.firstDay:
+            # Days before the first day are added in front
+            for values in (self.checkouts, self.roomNights, self.revenue):
+                values[:0] = array.array(values.typecode, [0]) * (self.firstDay - checkIn)
+            self.firstDay = checkIn
+        missing = checkOut + 1 - self.firstDay - len(self.checkouts)
+        if missing > 0:
+            for values in (self.checkouts, self.roomNights, self.revenue):
+                values.extend(array.array(values.typecode, [0]) * missing)
+
+        perNight = amount / (checkOut - checkIn)
+        for day in range(checkIn - self.firstDay, checkOut - self.firstDay):
+            self.roomNights[day] += 1
+            self.revenue[day] += perNight
+        self.checkouts[checkOut - self.firstDay] += 1
+
+    def append(self, allocation: RoomAllocation, nights: int, amount: float, billedAt: datetime.datetime):
+        """
+        Method to add a billed stay to the history, it is written with the next flush
+        """
+        room = allocation.allocatedRoom
+        if room.type not in self.types:
+            self.types.append(room.type)
+        checkIn = allocation.checkIn.toordinal()
+        # The stay ended the day it was billed, or on its check-out date when it was billed later, so no night
+        # after the bill is counted. The nights billed can be other nights given to billRoom
+        checkOut = checkIn + allocation.billedNights(billedAt.date())
+        row = (
+            room.roomNumber,
+            allocation.allocatedCustomer.customerNo,
+            self.types.index(room.type),
+            checkIn,
+            checkOut,
+            billedAt.timestamp(),
+            nights,
+            amount,
+        )
+        for (name, _), value in zip(HISTORY_COLUMNS, row):
+            self.pending[name].append(value)
+        self.addToDays(checkIn, checkOut, amount)
+        if self.autoSync and len(self.pending["room"]) >= self.flushEvery:
+            self.flush()
+
+    def flush(self):
+        """
+        Method to write the waiting stays and the daily totals to disk
+        """
+        self.prepareFlush()()
+
+    def prepareFlush(self):
+        """
+        Method to take the waiting stays and a copy of the daily totals, returns the function that writes them.
+        The columns are appended before the totals are replaced, so totals that count more stays than the
+        columns have are never written
+        """
+        pending = self.pending
+        if not pending["room"]:
+            return noSync
+        self.pending = {name: array.array(typecode) for name, typecode in HISTORY_COLUMNS}
+        self.count += len(pending["room"])
+        types = "".join(type + "\n" for type in self.types)
+        writeDaily = self.prepareDaily()
+
+        def write():
+            temporaryPath = os.path.join(self.path, "types.txt.tmp")
+            with open(temporaryPath, "w") as file:
+                file.write(types)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporaryPath, os.path.join(self.path, "types.txt"))
+            for name, _ in HISTORY_COLUMNS:
+                with open(self.columnPath(name), "ab") as file:
+                    pending[name].tofile(file)
+                    file.flush()
+                    os.fsync(file.fileno())
+                countBytes("history", "written", len(pending[name]) * pending[name].itemsize)
+            writeDaily()
+
+        return write
+
+    def prepareDaily(self):
+        """
+        Method to take a copy of the daily totals, returns the function that replaces the file of totals with it
+        """
+        header = DAILY_HEADER.pack(
+            DAILY_MAGIC, DAILY_VERSION, self.count, self.firstDay or 0, len(self.checkouts)
+        )
+        days = [array.array(values.typecode, values) for values in (self.checkouts, self.roomNights, self.revenue)]
+
+        def write():
+            temporaryPath = os.path.join(self.path, "daily.bin.tmp")
+            with open(temporaryPath, "wb") as file:
+                file.write(header)
+                for values in days:
+                    file.write(b"\0" * (-file.tell() % 8))
+                    values.tofile(file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporaryPath, os.path.join(self.path, "daily.bin"))
+
+        return write
+
+    def days(self, dateFrom: datetime.date = None, dateTo: datetime.date = None):
+        """
+        Method to get the totals of each day from dateFrom to dateTo, both included, as
+        (date, checkouts, room nights, revenue) tuples. Only the days are read, never the stays
+        """
+        if self.firstDay is None:
+            return
+        start = max(dateFrom.toordinal() - self.firstDay, 0) if dateFrom else 0
+        end = len(self.checkouts)
+        if dateTo:
+            end = min(dateTo.toordinal() - self.firstDay + 1, end)
+        for day in range(start, end):
+            yield (
+                datetime.date.fromordinal(self.firstDay + day),
+                self.checkouts[day],
+                self.roomNights[day],
+                self.revenue[day],
+            )
+
+    def stays(self, roomNumber: int = None, customerNo: int = None) -> list:
+        """
+        Method to get the stays written to the history of a room, of a customer or every stay. The column of the
+        filter is read first, and the other columns are only read when some stay matches
+        """
+        if roomNumber is not None:
+            positions = [i for i, value in enumerate(self.readColumn("room")) if value == roomNumber]
+        elif customerNo is not None:
+            positions = [i for i, value in enumerate(self.readColumn("customer")) if value == customerNo]
+        else:
+            positions = range(self.count)
+        countScanned("HistoryStore.stays", "stays", self.count)
+        if not positions:
+            return []
+        columns = [self.readColumn(name) for name, _ in HISTORY_COLUMNS]
+        return [
+            HistoryStay(
+                columns[0][i],
+                columns[1][i],
+                self.types[columns[2][i]],
+                datetime.date.fromordinal(columns[3][i]),
+                datetime.date.fromordinal(columns[4][i]),
+                datetime.datetime.fromtimestamp(columns[5][i]),
+                columns[6][i],
+                columns[7][i],
+            )
+            for i in positions
+        ]
+
+    def close(self):
+        """
+        Method to write the waiting stays
+        """
+        self.flush()
+
+
+# Functions that give the period of a day, for each grouping of the history report
+HISTORY_PERIODS = {
+    "day": lambda date: date.isoformat(),
+    "month": lambda date: date.strftime("%Y-%m"),
+    "year": lambda date: str(date.year),
+}
+
+
+def summarizeHistory(store: HistoryStore, dateFrom=None, dateTo=None, by: str = "month") -> list:
+    """
+    Function to add the daily totals of the history by day, month or year.
+    Returns (period, days, checkouts, room nights, revenue) lists in the order of the days
+    """
+    period = HISTORY_PERIODS[by]
+    periods = []
+    for date, checkouts, roomNights, revenue in store.days(dateFrom, dateTo):
+        label = period(date)
+        if not periods or periods[-1][0] != label:
+            periods.append([label, 0, 0, 0, 0.0])
+        totals = periods[-1]
+        totals[1] += 1
+        totals[2] += checkouts
+        totals[3] += roomNights
+        totals[4] += revenue
+    return periods
+
+
+def runHistory(
+    dateFrom: str = None, dateTo: str = None, by: str = "month", roomNumber: int = None, customerNo: int = None
+) -> int:
+    """
+    Function to show the billed stays of a room or a customer, or the occupancy and revenue of each period.
+    The occupancy is the share of the nights of the current rooms that were sold
+    """
+    store = hotel.history
+    if store is None:
+        store = HistoryStore(historyPath)
+        store.open()
+    # The stays billed in this program are written before they are read
+    hotel.sync()
+
+    start = perf_counter()
+    if roomNumber is not None or customerNo is not None:
+        stays = store.stays(roomNumber, customerNo)
+        elapsed = perf_counter() - start
+        print(f"{'Room':>8}{'Customer':>12}  {'Type':<8}{'Check-in':>12}{'Check-out':>12}{'Nights':>8}{'Billed':>12}")
+        for stay in stays:
+            print(
+                f"{stay.roomNumber:>8}{stay.customerNo:>12}  {stay.type:<8}{stay.checkIn.isoformat():>12}"
+                f"{stay.checkOut.isoformat():>12}{stay.nights:>8}{stay.amount:>12.2f}"
+            )
+        print(f"\n{len(stays)} stays found in {elapsed * 1000:.1f} ms.")
+        return 0
+
+    periods = summarizeHistory(
+        store, parseDate(dateFrom) if dateFrom else None, parseDate(dateTo) if dateTo else None, by
+    )
+    elapsed = perf_counter() - start
+    rooms = len(hotel.rooms)
+    print(f"{'Period':<12}{'Checkouts':>10}{'Nights':>10}{'Occupancy':>11}{'Revenue':>16}")
+    for label, days, checkouts, roomNights, revenue in periods:
+        occupancy = f"{roomNights / (rooms * days) * 100:.1f}%" if rooms else "-"
+        print(f"{label:<12}{checkouts:>10}{roomNights:>10}{occupancy:>11}{revenue:>16.2f}")
+    print("*" * 59)
+    print(
+        f"{sum(period[2] for period in periods)} checkouts, {sum(period[4] for period in periods):.2f} revenue. "
+        f"{store.count} stays in the history, calculated in {elapsed * 1000:.1f} ms."
+    )
+    return 0
+
+
+"""
+        ### BATCH MODE ###
+Functions used to apply operations in bulk without asking the user for each field
+"""
+
+# Fields of each batch operation, in the order they are written in a CSV line
+BATCH_FIELDS = {
+    "add": ("room", "type", "price"),
+    "delete": ("room",),
+    "allocate": ("room", "customer", "name"),
+    "bill": ("room", "nights"),
+    "reserve": ("room", "customer", "name", "checkin", "checkout"),
+    "checkin": ("customer",),
+    "cancel": ("customer",),
+    "assign": ("type", "maxprice", "customer", "name"),
+    "find": ("name",),
+}
+
+
+def applyAdd(target: Hotel, room, type, price):
+    target.addRoom(int(room), type, parsePrice(price))
+
+
+def applyDelete(target: Hotel, room):
+    target.deleteRoom(int(room))
+
+
+def applyAllocate(target: Hotel, room, customer, name):
+    target.allocateRoom(int(room), int(customer), str(name))
+
+
+def applyBill(target: Hotel, room, nights):
+    return target.billRoom(int(room), int(nights))
+
+
+def applyReserve(target: Hotel, room, customer, name, checkin, checkout):
+    target.reserveRoom(
+        int(room), int(customer), str(name), parseDate(checkin), parseDate(checkout)
+    )
+
+
+def applyCheckIn(target: Hotel, customer):
+    target.checkInReservation(int(customer))
+
+
+def applyCancel(target: Hotel, customer):
+    target.cancelReservation(int(customer))
+
+
+def applyAssign(target: Hotel, type, maxprice, customer, name):
+    # The type and the maximum price can be left empty
+    target.autoAllocate(
+        [(int(customer), str(name))],
+        type or None,
+        parsePrice(maxprice) if maxprice not in ("", None) else None,
+    )
+
+
+def applyFind(target: Hotel, name):
+    # The customers found are written to the output, one per line
+    for customerNo, customerName, stay in target.findCustomers(str(name)):
+        room = f", room {stay.allocatedRoom.roomNumber}" if stay is not None else ""
+        print(f"Customer {customerNo}: {customerName}{room}")
+
+
+# Function that applies each batch operation
+BATCH_OPERATIONS = {
+    "add": applyAdd,
+    "delete": applyDelete,
+    "allocate": applyAllocate,
+    "bill": applyBill,
+    "reserve": applyReserve,
+    "checkin": applyCheckIn,
+    "cancel": applyCancel,
+    "assign": applyAssign,
+    "find": applyFind,
+}
+
+
+def readBatchOperations(lines, format: str = "csv"):
+    """
+    Function to read the batch operations from an iterable of lines, one operation per line.
+    CSV lines are written as "op,field,field..." and JSON lines as {"op": ..., "room": ..., ...}.
+    Blank lines and lines starting with '#' are skipped. Yields the line number, the operation and its fields,
+    a line that cannot be parsed is yielded with a None operation and the error message as field
+    """
+    if format == "csv":
+        # The csv reader works directly on the lines, so every line is parsed in C
+        for lineNo, row in enumerate(csv.reader(lines), start=1):
+            if not row or not row[0] or row[0].startswith("#"):
+                continue
+            yield lineNo, row[0].strip().lower(), row[1:]
+    else:
+        for lineNo, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                record = json.loads(line)
+                op = str(record["op"]).lower()
+                fields = [record[field] for field in BATCH_FIELDS.get(op, ())]
+            except (ValueError, KeyError, TypeError) as error:
+                yield lineNo, None, [f"Invalid JSON operation ({error})."]
+                continue
+            yield lineNo, op, fields
+
+
+def applyBatch(operations, target: Hotel, errors=sys.stderr):
+    """
+    Function to apply the batch operations to the hotel through the same validation rules as the menu.
+    Every failing line is reported to errors and the rest of the batch goes on.
+    Returns the quantity of applied operations, the quantity of errors and the total billing
+    """
+    applied = 0
+    failed = 0
+    totalBilling = 0.0
+
+    for lineNo, op, fields in operations:
+        function = BATCH_OPERATIONS.get(op)
+        try:
+            if function is None:
+                raise ValueError(fields[0] if op is None else f"Unknown operation '{op}'.")
+            if len(fields) != len(BATCH_FIELDS[op]):
+                raise ValueError(
+                    f"'{op}' expects {len(BATCH_FIELDS[op])} fields: {', '.join(BATCH_FIELDS[op])}."
+                )
+            billing = function(target, *fields)
+        except (ValueError, TypeError) as error:
+            failed += 1
+            errors.write(f"Line {lineNo}: {error}\n")
+            continue
+
+        applied += 1
+        if billing is not None:
+            totalBilling += billing
+
+    return applied, failed, totalBilling
+
+
+def detectBatchFormat(lines):
+    """
+    Function to detect the format of the batch operations from the first line that is not blank.
+    Returns the format and the lines, with the lines already read put back in front
+    """
+    readLines = []
+    format = "csv"
+    for line in lines:
+        readLines.append(line)
+        if line.strip():
+            format = "jsonl" if line.lstrip().startswith("{") else "csv"
+            break
+    return format, itertools.chain(readLines, lines)
+
+
+def runBatch(path: str, format: str = None):
+    """
+    Function to run the batch mode, reading the operations from the given file or from stdin when the path is '-'
+    """
+    start = perf_counter()
+    try:
+        file = sys.stdin if path == "-" else open(path, "r", newline="")
+        with file:
+            lines = iter(file)
+            # The format is detected from the first line unless it is given
+            if format is None:
+                format, lines = detectBatchFormat(lines)
+            applied, failed, totalBilling = applyBatch(
+                readBatchOperations(lines, format), hotel
+            )
+    except FileNotFoundError:
+        print(f"File '{path}' not found.")
+        return 1
+    elapsed = perf_counter() - start
+
+    print(f"{applied} operations applied, {failed} errors.")
+    print(f"Total billing: {totalBilling}")
+    print(
+        f"Processed in {elapsed:.3f} seconds "
+        f"({(applied + failed) / elapsed if elapsed else 0:.0f} operations per second)."
+    )
+    return 1 if failed else 0
+
+
+"""
+        ### SERVICE ###
+Functions used to offer the operations of the hotel as a JSON service over HTTP, and to measure it
+"""
+
+# Address where the service listens by default
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8764
+
+# Reason phrases of the HTTP statuses used by the service
+HTTP_REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+def roomJson(room: Room) -> dict:
+    return {
+        "room": room.roomNumber,
+        "type": room.type,
+        "price": room.price,
+        "allocated": room.isAllocated,
+    }
+
+
+def allocationJson(allocation: RoomAllocation) -> dict:
+    return {
+        "room": allocation.allocatedRoom.roomNumber,
+        "customer": allocation.allocatedCustomer.customerNo,
+        "name": allocation.allocatedCustomer.customerName,
+        "checkIn": allocation.checkIn.isoformat(),
+        "checkOut": allocation.checkOut.isoformat(),
+    }
+
+
+# Creation of a class for the HTTP service of the hotel
+class HotelService:
+
+    def __init__(self, target: Hotel):
+        """
+        Constructor for HotelService class, where each request is answered by the event loop from the objects in
+        memory. The changes are written to disk in a thread, and the answers of the changes wait until they are on
+        disk: every change made while a write is running is written by the next one, so many changes share a sync.
+        The allocations file and the backups are also written in threads
+        """
+        self.hotel = target
+        # The changes only wait in memory until the writer thread syncs them, so no request waits for the disk
+        if target.storage is not None:
+            target.storage.autoSync = False
+        if target.history is not None:
+            target.history.autoSync = False
+        # One thread writes the changes, so they are written in order, other threads write the files
+        self.writer = concurrent.futures.ThreadPoolExecutor(1, "hotel-storage")
+        self.files = concurrent.futures.ThreadPoolExecutor(2, "hotel-files")
+        # Sync that the changes made now will be written by, None when none was requested yet
+        self.commit = None
+        self.routes = {
+            ("GET", "rooms"): self.listRooms,
+            ("POST", "rooms"): self.addRoom,
+            ("DELETE", "rooms"): self.deleteRoom,
+            ("GET", "allocations"): self.listAllocations,
+            ("POST", "allocations"): self.allocateRoom,
+            ("POST", "groups"): self.allocateGroup,
+            ("POST", "bills"): self.billRoom,
+            ("POST", "save"): self.save,
+            ("POST", "backup"): self.backup,
+        }
+
+    async def durable(self):
+        """
+        Method to wait until the changes made so far are written to disk
+        """
+        if self.hotel.storage is None:
+            return
+        if self.commit is None:
+            self.commit = asyncio.ensure_future(self.writeChanges())
+        await asyncio.shield(self.commit)
+
+    async def writeChanges(self):
+        # The changes of the requests answered in the same turn of the event loop join this write
+        await asyncio.sleep(0)
+        self.commit = None
+        await asyncio.get_running_loop().run_in_executor(self.writer, self.hotel.sync)
+
+    async def listRooms(self, key, query, body):
+        if key is not None:
+            room = self.hotel.rooms.get(int(key))
+            if room is None:
+                return 404, {"error": "Please enter a valid room number."}
+            return 200, roomJson(room)
+        status = query.get("status")
+        if status == "free":
+            rooms = self.hotel.rooms.freeRooms()
+        elif status == "allocated":
+            rooms = self.hotel.rooms.allocatedRooms()
+        else:
+            rooms = self.hotel.rooms
+        if "type" in query:
+            rooms = (room for room in rooms if room.type == query["type"])
+        return 200, [roomJson(room) for room in rooms]
+
+    async def addRoom(self, key, query, body):
+        room = self.hotel.addRoom(int(body["room"]), body["type"], parsePrice(body["price"]))
+        await self.durable()
+        return 201, roomJson(room)
+
+    async def deleteRoom(self, key, query, body):
+        room = self.hotel.deleteRoom(int(key if key is not None else body["room"]))
+        await self.durable()
+        return 200, roomJson(room)
+
+    async def listAllocations(self, key, query, body):
+        if key is not None:
+            allocation = self.hotel.allocations.forRoom(int(key))
+            if allocation is None:
+                return 404, {"error": "The room is not allocated."}
+            return 200, allocationJson(allocation)
+        return 200, [allocationJson(allocation) for allocation in self.hotel.allocations]
+
+    async def allocateRoom(self, key, query, body):
+        # Without a room number the best fitting room of the type and maximum price is assigned
+        if "room" not in body:
+            status, answer = await self.allocateGroup(
+                key, query, dict(body, customers=[{"customer": body["customer"], "name": body["name"]}])
+            )
+            return status, answer[0]
+        allocation = self.hotel.allocateRoom(
+            int(body["room"]),
+            int(body["customer"]),
+            body["name"],
+            parseDate(body["checkOut"]) if body.get("checkOut") else None,
+        )
+        await self.durable()
+        return 201, allocationJson(allocation)
+
+    async def allocateGroup(self, key, query, body):
+        maxPrice = body.get("maxPrice")
+        allocations = self.hotel.autoAllocate(
+            [(int(customer["customer"]), customer["name"]) for customer in body["customers"]],
+            body.get("type"),
+            parsePrice(maxPrice) if maxPrice is not None else None,
+            parseDate(body["checkOut"]) if body.get("checkOut") else None,
+        )
+        await self.durable()
+        return 201, [allocationJson(allocation) for allocation in allocations]
+
+    async def billRoom(self, key, query, body):
+        roomNumber = int(key if key is not None else body["room"])
+        nights = body.get("nights")
+        total = self.hotel.billRoom(roomNumber, int(nights) if nights is not None else None)
+        await self.durable()
+        return 200, {"room": roomNumber, "total": total}
+
+    async def save(self, key, query, body):
+        # Only the allocations that changed are written, in a thread
+        written = await asyncio.get_running_loop().run_in_executor(
+            self.files, saveAllocations, self.hotel
+        )
+        return 200, {"path": filePath, "written": written, "allocations": len(self.hotel.allocations)}
+
+    async def backup(self, key, query, body):
+        def write():
+            with lockFile(filePath):
+                return createBackup(
+                    filePath, datetime.datetime.now(), backupCompression, backupRetention
+                )
+
+        try:
+            backupPath = await asyncio.get_running_loop().run_in_executor(self.files, write)
+        except FileNotFoundError:
+            return 404, {"error": "File not found. Try saving the room allocations first."}
+        return 200, {"backup": os.path.basename(backupPath)}
+
+    async def dispatch(self, method: str, target: str, body: bytes):
+        """
+        Method to call the operation of the request, returns the status and the JSON answer.
+        The paths are /<resource> or /<resource>/<key>, the errors of the hotel are answered with status 400
+        """
+        url = urllib.parse.urlsplit(target)
+        resource, _, key = url.path.strip("/").partition("/")
+        handler = self.routes.get((method, resource))
+        if handler is None:
+            if any(route[1] == resource for route in self.routes):
+                return 405, {"error": f"Method {method} not allowed on /{resource}."}
+            return 404, {"error": f"Unknown path {url.path}."}
+        query = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            fields = json.loads(body) if body else {}
+        except ValueError:
+            return 400, {"error": "The body is not valid JSON."}
+        if not isinstance(fields, dict):
+            return 400, {"error": "The body must be a JSON object."}
+        try:
+            return await handler(key or None, query, fields)
+        except KeyError as error:
+            return 400, {"error": f"Missing field {error}."}
+        except (ValueError, TypeError) as error:
+            return 400, {"error": str(error)}
+
+    async def handleConnection(self, reader, writer):
+        """
+        Method to answer the requests of a connection, which is kept open between requests
+        """
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine.strip():
+                    break
+                method, target, version = requestLine.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, answer = await self.dispatch(method, target, body)
+                except Exception:
+                    # The details of the failure are for the log of the service, not for the client
+                    sys.stderr.write(f"{method} {target} failed:\n{traceback.format_exc()}")
+                    status, answer = 500, {"error": "Internal server error."}
+
+                keepAlive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                data = json.dumps(answer).encode()
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                        f"Content-Type: application/json\r\n"
+                        f"Content-Length: {len(data)}\r\n"
+                        + ("" if keepAlive else "Connection: close\r\n")
+                        + "\r\n"
+                    ).encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+                if not keepAlive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # The client closed the connection or sent something that is not HTTP
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        """
+        Method to answer requests until the program is interrupted
+        """
+        server = await asyncio.start_server(self.handleConnection, host, port, backlog=1024)
+        print(f"Serving the hotel on http://{host}:{port}/, press Ctrl+C to stop.")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.files.shutdown()
+            self.writer.shutdown()
+
+
+def runService(host: str, port: int) -> int:
+    """
+    Function to run the HTTP service of the hotel until it is interrupted
+    """
+    try:
+        asyncio.run(HotelService(hotel).serve(host, port))
+    except KeyboardInterrupt:
+        print("\nService stopped.")
+    return 0
+
+
+def percentile(values: list, fraction: float):
+    """
+    Function to get the value below which the given fraction of the sorted values fall
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def generateLoad(host: str, port: int, requests: int, concurrency: int, rooms: int):
+    """
+    Function to send requests to the service from many connections at once and measure their latency. The rooms are
+    added first, then each connection allocates, bills and looks up random rooms with new customer numbers
+    """
+    customerNumbers = itertools.count(random.getrandbits(40))
+    latencies = []
+    statuses = collections.Counter()
+
+    async def send(reader, writer, method: str, path: str, body=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(data)}\r\n\r\n".encode()
+            + data
+        )
+        start = perf_counter()
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await reader.readline()
+            if not line.strip():
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        await reader.readexactly(length)
+        latencies.append(perf_counter() - start)
+        statuses[status] += 1
+
+    reader, writer = await asyncio.open_connection(host, port)
+    for roomNumber in range(rooms):
+        await send(
+            reader, writer, "POST", "/rooms",
+            {"room": roomNumber, "type": ROOM_TYPES[roomNumber % len(ROOM_TYPES)], "price": 100.0},
+        )
+    writer.close()
+    latencies.clear()
+    statuses.clear()
+
+    async def client(index: int, count: int):
+        generator = random.Random(index)
+        reader, writer = await asyncio.open_connection(host, port)
+        for _ in range(count):
+            roomNumber = generator.randrange(rooms)
+            choice = generator.random()
+            if choice < 0.4:
+                await send(
+                    reader, writer, "POST", "/allocations",
+                    {"room": roomNumber, "customer": next(customerNumbers), "name": f"Client {index}"},
+                )
+            elif choice < 0.8:
+                await send(reader, writer, "POST", "/bills", {"room": roomNumber})
+            else:
+                await send(reader, writer, "GET", f"/rooms/{roomNumber}")
+        writer.close()
+
+    start = perf_counter()
+    await asyncio.gather(
+        *(
+            client(index, requests // concurrency + (index < requests % concurrency))
+            for index in range(concurrency)
+        )
+    )
+    elapsed = perf_counter() - start
+
+    latencies.sort()
+    print(f"\n ### LOAD TEST ({requests} requests, {concurrency} connections) ### \n")
+    print(f"Throughput: {len(latencies) / elapsed:.0f} requests per second")
+    print(
+        "Latency: "
+        + ", ".join(
+            f"p{name} {percentile(latencies, fraction) * 1000:.2f} ms"
+            for name, fraction in (("50", 0.5), ("90", 0.9), ("99", 0.99), ("99.9", 0.999))
+        )
+        + f", max {latencies[-1] * 1000:.2f} ms"
+    )
+    print("Statuses: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+
+
+def runLoad(host: str, port: int, requests: int, concurrency: int, rooms: int) -> int:
+    """
+    Function to run the load generator against a running service
+    """
+    try:
+        asyncio.run(generateLoad(host, port, requests, concurrency, rooms))
+    except ConnectionError:
+        print(f"The service is not running on {host}:{port}.")
+        return 1
+    return 0
+
+
+"""
+        ### PROPERTIES ###
+Functions used to run many hotels at once, each one kept in its own storage and served by its own worker process
+"""
+
+# Directory with a subdirectory for the storage of each property
+propertiesPath = os.path.join(os.getcwd(), "LHMS_764707603_properties")
+
+# Quantity of batch operations sent to a worker at once
+PROPERTY_CHUNK = 5000
+
+# Most worker processes started for the properties, the properties are shared out among them
+PROPERTY_WORKERS = os.cpu_count() or 1
+
+# Hotels of the properties kept by a worker process, by hotel ID
+propertyHotels = {}
+
+
+def propertyDirectory(hotelId: str) -> str:
+    """
+    Function to get the directory where the storage of a property is kept
+    """
+    if not hotelId or not hotelId.replace("-", "").replace("_", "").isalnum():
+        raise ValueError("Please enter a valid hotel ID (letters, digits, '-' and '_').")
+    return os.path.join(propertiesPath, hotelId)
+
+
+def listProperties() -> list:
+    """
+    Function to get the hotel IDs of the properties that have a storage
+    """
+    try:
+        return sorted(
+            entry.name for entry in os.scandir(propertiesPath) if entry.is_dir()
+        )
+    except FileNotFoundError:
+        return []
+
+
+def openProperty(kind: str, hotelId: str) -> Hotel:
+    """
+    Function run in a worker process to get the hotel of a property, rebuilding it from its storage the first time.
+    The storage of each property is in its own directory, so a worker keeps the hotels of many properties, each one
+    written to its own files
+    """
+    target = propertyHotels.get(hotelId)
+    if target is not None:
+        return target
+    directory = propertyDirectory(hotelId)
+    os.makedirs(directory, exist_ok=True)
+    target = Hotel()
+    openStorage(target, kind, directory=directory)
+    propertyHotels[hotelId] = target
+    return target
+
+
+def propertyBatch(kind: str, hotelId: str, operations: list):
+    """
+    Function run in a worker to apply batch operations to a property and write them to disk.
+    Returns the quantity of applied operations, the quantity of errors, the total billing and the error messages
+    """
+    target = openProperty(kind, hotelId)
+    errors = io.StringIO()
+    applied, failed, totalBilling = applyBatch(operations, target, errors)
+    target.sync()
+    return applied, failed, totalBilling, errors.getvalue()
+
+
+def propertyFreeRooms(kind: str, hotelId: str, checkIn: datetime.date, checkOut: datetime.date, type: str = None):
+    """
+    Function run in a worker to get the rooms of a property free for every night of the stay
+    """
+    target = openProperty(kind, hotelId)
+    return [
+        roomJson(target.rooms.get(roomNumber))
+        for roomNumber in target.availableRooms(checkIn, checkOut, type)
+    ]
+
+
+def propertySummary(kind: str, hotelId: str) -> dict:
+    """
+    Function run in a worker to count the rooms, allocations and reservations of a property
+    """
+    target = openProperty(kind, hotelId)
+    with target.lock:
+        return {
+            "rooms": len(target.rooms),
+            "allocated": len(target.allocations),
+            "reservations": len(target.reservations) - len(target.allocations),
+        }
+
+
+def propertyFanOut(kind: str, hotelIds: list, function, *args) -> dict:
+    """
+    Function run in a worker to run a function for each of the given properties, returns the results by hotel ID
+    """
+    return {hotelId: function(kind, hotelId, *args) for hotelId in hotelIds}
+
+
+# Creation of a class for the router of the operations to the properties
+class PropertyRouter:
+
+    def __init__(self, kind: str = "journal", workers: int = PROPERTY_WORKERS):
+        """
+        Constructor for PropertyRouter class, where the properties are shared out among a bounded number of worker
+        processes. Each worker is a pool with a single process that keeps the hotels of its properties in memory,
+        so the operations of a property always run in the order they are sent. The queries for every property are
+        sent to all the workers at once, each one answering for all of its properties
+        """
+        self.kind = kind
+        self.workerCount = max(1, workers)
+        self.workers = []
+        # Position of the worker of each property, by hotel ID
+        self.shards = {}
+
+    def worker(self, hotelId: str):
+        """
+        Method to get the worker of a property. The properties are given to the workers in turn, and a worker is
+        started when it gets its first property
+        """
+        shard = self.shards.get(hotelId)
+        if shard is None:
+            propertyDirectory(hotelId)
+            shard = self.shards[hotelId] = len(self.shards) % self.workerCount
+            if shard == len(self.workers):
+                self.workers.append(concurrent.futures.ProcessPoolExecutor(1))
+        return self.workers[shard]
+
+    def submit(self, hotelId: str, function, *args):
+        """
+        Method to run a function for a property in its worker, returns its future
+        """
+        return self.worker(hotelId).submit(function, self.kind, hotelId, *args)
+
+    def fanOut(self, hotelIds, function, *args) -> dict:
+        """
+        Method to run a function for all the given properties at once, each worker runs it for all of its properties
+        in one call. Returns the result of each property by hotel ID
+        """
+        groups = {}
+        for hotelId in hotelIds:
+            self.worker(hotelId)
+            groups.setdefault(self.shards[hotelId], []).append(hotelId)
+        futures = [
+            self.workers[shard].submit(propertyFanOut, self.kind, shardIds, function, *args)
+            for shard, shardIds in groups.items()
+        ]
+        results = {}
+        for future in futures:
+            results.update(future.result())
+        return {hotelId: results[hotelId] for hotelId in hotelIds}
+
+    def close(self):
+        for worker in self.workers:
+            worker.shutdown()
+        self.workers.clear()
+
+
+def readPropertyOperations(lines, format: str = "csv"):
+    """
+    Function to read batch operations of many properties, written as the batch operations with the hotel ID first:
+    "hotel,op,field..." in CSV and {"hotel": ..., "op": ..., ...} in JSON lines.
+    Yields the hotel ID, the line number, the operation and its fields
+    """
+    if format == "csv":
+        for lineNo, row in enumerate(csv.reader(lines), start=1):
+            if not row or not row[0] or row[0].startswith("#"):
+                continue
+            if len(row) < 2:
+                yield None, lineNo, None, ["Missing the operation after the hotel ID."]
+                continue
+            yield row[0].strip(), lineNo, row[1].strip().lower(), row[2:]
+    else:
+        for lineNo, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                record = json.loads(line)
+                hotelId = str(record["hotel"])
+                op = str(record["op"]).lower()
+                fields = [record[field] for field in BATCH_FIELDS.get(op, ())]
+            except (ValueError, KeyError, TypeError) as error:
+                yield None, lineNo, None, [f"Invalid JSON operation ({error})."]
+                continue
+            yield hotelId, lineNo, op, fields
+
+
+def runPropertyBatch(path: str, format: str = None, kind: str = "journal") -> int:
+    """
+    Function to apply the batch operations of many properties, the operations of each property are sent in chunks
+    to its worker, so the properties are updated in parallel
+    """
+    start = perf_counter()
+    router = PropertyRouter(kind)
+    futures = []
+    failed = 0
+    try:
+        file = sys.stdin if path == "-" else open(path, "r", newline="")
+        with file:
+            lines = iter(file)
+            if format is None:
+                format, lines = detectBatchFormat(lines)
+            chunks = {}
+            for hotelId, lineNo, op, fields in readPropertyOperations(lines, format):
+                try:
+                    if hotelId is None:
+                        raise ValueError(fields[0])
+                    router.worker(hotelId)
+                except ValueError as error:
+                    failed += 1
+                    sys.stderr.write(f"Line {lineNo}: {error}\n")
+                    continue
+                chunk = chunks.setdefault(hotelId, [])
+                chunk.append((lineNo, op, fields))
+                if len(chunk) >= PROPERTY_CHUNK:
+                    futures.append((hotelId, router.submit(hotelId, propertyBatch, chunk)))
+                    chunks[hotelId] = []
+            for hotelId, chunk in chunks.items():
+                if chunk:
+                    futures.append((hotelId, router.submit(hotelId, propertyBatch, chunk)))
+
+        applied = 0
+        totalBilling = 0.0
+        for hotelId, future in futures:
+            chunkApplied, chunkFailed, chunkBilling, errors = future.result()
+            applied += chunkApplied
+            failed += chunkFailed
+            totalBilling += chunkBilling
+            for line in errors.splitlines():
+                sys.stderr.write(f"{hotelId} {line}\n")
+        properties = len(router.shards)
+    except FileNotFoundError:
+        print(f"File '{path}' not found.")
+        return 1
+    finally:
+        router.close()
+    elapsed = perf_counter() - start
+
+    print(f"{applied} operations applied to {properties} properties, {failed} errors.")
+    print(f"Total billing: {totalBilling}")
+    print(
+        f"Processed in {elapsed:.3f} seconds "
+        f"({(applied + failed) / elapsed if elapsed else 0:.0f} operations per second)."
+    )
+    return 1 if failed else 0
+
+
+def showPropertyFreeRooms(
+    checkIn: datetime.date, checkOut: datetime.date, type: str = None, kind: str = "journal"
+) -> int:
+    """
+    Function to show the rooms free for every night of the stay in all the properties, asking every property at once
+    """
+    router = PropertyRouter(kind)
+    try:
+        results = router.fanOut(listProperties(), propertyFreeRooms, checkIn, checkOut, type)
+    finally:
+        router.close()
+
+    # The rooms of every property in one listing, the cheapest first
+    rooms = sorted(
+        (room["price"], hotelId, room["room"], room["type"])
+        for hotelId, propertyRooms in results.items()
+        for room in propertyRooms
+    )
+    print(f"\n ### FREE {(type or 'ROOM').upper()}S FROM {checkIn} TO {checkOut} ### \n")
+    print(f"{'Hotel':<20}{'Room':>10}{'Type':>10}{'Price':>12}")
+    for price, hotelId, roomNumber, roomType in rooms:
+        print(f"{hotelId:<20}{roomNumber:>10}{roomType:>10}{price:>12.2f}")
+    print(f"\n{len(rooms)} rooms free in {len(results)} properties.")
+    return 0
+
+
+def showPropertySummary(kind: str = "journal") -> int:
+    """
+    Function to show the rooms, allocations and reservations of every property, asking every property at once
+    """
+    router = PropertyRouter(kind)
+    try:
+        results = router.fanOut(listProperties(), propertySummary)
+    finally:
+        router.close()
+
+    print("\n ### PROPERTIES ### \n")
+    print(f"{'Hotel':<20}{'rooms':>10}{'allocated':>12}{'reserved':>12}")
+    for hotelId, summary in results.items():
+        print(
+            f"{hotelId:<20}{summary['rooms']:>10}{summary['allocated']:>12}{summary['reservations']:>12}"
+        )
+    print(
+        f"{'Total':<20}{sum(summary['rooms'] for summary in results.values()):>10}"
+        f"{sum(summary['allocated'] for summary in results.values()):>12}"
+        f"{sum(summary['reservations'] for summary in results.values()):>12}"
+    )
+    return 0
+
+
+"""
+        ### METRICS ###
+Functions used to measure the operations while the program runs, only when the metrics are turned on
+"""
+
+# Upper bounds in seconds of the buckets of the latency histograms
+METRICS_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Methods of the Hotel and functions of the files whose latency is measured
+INSTRUMENTED_METHODS = (
+    "addRoom",
+    "deleteRoom",
+    "allocateRoom",
+    "reserveRoom",
+    "checkInReservation",
+    "cancelReservation",
+    "billRoom",
+    "availableRooms",
+    "bestFitRooms",
+    "autoAllocate",
+    "sync",
+    "snapshotState",
+    "restoreState",
+)
+# The methods of other classes are given as Class.method
+INSTRUMENTED_FUNCTIONS = (
+    "saveAllocations",
+    "AllocationFile.prepareSave",
+    "iterRoomAllocationsText",
+    "createBackup",
+    "writeSnapshot",
+    "readSnapshot",
+    "revenueOfAllocations",
+    "applyBatch",
+)
+
+# Metrics of the running program, None when they are turned off so the operations are not slowed down
+metrics = None
+
+
+# Creation of a class for the metrics of the operations
+class Metrics:
+
+    def __init__(self, path: str = None, profilePath: str = None):
+        """
+        Constructor for Metrics class, where the latency of each operation is kept in a histogram with fixed buckets,
+        and the rooms and allocations scanned and the bytes of the files read and written are kept in counters.
+        They are written in the Prometheus text format to the given path, and the cProfile statistics of the whole
+        program to the profile path, when the program ends or when it gets SIGUSR1
+        """
+        self.path = path
+        self.profilePath = profilePath
+        # Count of each bucket plus the count above the last one, and sum of the seconds, by operation
+        self.histograms = {}
+        self.sums = collections.Counter()
+        # Values of the counters by name and labels
+        self.counters = collections.Counter()
+        self.lock = threading.Lock()
+        # Held while the files are written, so a dump on request and the one at exit do not mix
+        self.dumping = threading.Lock()
+        self.profile = None
+
+    def observe(self, operation: str, seconds: float):
+        """
+        Method to add the latency of a call of an operation to its histogram
+        """
+        with self.lock:
+            histogram = self.histograms.get(operation)
+            if histogram is None:
+                histogram = self.histograms[operation] = [0] * (len(METRICS_BUCKETS) + 1)
+            histogram[bisect.bisect_left(METRICS_BUCKETS, seconds)] += 1
+            self.sums[operation] += seconds
+
+    def count(self, name: str, amount: int, **labels):
+        """
+        Method to add an amount to a counter, labels tell apart the values of the same counter
+        """
+        with self.lock:
+            self.counters[name, tuple(sorted(labels.items()))] += amount
+
+    def timed(self, operation: str, function):
+        """
+        Method to get a function that runs the given one and measures its latency. A generator is measured only
+        while it runs, not while the caller uses what it yields
+        """
+        observe = self.observe
+
+        if inspect.isgeneratorfunction(function):
+
+            @functools.wraps(function)
+            def measuredGenerator(*args, **kwargs):
+                elapsed = 0.0
+                start = perf_counter()
+                generator = function(*args, **kwargs)
+                try:
+                    while True:
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            return
+                        finally:
+                            elapsed += perf_counter() - start
+                        yield item
+                        start = perf_counter()
+                finally:
+                    generator.close()
+                    observe(operation, elapsed)
+
+            measuredGenerator.unmeasured = function
+            return measuredGenerator
+
+        @functools.wraps(function)
+        def measured(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                observe(operation, perf_counter() - start)
+
+        measured.unmeasured = function
+        return measured
+
+    def install(self):
+        """
+        Method to measure the instrumented methods and functions. They are replaced only when the metrics are turned
+        on, so they run as before when they are off
+        """
+        for name in INSTRUMENTED_METHODS:
+            setattr(Hotel, name, self.timed(name, getattr(Hotel, name)))
+        module = globals()
+        for name in INSTRUMENTED_FUNCTIONS:
+            className, _, attribute = name.rpartition(".")
+            if className:
+                owner = module[className]
+                setattr(owner, attribute, self.timed(name, getattr(owner, attribute)))
+            else:
+                module[name] = self.timed(name, module[name])
+        if self.profilePath:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def prometheus(self) -> str:
+        """
+        Method to write the metrics in the Prometheus text format
+        """
+        lines = [
+            "# HELP lhms_operation_seconds Latency of the operations of the hotel.",
+            "# TYPE lhms_operation_seconds histogram",
+        ]
+        # Only the copy of the values is made with the lock, so the operations do not wait for the text
+        with self.lock:
+            histograms = {operation: list(histogram) for operation, histogram in self.histograms.items()}
+            sums = dict(self.sums)
+            counters = dict(self.counters)
+
+        for operation, histogram in sorted(histograms.items()):
+            total = 0
+            for bound, count in zip(METRICS_BUCKETS + ("+Inf",), histogram):
+                total += count
+                lines.append(
+                    f'lhms_operation_seconds_bucket{{operation="{operation}",le="{bound}"}} {total}'
+                )
+            lines.append(f'lhms_operation_seconds_sum{{operation="{operation}"}} {sums[operation]}')
+            lines.append(f'lhms_operation_seconds_count{{operation="{operation}"}} {total}')
+
+        names = sorted({name for name, _ in counters})
+        for name in names:
+            lines.append(f"# TYPE lhms_{name}_total counter")
+            for (counterName, labels), value in sorted(counters.items()):
+                if counterName == name:
+                    text = ",".join(f'{key}="{label}"' for key, label in labels)
+                    lines.append(f"lhms_{name}_total{{{text}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self):
+        """
+        Method to write the metrics and the profile statistics to their files
+        """
+        with self.dumping:
+            self.writeFiles()
+
+    def writeFiles(self):
+        if self.path:
+            temporaryPath = self.path + ".tmp"
+            with open(temporaryPath, "w") as file:
+                file.write(self.prometheus())
+            os.replace(temporaryPath, self.path)
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.profilePath)
+            # A readable report of the functions that took the longest, next to the statistics file
+            with open(self.profilePath + ".txt", "w") as file:
+                pstats.Stats(self.profile, stream=file).sort_stats("cumulative").print_stats(40)
+            self.profile.enable()
+
+    def dumpOnRequest(self) -> threading.Event:
+        """
+        Method to start the thread that writes the metrics each time the returned event is set. A signal handler only
+        sets the event: writing from the handler could wait forever for the lock held by the code it interrupted
+        """
+        requested = threading.Event()
+
+        def run():
+            while True:
+                requested.wait()
+                requested.clear()
+                try:
+                    self.dump()
+                except OSError as error:
+                    sys.stderr.write(f"Writing the metrics failed: {error}\n")
+
+        threading.Thread(target=run, name="metrics-dump", daemon=True).start()
+        return requested
+
+
+def countScanned(operation: str, item: str, amount: int):
+    """
+    Function to count the rooms or allocations an operation went through, when the metrics are on
+    """
+    if metrics is not None:
+        metrics.count("scanned", amount, operation=operation, item=item)
+
+
+def countBytes(file: str, direction: str, amount: int):
+    """
+    Function to count the bytes read or written to a file, when the metrics are on
+    """
+    if metrics is not None:
+        metrics.count("file_bytes", amount, file=file, direction=direction)
+
+
+def enableMetrics(path: str = None, profilePath: str = None) -> Metrics:
+    """
+    Function to turn on the metrics, they are written when the program ends and when it gets SIGUSR1
+    """
+    global metrics
+    metrics = Metrics(path, profilePath)
+    metrics.install()
+    atexit.register(metrics.dump)
+    # SIGUSR1 only exists on Unix
+    if hasattr(signal, "SIGUSR1"):
+        requested = metrics.dumpOnRequest()
+        signal.signal(signal.SIGUSR1, lambda signalNumber, frame: requested.set())
+    return metrics
+
+
+def benchmarkSnapshot(roomCount: int, directory: str):
+    """
+    Function to compare rebuilding a hotel from the binary snapshot with parsing the human-readable
+    allocations file. A synthetic hotel with half of the rooms allocated is used for both
+    """
+    print(f"\n ### SNAPSHOT BENCHMARK ({roomCount} rooms) ### \n")
+
+    # Create the synthetic hotel without journal
+    source = Hotel()
+    for roomNumber in range(roomCount):
+        source.addRoom(
+            roomNumber, ROOM_TYPES[roomNumber % len(ROOM_TYPES)], 50.0 + roomNumber % 400
+        )
+    for roomNumber in range(0, roomCount, 2):
+        source.allocateRoom(roomNumber, roomNumber, f"Customer {roomNumber}")
+
+    textPath = os.path.join(directory, "LHMS_benchmark.txt")
+    binaryPath = os.path.join(directory, "LHMS_benchmark.snapshot")
+
+    start = perf_counter()
+    writeRoomAllocationsText(textPath, source.allocations, datetime.datetime.now())
+    textWrite = perf_counter() - start
+
+    start = perf_counter()
+    state = source.snapshotState()
+    state["sequence"] = 0
+    writeSnapshot(binaryPath, state)
+    binaryWrite = perf_counter() - start
+
+    # Parsing the text file only gives the allocations back, the rooms are not in it
+    start = perf_counter()
+    parsed = readRoomAllocationsText(textPath)
+    textRead = perf_counter() - start
+
+    start = perf_counter()
+    loaded = readSnapshot(binaryPath)
+    binaryRead = perf_counter() - start
+
+    # Rebuilding every Room, Customer and RoomAllocation object from the snapshot
+    target = Hotel()
+    start = perf_counter()
+    target.restoreState(loaded)
+    binaryRebuild = perf_counter() - start
+
+    print(f"{'':<22}{'write':>10}{'read':>10}{'rebuild':>10}{'size':>12}")
+    print(
+        f"{'Text file':<22}{textWrite * 1000:>8.1f}ms{textRead * 1000:>8.1f}ms"
+        f"{'-':>10}{os.path.getsize(textPath):>12}"
+    )
+    print(
+        f"{'Binary snapshot':<22}{binaryWrite * 1000:>8.1f}ms{binaryRead * 1000:>8.1f}ms"
+        f"{binaryRebuild * 1000:>8.1f}ms{os.path.getsize(binaryPath):>12}"
+    )
+    print(
+        f"\n{len(parsed)} allocations parsed from text, {len(target.rooms)} rooms and "
+        f"{len(target.allocations)} allocations rebuilt from the snapshot."
+    )
+
+    os.remove(textPath)
+    os.remove(binaryPath)
+
+
+def benchmarkMemory(roomCounts):
+    """
+    Function to measure the memory taken by each room with the different representations:
+    the original classes with a dictionary per object, the Room class with slots, the same rooms in the
+    RoomRegistry with its indexes, and the fields of the rooms packed in one array per field, the least a room
+    can take. Memory is measured with tracemalloc
+    """
+    print("\n ### MEMORY BENCHMARK (bytes per room) ### \n")
+
+    # The original Room class kept its attributes in a dictionary, a subclass without slots has one again
+    class DictRoom(Room):
+        pass
+
+    def roomValues(roomCount: int):
+        # Synthetic rooms, with realistic room numbers that are not cached small integers
+        for roomNumber in range(100000, 100000 + roomCount):
+            yield roomNumber, ROOM_TYPES[roomNumber % 3], 50.0 + roomNumber % 400
+
+    def dictRooms(roomCount: int):
+        return [DictRoom(number, False, type, price) for number, type, price in roomValues(roomCount)]
+
+    def slotRooms(roomCount: int):
+        return [Room(number, False, type, price) for number, type, price in roomValues(roomCount)]
+
+    def registryRooms(roomCount: int):
+        registry = RoomRegistry()
+        registry.load(Room(number, False, type, price) for number, type, price in roomValues(roomCount))
+        return registry
+
+    def columnRooms(roomCount: int):
+        # Room numbers, allocated flags, positions of the types and prices, 18 bytes per room
+        columns = (array.array("q"), array.array("B"), array.array("B"), array.array("d"))
+        for number, type, price in roomValues(roomCount):
+            for column, value in zip(columns, (number, 0, ROOM_TYPES.index(type), price)):
+                column.append(value)
+        return columns
+
+    representations = [
+        ("Room with __dict__", dictRooms),
+        ("Room with __slots__", slotRooms),
+        ("RoomRegistry", registryRooms),
+        ("Packed columns", columnRooms),
+    ]
+
+    print(f"{'':<22}" + "".join(f"{roomCount:>12}" for roomCount in roomCounts))
+    for name, build in representations:
+        line = f"{name:<22}"
+        for roomCount in roomCounts:
+            gc.collect()
+            tracemalloc.start()
+            rooms = build(roomCount)
+            used = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del rooms
+            line += f"{used / roomCount:>12.1f}"
+        print(line)
+
+
+def benchmarkStorage(roomCount: int, directory: str):
+    """
+    Function to compare the storages of the hotel: the in-memory objects alone, the journal, the SQLite database
+    and the text allocations file. The same rooms and allocations are written to each, then the hotel is loaded
+    back and the stay of some customers is looked up
+    """
+    print(f"\n ### STORAGE BENCHMARK ({roomCount} rooms) ### \n")
+
+    def fill(target: Hotel):
+        # Synthetic hotel with half of the rooms allocated
+        for roomNumber in range(roomCount):
+            target.addRoom(
+                roomNumber, ROOM_TYPES[roomNumber % len(ROOM_TYPES)], 50.0 + roomNumber % 400
+            )
+        for roomNumber in range(0, roomCount, 2):
+            target.allocateRoom(roomNumber, roomNumber, f"Customer {roomNumber}")
+        if target.storage is not None:
+            target.storage.close()
+
+    # Customers looked up, spread over the whole hotel, only the even rooms have a customer
+    customers = [number - number % 2 for number in range(0, roomCount, max(1, roomCount // 10))][:10]
+
+    def timed(function):
+        start = perf_counter()
+        result = function()
+        return perf_counter() - start, result
+
+    results = []
+
+    memory = Hotel()
+    write, _ = timed(lambda: fill(memory))
+    lookup, _ = timed(lambda: [memory.reservations.forCustomer(customerNo) for customerNo in customers])
+    results.append(("In-memory lists", write, None, lookup, None))
+
+    journalFile = os.path.join(directory, "LHMS_benchmark.journal")
+    journalSnapshot = os.path.join(directory, "LHMS_benchmark.snapshot")
+    journaled = Hotel()
+    journaled.storage = Journal(journalFile, journalSnapshot)
+    write, _ = timed(lambda: fill(journaled))
+    loaded = Hotel()
+    read, _ = timed(lambda: Journal(journalFile, journalSnapshot).replay(loaded))
+    lookup, _ = timed(lambda: [loaded.reservations.forCustomer(customerNo) for customerNo in customers])
+    size = sum(os.path.getsize(path) for path in (journalFile, journalSnapshot) if os.path.exists(path))
+    results.append(("Journal", write, read, lookup, size))
+
+    databaseFile = os.path.join(directory, "LHMS_benchmark.db")
+    database = Hotel()
+    database.storage = SQLiteStorage(databaseFile)
+    write, _ = timed(lambda: fill(database))
+    storage = SQLiteStorage(databaseFile)
+    read, _ = timed(lambda: storage.replay(Hotel()))
+    # The lookups are answered by the database itself, through the index of the customer numbers
+    lookup, _ = timed(lambda: [storage.stayOfCustomer(customerNo) for customerNo in customers])
+    storage.close()
+    size = sum(
+        os.path.getsize(databaseFile + suffix)
+        for suffix in ("", "-wal", "-shm")
+        if os.path.exists(databaseFile + suffix)
+    )
+    results.append(("SQLite", write, read, lookup, size))
+
+    # The text file only has the allocations, it is written from the hotel already in memory
+    textFile = os.path.join(directory, "LHMS_benchmark.txt")
+    write, _ = timed(
+        lambda: writeRoomAllocationsText(textFile, memory.allocations, datetime.datetime.now())
+    )
+    read, _ = timed(lambda: readRoomAllocationsText(textFile))
+    lookup, _ = timed(
+        lambda: [list(iterRoomAllocationsText(textFile, customerNo=customerNo)) for customerNo in customers]
+    )
+    results.append(("Text file", write, read, lookup, os.path.getsize(textFile)))
+
+    print(f"{'':<18}{'write':>12}{'load':>12}{'lookup':>12}{'size':>12}")
+    for name, write, read, lookup, size in results:
+        print(
+            f"{name:<18}{write * 1000:>10.1f}ms"
+            + (f"{read * 1000:>10.1f}ms" if read is not None else f"{'-':>12}")
+            + f"{lookup / len(customers) * 1e6:>10.1f}us"
+            + (f"{size:>12}" if size is not None else f"{'-':>12}")
+        )
+    print(f"\nLookup is the time to find the stay of one customer, averaged over {len(customers)} customers.")
+
+    for path in (journalFile, journalSnapshot, databaseFile, databaseFile + "-wal", databaseFile + "-shm", textFile):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def stressTest(threadCount: int, roomCount: int, operations: int) -> int:
+    """
+    Function to check the hotel can be used by many desks at once. Each thread allocates and bills random rooms of a
+    small hotel, so the threads keep trying to allocate the same rooms. Afterwards every room must have been allocated
+    exactly once more than it was billed if it is allocated, and as many times as billed otherwise, and the journal must
+    rebuild the same hotel. Returns 0 when no update was lost
+    """
+    print(f"\n ### STRESS TEST ({threadCount} threads, {roomCount} rooms) ### \n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        target = Hotel()
+        for roomNumber in range(roomCount):
+            target.addRoom(roomNumber, ROOM_TYPES[roomNumber % len(ROOM_TYPES)], 100.0)
+        target.storage = Journal(
+            os.path.join(directory, "LHMS_stress.journal"),
+            os.path.join(directory, "LHMS_stress.snapshot"),
+        )
+
+        # Every desk uses new customer numbers, next() of a count is atomic
+        customerNumbers = itertools.count()
+        allocated = [[0] * roomCount for _ in range(threadCount)]
+        billed = [[0] * roomCount for _ in range(threadCount)]
+        failures = [0] * threadCount
+        start = threading.Barrier(threadCount)
+
+        def desk(index: int):
+            generator = random.Random(index)
+            start.wait()
+            for _ in range(operations):
+                roomNumber = generator.randrange(roomCount)
+                try:
+                    if generator.random() < 0.6:
+                        target.allocateRoom(roomNumber, next(customerNumbers), f"Desk {index}")
+                        allocated[index][roomNumber] += 1
+                    else:
+                        target.billRoom(roomNumber)
+                        billed[index][roomNumber] += 1
+                except ValueError:
+                    # The room was allocated or billed by another desk first
+                    failures[index] += 1
+
+        threads = [threading.Thread(target=desk, args=(index,)) for index in range(threadCount)]
+        began = perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = perf_counter() - began
+        target.storage.close()
+
+        lost = 0
+        for roomNumber in range(roomCount):
+            allocations = sum(counts[roomNumber] for counts in allocated)
+            bills = sum(counts[roomNumber] for counts in billed)
+            if allocations - bills != int(target.rooms.get(roomNumber).isAllocated):
+                lost += 1
+        if len(target.allocations) != len(target.rooms.allocatedRooms()):
+            lost += 1
+
+        # The rooms, allocations and customer numbers rebuilt from the journal must be the same
+        replayed = Hotel()
+        for roomNumber in range(roomCount):
+            replayed.addRoom(roomNumber, ROOM_TYPES[roomNumber % len(ROOM_TYPES)], 100.0)
+        Journal(
+            os.path.join(directory, "LHMS_stress.journal"),
+            os.path.join(directory, "LHMS_stress.snapshot"),
+        ).replay(replayed)
+        stateOf = lambda source: {
+            key: sorted(map(tuple, values)) if key != "customers" else sorted(values)
+            for key, values in source.snapshotState().items()
+        }
+        consistent = stateOf(replayed) == stateOf(target)
+
+    total = threadCount * operations
+    print(
+        f"{total} operations in {elapsed:.3f} seconds ({total / elapsed:.0f} operations per second), "
+        f"{sum(map(sum, allocated))} allocations, {sum(map(sum, billed))} bills, {sum(failures)} refused."
+    )
+    print(f"Rooms with lost updates: {lost}")
+    print(f"Journal rebuilds the same hotel: {'yes' if consistent else 'no'}")
+    return 0 if lost == 0 and consistent else 1
+
+
+# Changes between the compactions of the stress test of the processes, low so the desks see each other compact
+STRESS_COMPACT_EVERY = 500
+
+
+def stressDesk(directory: str, index: int, roomCount: int, operations: int) -> tuple:
+    """
+    Function run in a process of the stress test, a desk that opens the shared journal of the directory and
+    allocates and bills random rooms. Returns the allocations and bills of each room it made and the refused ones
+    """
+    desk = Hotel()
+    storage = openStorage(desk, "journal", shared=True, directory=directory)
+    storage.compactEvery = STRESS_COMPACT_EVERY
+
+    generator = random.Random(index)
+    allocated = [0] * roomCount
+    billed = [0] * roomCount
+    failures = 0
+    for i in range(operations):
+        roomNumber = generator.randrange(roomCount)
+        try:
+            if generator.random() < 0.6:
+                desk.allocateRoom(roomNumber, index * operations + i, f"Desk {index}")
+                allocated[roomNumber] += 1
+            else:
+                desk.billRoom(roomNumber)
+                billed[roomNumber] += 1
+        except ValueError:
+            # The room was allocated or billed by another desk first
+            failures += 1
+    desk.history.close()
+    storage.close()
+    return allocated, billed, failures
+
+
+def stressProcesses(processCount: int, roomCount: int, operations: int) -> int:
+    """
+    Function to check many desks can share the journal from their own processes. Each process allocates and bills
+    random rooms of a small hotel, reading the changes of the others before each change. Afterwards the hotel
+    rebuilt from the journal must have every room allocated exactly once more than it was billed if it is allocated,
+    and the history must have every bill. Returns 0 when no update was lost
+    """
+    print(f"\n ### STRESS TEST ({processCount} processes, {roomCount} rooms) ### \n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        journalFile = storagePath(journalPath, directory)
+        snapshotFile = storagePath(snapshotPath, directory)
+        setup = Hotel()
+        setup.storage = Journal(journalFile, snapshotFile)
+        for roomNumber in range(roomCount):
+            setup.addRoom(roomNumber, ROOM_TYPES[roomNumber % len(ROOM_TYPES)], 100.0)
+        setup.storage.close()
+
+        began = perf_counter()
+        with concurrent.futures.ProcessPoolExecutor(processCount) as pool:
+            results = list(
+                pool.map(
+                    stressDesk,
+                    itertools.repeat(directory),
+                    range(processCount),
+                    itertools.repeat(roomCount),
+                    itertools.repeat(operations),
+                )
+            )
+        elapsed = perf_counter() - began
+
+        replayed = Hotel()
+        Journal(journalFile, snapshotFile).replay(replayed)
+        lost = 0
+        for roomNumber in range(roomCount):
+            allocations = sum(result[0][roomNumber] for result in results)
+            bills = sum(result[1][roomNumber] for result in results)
+            if allocations - bills != int(replayed.rooms.get(roomNumber).isAllocated):
+                lost += 1
+        history = HistoryStore(storagePath(historyPath, directory))
+        history.open()
+        bills = sum(sum(result[1]) for result in results)
+
+    total = processCount * operations
+    print(
+        f"{total} operations in {elapsed:.3f} seconds ({total / elapsed:.0f} operations per second), "
+        f"{sum(sum(result[0]) for result in results)} allocations, {bills} bills, "
+        f"{sum(result[2] for result in results)} refused."
+    )
+    print(f"Rooms with lost updates: {lost}")
+    print(f"History keeps every bill: {'yes' if history.count == bills else 'no'}")
+    return 0 if lost == 0 and history.count == bills else 1
+
+
+# Answers given to the menu functions by the benchmark, for the run number i of a hotel with the given rooms.
+# The even rooms of the synthetic hotel are allocated and the odd ones are free
+MENU_ANSWERS = {
+    "addRooms": lambda i, rooms: ["1", str(rooms + i), ROOM_TYPES[i % 3], "100"],
+    "deleteRooms": lambda i, rooms: [str(2 * i + 1), "-1"],
+    "allocateRoom": lambda i, rooms: [
+        str(2 * i + 1),
+        str(rooms + i),
+        f"Guest {i}",
+        (datetime.date.today() + datetime.timedelta(days=2)).isoformat(),
+    ],
+    "billing": lambda i, rooms: [str(2 * i)],
+}
+
+# Functions the menu calls to write the allocations file and the backups, run by the benchmark with the files
+# in its own directory instead of the files of the hotel
+MENU_FILE_FUNCTIONS = {
+    "saveRoomAllocationsToFile": lambda target, directory: saveAllocations(
+        target, storagePath(filePath, directory)
+    ),
+    "backupRoomAllocations": lambda target, directory: createBackup(
+        storagePath(filePath, directory),
+        datetime.datetime.now(),
+        backupCompression,
+        backupRetention,
+        storagePath(backupPrefix, directory),
+    ),
+}
+
+
+# Share of the allocations changed by the desks between two saves of the allocations file in the menu benchmark
+MENU_SAVE_CHANGES = 0.05
+
+
+def changeBeforeSave(target: Hotel, directory: str):
+    # The file is brought up to date, then a share of the allocations is marked as changed, as the desks would
+    # change them between two saves, so each measured save writes those slots and not the whole file
+    saveAllocations(target, storagePath(filePath, directory))
+    with target.lock:
+        rooms = list(target.allocations.allocationsByRoom)
+        target.allocations.changedRooms.update(random.sample(rooms, int(len(rooms) * MENU_SAVE_CHANGES)))
+
+
+def saveBeforeBackup(target: Hotel, directory: str):
+    # Each backup empties the allocations file, so it is saved again before the next one
+    saveAllocations(target, storagePath(filePath, directory))
+
+
+# Functions run before each run of a menu function and not measured
+MENU_PREPARATIONS = {
+    "saveRoomAllocationsToFile": changeBeforeSave,
+    "backupRoomAllocations": saveBeforeBackup,
+}
+
+
+def syntheticState(roomCount: int) -> dict:
+    """
+    Function to create the snapshot of a synthetic hotel with the given rooms, with the even rooms allocated
+    """
+    today = datetime.date.today().toordinal()
+    return {
+        "rooms": [
+            [roomNumber, ROOM_TYPES[roomNumber % 3], 50.0 + roomNumber % 400, roomNumber % 2 == 0]
+            for roomNumber in range(roomCount)
+        ],
+        "allocations": [
+            [roomNumber, roomNumber, f"Customer {roomNumber}", today, today + 1, True]
+            for roomNumber in range(0, roomCount, 2)
+        ],
+        "customers": list(range(0, roomCount, 2)),
+        "customerNames": [f"Customer {roomNumber}" for roomNumber in range(0, roomCount, 2)],
+    }
+
+
+def benchmarkMenu(roomCounts, operations: int, budget: float) -> list:
+    """
+    Function to run the menu functions without a user, against synthetic hotels of the given sizes. input() gets the
+    answers of MENU_ANSWERS and print() writes nothing, and the functions of MENU_FILE_FUNCTIONS write their files in
+    a temporary directory. Each function is run up to the given quantity of times, or until the time budget in
+    seconds is spent, measuring the latency of each run, then a separate pass of a few runs on a fresh copy of the
+    hotel is traced to get the memory peak. Returns one result per function and hotel size
+    """
+    module = globals()
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            for roomCount in roomCounts:
+                state = syntheticState(roomCount)
+                for name in [*MENU_ANSWERS, *MENU_FILE_FUNCTIONS]:
+                    answersOf = MENU_ANSWERS.get(name, lambda i, rooms: [])
+                    if name in MENU_FILE_FUNCTIONS:
+                        function = functools.partial(MENU_FILE_FUNCTIONS[name], hotel, directory)
+                    else:
+                        function = module[name]
+                    prepare = MENU_PREPARATIONS.get(name)
+                    hotel.restoreState(state)
+
+                    # The runs only use the rooms of the first half, so there is always one to use
+                    runs = min(operations, max(1, roomCount // 4))
+                    latencies = []
+                    answers = iter(())
+                    module["input"] = lambda prompt="": next(answers)
+                    module["print"] = lambda *args, **kwargs: None
+                    # The listings are also written straight to sys.stdout
+                    standardOutput = sys.stdout
+                    sys.stdout = open(os.devnull, "w")
+                    try:
+                        started = perf_counter()
+                        for i in range(runs):
+                            answers = iter(answersOf(i, roomCount))
+                            if prepare is not None:
+                                prepare(hotel, directory)
+                            start = perf_counter()
+                            function()
+                            latencies.append(perf_counter() - start)
+                            if perf_counter() - started > budget:
+                                break
+
+                        # A few more runs with tracemalloc, which slows them down, to get the memory peak. They start
+                        # again from the synthetic hotel, so their answers find the rooms as the first runs did
+                        hotel.restoreState(state)
+                        gc.collect()
+                        peak = 0
+                        tracemalloc.start()
+                        for i in range(min(runs, 5)):
+                            answers = iter(answersOf(i, roomCount))
+                            if prepare is not None:
+                                prepare(hotel, directory)
+                            tracemalloc.reset_peak()
+                            function()
+                            peak = max(peak, tracemalloc.get_traced_memory()[1])
+                        tracemalloc.stop()
+                    finally:
+                        sys.stdout.close()
+                        sys.stdout = standardOutput
+                        del module["input"], module["print"]
+
+                    total = sum(latencies)
+                    latencies.sort()
+                    result = {
+                        "operation": name,
+                        "rooms": roomCount,
+                        "runs": len(latencies),
+                        "throughput": len(latencies) / total if total else 0.0,
+                        "p50": percentile(latencies, 0.5),
+                        "p99": percentile(latencies, 0.99),
+                        "peakBytes": peak,
+                    }
+                    results.append(result)
+                    print(
+                        f"{name:<28}{roomCount:>9}{result['runs']:>7}{result['throughput']:>12.0f}/s"
+                        f"{result['p50'] * 1000:>11.3f}ms{result['p99'] * 1000:>11.3f}ms"
+                        f"{peak / 1024:>11.0f}KiB"
+                    )
+        finally:
+            hotel.restoreState({"rooms": [], "allocations": [], "customers": [], "customerNames": []})
+
+    return results
+
+
+def runMenuBenchmark(roomCounts, operations: int, budget: float, output: str = None, compare: str = None) -> int:
+    """
+    Function to run the benchmark of the menu functions, save the results as JSON and compare them with the results
+    of a previous run, matching each function and hotel size
+    """
+    print("\n ### MENU BENCHMARK ### \n")
+    print(
+        f"{'operation':<28}{'rooms':>9}{'runs':>7}{'throughput':>14}{'p50':>13}{'p99':>13}{'peak':>14}"
+    )
+    results = benchmarkMenu(roomCounts, operations, budget)
+
+    if output:
+        with open(output, "w") as file:
+            json.dump(
+                {
+                    "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                    "python": sys.version.split()[0],
+                    "platform": sys.platform,
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+        print(f"\nResults saved to '{output}'.")
+
+    if compare:
+        try:
+            with open(compare) as file:
+                previous = {
+                    (result["operation"], result["rooms"]): result
+                    for result in json.load(file)["results"]
+                }
+        except (OSError, ValueError, KeyError) as error:
+            print(f"Cannot read the results to compare with ({error}).")
+            return 1
+        print(f"\nCompared with '{compare}' (p50 and p99 of before divided by now, above 1 is faster):\n")
+        for result in results:
+            before = previous.get((result["operation"], result["rooms"]))
+            if before is None:
+                continue
+            print(
+                f"{result['operation']:<28}{result['rooms']:>9}"
+                + "".join(
+                    f"{key:>8} x{before[key] / result[key] if result[key] else 0:.2f}"
+                    for key in ("p50", "p99")
+                )
+            )
+    return 0
+
+
+def openStorage(target: Hotel, kind: str = "journal", shared: bool = False, directory: str = None):
+    """
+    Function to rebuild the hotel from the chosen storage, the journal with its snapshot or the SQLite database,
+    and attach the storage so the following changes are written to it. The files are in the given directory, by
+    default where the paths of the module point. A shared journal can be opened by many desks at once, each change
+    reads the changes of the others first. Raises BlockingIOError when another program has the storage open,
+    or the journal is shared and the other program does not share it
+    """
+    if kind == "sqlite":
+        storage = SQLiteStorage(storagePath(databasePath, directory))
+    else:
+        storage = Journal(storagePath(journalPath, directory), storagePath(snapshotPath, directory))
+    changes = None
+    if shared and kind == "journal":
+        # The desks hold a shared lock while open, and the lock of the changes while they read or write the files
+        storage.shared = True
+        storage.lock = lockFile(storage.path, shared=True, wait=False)
+        changes = lockFile(storage.path + ".changes")
+    else:
+        # The other programs keep the hotel in memory alone, otherwise two of them could allocate the same room
+        storage.lock = lockFile(storage.path, wait=False)
+    try:
+        storage.replay(target)
+        target.storage = storage
+        # The history is attached after the replay, so the stays billed before are not added again
+        target.history = HistoryStore(storagePath(historyPath, directory))
+        target.history.open()
+    finally:
+        if changes is not None:
+            changes.close()
+    return storage
+
+
+# Options of the menu in the order they are shown, with the name of the function that runs each one.
+# The function is looked up by name when it is chosen, so the functions wrapped by the metrics are the ones run
+MENU_OPTIONS = (
+    ("Exit", None),
+    ("Add Rooms", "addRooms"),
+    ("Delete Rooms", "deleteRooms"),
+    ("Display Rooms Details", "displayRoomDetails"),
+    ("Allocate Rooms", "allocateRoom"),
+    ("Display Room Allocation Details", "displayRoomAllocationsDetails"),
+    ("Billing & De-Allocation", "billing"),
+    ("Save the Room Allocations in the database", "saveRoomAllocationsToFile"),
+    ("Load the Room Allocations from the database", "showRoomAllocationsFromFile"),
+    ("Backup of Room Allocations", "backupRoomAllocations"),
+    ("Revenue Report", "revenueReport"),
+    ("Room Availability & Reservations", "reserveRoom"),
+    ("Check-In a Reservation", "checkInReservation"),
+    ("Find a Customer", "findCustomer"),
+)
+
+
+# #### MAIN PROGRAM ####
+def main():
+    """
+    Main function of the program, a loop that shows the menu and runs the chosen option until the user chooses to exit.
+    A wrong answer only asks that answer again, and Ctrl-C goes back to the menu keeping the answers of the option
+    """
+    last = len(MENU_OPTIONS) - 1
+    choiceField = Field(
+        "choice",
+        f"Enter your choice number here (0-{last}): ",
+        check=lambda value, values: None
+        if 0 <= value <= last
+        else f"\nInvalid choice, please enter a number between 0 and {last}\n",
+    )
+
+    try:
+        # Loop to display the menu until the user chooses to exit
+        while True:
+
+            # Menu
+            # Two blank lines are printed to separate the menu from the previous output
+            print("\n")
+            print("\n")
+            print("*" * 70)
+            print("                 LANGHAM HOTEL MANAGEMENT SYSTEM             ")
+            print("                              MENU                        ")
+            print("*" * 70)
+            for number, (label, _) in enumerate(MENU_OPTIONS):
+                print(f"{number}. {label}")
+            print("*" * 70)
+
+            # Ask the user's choice until it is one of the options
+            choice = choiceField.ask()
+            if choice == 0:
+                # Exit the program
+                print("Exiting the program...")
+                return
+
+            # Call the function of the chosen option, after reading the changes of the other desks
+            try:
+                hotel.refresh()
+                globals()[MENU_OPTIONS[choice][1]]()
+            except KeyboardInterrupt:
+                print("\n\nBack to the menu, the answers given are kept for the next time.")
+            except ValueError as error:
+                # An operation refused by the hotel that the option does not handle itself
+                print(f"\n{error}")
+
+            # Write the changes of the chosen option to disk before showing the menu again
+            hotel.sync()
+
+    # The input ends, as when the answers are read from a file
+    except EOFError:
+        print("\nExiting the program...")
+
+
+def commandLine(argv=None):
+    """
+    Function to parse the command line, without a command the interactive menu is started
+    """
+    global backupCompression, backupRetention
+
+    parser = argparse.ArgumentParser(description="LANGHAM Hotel Management System")
+    parser.add_argument(
+        "--no-journal",
+        action="store_true",
+        help="start empty and do not record the changes in the journal",
+    )
+    parser.add_argument(
+        "--metrics",
+        default=os.environ.get("LHMS_METRICS"),
+        help="write latency histograms and counters in the Prometheus text format to this file on exit "
+        "and on SIGUSR1, also turned on by the LHMS_METRICS environment variable",
+    )
+    parser.add_argument(
+        "--profile",
+        default=os.environ.get("LHMS_PROFILE"),
+        help="write the cProfile statistics to this file, and a report to the same file with .txt, on exit "
+        "and on SIGUSR1, also turned on by the LHMS_PROFILE environment variable",
+    )
+    parser.add_argument(
+        "--auto-save",
+        type=float,
+        default=AUTO_SAVE_INTERVAL,
+        metavar="SECONDS",
+        help="save the changed allocations to the allocations file every given seconds",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=["journal", "sqlite"],
+        default="journal",
+        help="where the hotel is stored, the journal with its snapshot or an SQLite database",
+    )
+    commands = parser.add_subparsers(dest="command")
+
+    batchParser = commands.add_parser(
+        "batch", help="apply add/delete/allocate/bill operations from a file"
+    )
+    batchParser.add_argument(
+        "path", nargs="?", default="-", help="CSV or JSON lines file, '-' for stdin"
+    )
+    batchParser.add_argument(
+        "--format", choices=["csv", "jsonl"], help="format of the operations"
+    )
+
+    showParser = commands.add_parser(
+        "show", help="show the room allocations of the file or of a backup"
+    )
+    showParser.add_argument(
+        "path", nargs="?", help="allocations or backup file, the database by default"
+    )
+    showParser.add_argument("--room", type=int, help="only this room number")
+    showParser.add_argument("--customer", type=int, help="only this customer number")
+    showParser.add_argument("--from", dest="dateFrom", help="first date, YYYY-MM-DD")
+    showParser.add_argument("--to", dest="dateTo", help="last date, YYYY-MM-DD")
+    showParser.add_argument(
+        "--page-size",
+        type=int,
+        default=PAGE_SIZE,
+        help="allocations per page, pages are only paused on a terminal",
+    )
+
+    backupParser = commands.add_parser(
+        "backup", help="move the room allocations of the file to a backup file"
+    )
+    backupParser.add_argument(
+        "--compress", action="store_true", help="compress the backup with gzip"
+    )
+    backupParser.add_argument(
+        "--keep",
+        type=int,
+        default=backupRetention,
+        help="quantity of backups kept, the older ones are deleted",
+    )
+
+    snapshotParser = commands.add_parser(
+        "bench-snapshot",
+        help="compare the binary snapshot with the text allocations file",
+    )
+    snapshotParser.add_argument(
+        "--rooms", type=int, default=100000, help="rooms of the synthetic hotel"
+    )
+
+    reportParser = commands.add_parser(
+        "report", help="show the revenue of the current allocations"
+    )
+    reportParser.add_argument(
+        "--nights", type=int, help="nights of every stay, the dates of each stay by default"
+    )
+    reportParser.add_argument(
+        "--stays", help="CSV file with the nights of each room, written as room,nights"
+    )
+    reportParser.add_argument(
+        "--details", action="store_true", help="show the bill of every room"
+    )
+
+    historyParser = commands.add_parser(
+        "history", help="show the occupancy and revenue of past periods, or the past stays of a room or customer"
+    )
+    historyParser.add_argument("--from", dest="dateFrom", help="first day, YYYY-MM-DD")
+    historyParser.add_argument("--to", dest="dateTo", help="last day, YYYY-MM-DD")
+    historyParser.add_argument(
+        "--by", choices=sorted(HISTORY_PERIODS), default="month", help="period of each line of the report"
+    )
+    historyParser.add_argument("--room", type=int, help="show the past stays of this room")
+    historyParser.add_argument("--customer", type=int, help="show the past stays of this customer")
+
+    storageParser = commands.add_parser(
+        "bench-storage",
+        help="compare the in-memory lists, the journal, SQLite and the text file",
+    )
+    storageParser.add_argument(
+        "--rooms", type=int, default=100000, help="rooms of the synthetic hotel"
+    )
+
+    stressParser = commands.add_parser(
+        "stress", help="allocate and bill the same rooms from many threads and check nothing is lost"
+    )
+    stressParser.add_argument("--threads", type=int, default=16, help="desks working at once")
+    stressParser.add_argument(
+        "--processes",
+        type=int,
+        default=0,
+        help="run the desks as this many processes sharing the journal instead of threads",
+    )
+    stressParser.add_argument("--rooms", type=int, default=20, help="rooms shared by the desks")
+    stressParser.add_argument(
+        "--operations", type=int, default=20000, help="operations of each desk"
+    )
+
+    serveParser = commands.add_parser("serve", help="offer the hotel as a JSON service over HTTP")
+    serveParser.add_argument("--host", default=SERVICE_HOST, help="address to listen on")
+    serveParser.add_argument("--port", type=int, default=SERVICE_PORT, help="port to listen on")
+
+    loadParser = commands.add_parser(
+        "load", help="send requests to a running service and measure their latency"
+    )
+    loadParser.add_argument("--host", default=SERVICE_HOST, help="address of the service")
+    loadParser.add_argument("--port", type=int, default=SERVICE_PORT, help="port of the service")
+    loadParser.add_argument("--requests", type=int, default=20000, help="requests sent")
+    loadParser.add_argument(
+        "--concurrency", type=int, default=100, help="connections sending requests at once"
+    )
+    loadParser.add_argument("--rooms", type=int, default=1000, help="rooms added and used")
+
+    propertiesParser = commands.add_parser(
+        "properties", help="run many hotels, each one in its own storage, shared out among worker processes"
+    )
+    propertyCommands = propertiesParser.add_subparsers(dest="propertyCommand", required=True)
+    propertyBatchParser = propertyCommands.add_parser(
+        "batch", help="apply operations written as hotel,op,field... to each property"
+    )
+    propertyBatchParser.add_argument(
+        "path", nargs="?", default="-", help="CSV or JSON lines file, '-' for stdin"
+    )
+    propertyBatchParser.add_argument(
+        "--format", choices=["csv", "jsonl"], help="format of the operations"
+    )
+    propertyFreeParser = propertyCommands.add_parser(
+        "free", help="show the rooms free in every property"
+    )
+    propertyFreeParser.add_argument("--type", choices=ROOM_TYPES, help="only rooms of this type")
+    propertyFreeParser.add_argument("--from", dest="dateFrom", help="check-in date, today by default")
+    propertyFreeParser.add_argument("--to", dest="dateTo", help="check-out date, the next day by default")
+    propertyCommands.add_parser("summary", help="count the rooms and allocations of every property")
+
+    menuParser = commands.add_parser(
+        "bench-menu", help="measure the menu functions without a user on synthetic hotels"
+    )
+    menuParser.add_argument(
+        "--rooms",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000, 1000000],
+        help="rooms of the synthetic hotels",
+    )
+    menuParser.add_argument(
+        "--operations", type=int, default=1000, help="maximum runs of each function"
+    )
+    menuParser.add_argument(
+        "--budget", type=float, default=2.0, help="seconds each function is run at most"
+    )
+    menuParser.add_argument("--output", help="JSON file where the results are saved")
+    menuParser.add_argument("--compare", help="JSON file of a previous run to compare with")
+
+    listParser = commands.add_parser(
+        "list", help="list the rooms or the room allocations as text, CSV or JSON"
+    )
+    listParser.add_argument("listing", choices=["rooms", "allocations"], help="what to list")
+    listParser.add_argument(
+        "--format", choices=["text", "csv", "json"], default="text", help="format of the listing"
+    )
+    listParser.add_argument("--summary", action="store_true", help="only show the summary")
+    listParser.add_argument(
+        "--page-size",
+        type=int,
+        default=PAGE_SIZE,
+        help="rooms per page, pages are only paused on a terminal",
+    )
+    listParser.add_argument("--output", help="file to write the listing to, the screen by default")
+
+    memoryParser = commands.add_parser(
+        "bench-memory", help="measure the memory taken by each room"
+    )
+    memoryParser.add_argument(
+        "--rooms",
+        type=int,
+        nargs="+",
+        default=[10000, 100000, 1000000],
+        help="rooms of the synthetic hotels",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.metrics or args.profile:
+        enableMetrics(args.metrics, args.profile)
+
+    if args.command == "bench-menu":
+        return runMenuBenchmark(args.rooms, args.operations, args.budget, args.output, args.compare)
+
+    if args.command == "bench-memory":
+        benchmarkMemory(args.rooms)
+        return 0
+
+    if args.command == "show":
+        try:
+            records = iterRoomAllocationsText(
+                args.path or filePath,
+                args.room,
+                args.customer,
+                args.dateFrom,
+                args.dateTo,
+            )
+            pageRecords(records, args.page_size, sys.stdin.isatty() and sys.stdout.isatty())
+        except FileNotFoundError:
+            print("File not found. Try saving the room allocations first.")
+            return 1
+        return 0
+
+    if args.command == "backup":
+        backupCompression = args.compress
+        backupRetention = args.keep
+        backupRoomAllocations()
+        return 0
+
+    if args.command == "bench-snapshot":
+        benchmarkSnapshot(args.rooms, os.getcwd())
+        return 0
+
+    if args.command == "bench-storage":
+        benchmarkStorage(args.rooms, os.getcwd())
+        return 0
+
+    if args.command == "properties":
+        try:
+            if args.propertyCommand == "batch":
+                return runPropertyBatch(args.path, args.format, args.storage)
+            if args.propertyCommand == "free":
+                checkIn = parseDate(args.dateFrom) if args.dateFrom else datetime.date.today()
+                checkOut = parseDate(args.dateTo) if args.dateTo else checkIn + datetime.timedelta(days=1)
+                return showPropertyFreeRooms(checkIn, checkOut, args.type, args.storage)
+            return showPropertySummary(args.storage)
+        except ValueError as error:
+            print(error)
+            return 1
+        except (BlockingIOError, concurrent.futures.process.BrokenProcessPool):
+            print("A property is open in another program, close it before starting a new one.")
+            return 1
+
+    if args.command == "load":
+        return runLoad(args.host, args.port, args.requests, args.concurrency, args.rooms)
+
+    if args.command == "stress":
+        if args.processes > 0:
+            return stressProcesses(args.processes, args.rooms, args.operations)
+        return stressTest(args.threads, args.rooms, args.operations)
+
+    # Rebuild the hotel from the storage, and record the new changes
+    try:
+        # The desks of the menu share the journal, the commands keep it to themselves while they run
+        storage = None if args.no_journal else openStorage(hotel, args.storage, shared=args.command is None)
+    except BlockingIOError:
+        print("The hotel is open in another program, close it before starting a new one.")
+        return 1
+
+    # The changed allocations are saved in the background and once more when the program ends
+    autoSaver = None
+    if args.auto_save > 0:
+        autoSaver = AutoSaver(hotel, args.auto_save)
+        autoSaver.start()
+
+    try:
+        if args.command == "batch":
+            return runBatch(args.path, args.format)
+
+        if args.command == "list":
+            return runListing(args.listing, args.format, args.summary, args.page_size, args.output)
+
+        if args.command == "serve":
+            return runService(args.host, args.port)
+
+        if args.command == "history":
+            return runHistory(args.dateFrom, args.dateTo, args.by, args.room, args.customer)
+
+        if args.command == "report":
+            nights = readStays(args.stays) if args.stays else args.nights
+            start = perf_counter()
+            report = revenueOfAllocations(hotel, nights)
+            elapsed = perf_counter() - start
+            printRevenueReport(report, args.details)
+            print(f"Calculated in {elapsed * 1000:.1f} ms.")
+            return 0
+
+        main()
+        return 0
+    finally:
+        if autoSaver is not None:
+            autoSaver.stop()
+        if hotel.history is not None:
+            hotel.history.close()
+        if storage is not None:
+            storage.close()
 
 
-main()
+if __name__ == "__main__":
+    sys.exit(commandLine())
@@ -0,0 +1,54 @@
+"""
+Tests of the desks sharing the hotel: the threads of one program, the programs sharing the journal, and the
+compaction of a shared journal while another program is writing to it
+"""
+
+# Import the os and sys modules to find the program next to the tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Import the program to test
+import program
+
+
+def testThreadsLoseNoUpdates():
+    assert program.stressTest(8, 5, 500) == 0
+
+
+def testProcessesLoseNoUpdates(monkeypatch):
+    # The desks compact the journal often, so they keep reading the snapshots the others wrote
+    monkeypatch.setattr(program, "STRESS_COMPACT_EVERY", 50)
+    assert program.stressProcesses(3, 5, 300) == 0
+
+
+def testSyncDoesNotCompactChangesOfOtherDesks(tmp_path, monkeypatch):
+    first, second = program.Hotel(), program.Hotel()
+    program.openStorage(first, "journal", shared=True, directory=str(tmp_path))
+    program.openStorage(second, "journal", shared=True, directory=str(tmp_path))
+
+    second.addRoom(1, "Single", 100.0)
+    second.storage.compactEvery = 1
+    # The first desk appends a change while the second one syncs, after any snapshot the sync takes
+    snapshotState = second.snapshotState
+
+    def snapshotBeforeChange():
+        state = snapshotState()
+        first.addRoom(2, "Double", 120.0)
+        return state
+
+    monkeypatch.setattr(second, "snapshotState", snapshotBeforeChange)
+    second.sync()
+    if 2 not in first.rooms.rooms:
+        first.addRoom(2, "Double", 120.0)
+
+    for desk in (first, second):
+        desk.history.close()
+        desk.storage.close()
+    replayed = program.Hotel()
+    program.Journal(
+        program.storagePath(program.journalPath, str(tmp_path)),
+        program.storagePath(program.snapshotPath, str(tmp_path)),
+    ).replay(replayed)
+    assert sorted(replayed.rooms.rooms) == [1, 2]